@@ -0,0 +1,108 @@
+# Adaptive choice of the distortion amplitudes along every normal mode.
+# distort.main starts from a coarse grid of amplitudes, and after every round the SOC curves and
+# excited state energies of each mode in the results database are checked interval by interval.
+# An interval is split in two when
+#   - a SOC curve bends so much that a straight line across the interval is off by more than the
+#     tolerance (estimated from the second derivative of the neighbouring points), or
+#   - a singlet and a triplet state cross inside it (the sign of their energy gap changes),
+# and when it is still wider than twice min_step. Flat modes keep their coarse grid.
+
+from collections import defaultdict
+import results_db
+
+
+def second_derivative(x, y):
+    """
+    Second divided difference of three points (x0 < x1 < x2) on a non-uniform grid.
+    """
+    (x0, x1, x2), (y0, y1, y2) = x, y
+    return 2 * ((y2 - y1) / (x2 - x1) - (y1 - y0) / (x1 - x0)) / (x2 - x0)
+
+
+def interval_errors(amps, values):
+    """
+    Estimated error of linear interpolation across every interval (amps[i], amps[i+1]) of one curve,
+    |f''| h^2 / 8 with f'' from the point triples around the interval. None where fewer than three
+    points are known.
+    """
+    curvatures = [abs(second_derivative(amps[i - 1:i + 2], values[i - 1:i + 2])) for i in range(1, len(amps) - 1)]
+    errors = []
+    for i in range(len(amps) - 1):
+        # the triples centred on both ends of the interval
+        near = [curvatures[j - 1] for j in (i, i + 1) if 1 <= j <= len(curvatures)]
+        h = amps[i + 1] - amps[i]
+        errors.append(max(near) * h**2 / 8 if near else None)
+    return errors
+
+
+def crossings(amps, energies):
+    """
+    For every interval, the (singlet, triplet) pairs whose energy order changes inside it.
+    energies maps amplitude -> {state: energy}.
+    """
+    found = []
+    for a, b in zip(amps, amps[1:]):
+        pairs = []
+        for s, e_s in energies.get(a, {}).items():
+            if not s.startswith('S'):
+                continue
+            for t, e_t in energies[a].items():
+                if t.startswith('T') and s in energies.get(b, {}) and t in energies[b]:
+                    if (e_s - e_t) * (energies[b][s] - energies[b][t]) < 0:
+                        pairs.append((s, t))
+        found.append(pairs)
+    return found
+
+
+def mode_data(db_file, molecule, mode):
+    """
+    SOC curves {(singlet, triplet): {amplitude: soc}} and energies {amplitude: {state: eV}} of a mode.
+    """
+    curves = defaultdict(dict)
+    for amplitude, singlet, triplet, soc in results_db.load_soc_curves(db_file, molecule, mode):
+        curves[singlet, triplet][amplitude] = soc
+    energies = {amplitude: results_db.load_energies(db_file, molecule, mode, amplitude)
+                for amplitude in {a for curve in curves.values() for a in curve}}
+    return dict(curves), energies
+
+
+def new_amplitudes(amps, curves, energies, tolerance, min_step, decimals=4):
+    """
+    Midpoints of the intervals of the sorted amplitudes amps which need more points.
+    Returns a list of (amplitude, reason).
+    """
+    split = {}
+    for pair, curve in curves.items():
+        known = [a for a in amps if a in curve]
+        for i, error in enumerate(interval_errors(known, [curve[a] for a in known])):
+            interval = (known[i], known[i + 1])
+            if error is None:
+                split.setdefault(interval, "too few points")
+            elif error > tolerance:
+                split.setdefault(interval, f"{pair[0]}-{pair[1]} SOC error {error:.2f} cm-1")
+
+    for (a, b), pairs in zip(zip(amps, amps[1:]), crossings(amps, energies)):
+        if pairs:
+            split[a, b] = f"{pairs[0][0]}/{pairs[0][1]} crossing"
+
+    added = []
+    for (a, b), reason in sorted(split.items()):
+        if b - a >= 2 * min_step:
+            added.append((round((a + b) / 2, decimals), reason))
+    return added
+
+
+def refine(db_file, molecule, mode_amplitudes, tolerance, min_step=0.05):
+    """
+    New amplitudes for every mode of mode_amplitudes (mode -> list of amplitudes already computed),
+    as a dict mode -> list of amplitudes. Modes which need no more points are left out.
+    """
+    added = {}
+    for mode, amps in mode_amplitudes.items():
+        curves, energies = mode_data(db_file, molecule, mode)
+        new = new_amplitudes(sorted(amps), curves, energies, tolerance, min_step)
+        for amplitude, reason in new:
+            print(f"Mode {mode}: adding amplitude {amplitude:+g} ({reason})")
+        if new:
+            added[mode] = [amplitude for amplitude, reason in new]
+    return added
@@ -0,0 +1,184 @@
+# Asyncio runner for the local Gaussian and pysoc processes.
+# Processes are started with asyncio.create_subprocess_exec (no shell) on an event loop running in a
+# background thread, so the scheduler threads can hand jobs over and wait for them. The runner limits
+# the number of processes running at once, enforces per-job timeouts, can cancel jobs, and prints a
+# progress summary with the wall time of every job.
+
+import asyncio
+import concurrent.futures
+import subprocess
+import threading
+import time
+
+
+class AsyncRunner:
+
+    def __init__(self, max_jobs=None, timeout=None, progress_interval=60):
+        self.max_jobs = max_jobs                    # None: no limit
+        self.timeout = timeout                      # default per-job timeout in seconds
+        self.progress_interval = progress_interval  # seconds between progress summaries
+        self.jobs = {}                              # name -> dict(status, start, end, returncode)
+        self.tasks = {}                             # name -> asyncio task
+        self.loop = None
+        self.semaphore = None
+        self.progress_task = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(self.loop)
+                self.loop.call_soon(ready.set)
+                self.loop.run_forever()
+
+            threading.Thread(target=run_loop, daemon=True).start()
+            ready.wait()
+
+    def set_limit(self, max_jobs):
+        """
+        Change the maximum number of processes running at the same time (before jobs are started).
+        """
+        self.max_jobs = max_jobs
+        self.semaphore = None
+
+    async def limit(self):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_jobs or 10**6)
+        return self.semaphore
+
+    async def run_job(self, name, argv, cwd, timeout, stdout):
+
+        job = self.jobs[name]
+        async with await self.limit():
+            job['status'] = 'running'
+            job['start'] = time.time()
+            if self.progress_task is None or self.progress_task.done():
+                self.progress_task = asyncio.ensure_future(self.report_progress())
+
+            try:
+                process = await asyncio.create_subprocess_exec(*argv, cwd=cwd, stdout=stdout)
+            except OSError as e:
+                # e.g. program not found, reported like a shell would
+                print(f"[runner] could not start {name}: {e}")
+                job['status'] = 'failed'
+                job['returncode'] = 127
+                job['end'] = time.time()
+                return job['returncode']
+            try:
+                job['returncode'] = await asyncio.wait_for(process.wait(), timeout)
+                job['status'] = 'done' if job['returncode'] == 0 else 'failed'
+            except asyncio.TimeoutError:
+                await self.stop_process(process)
+                job['status'] = 'timeout'
+            except asyncio.CancelledError:
+                await self.stop_process(process)
+                job['status'] = 'cancelled'
+                raise
+            finally:
+                job['end'] = time.time()
+                print(f"[runner] {name} {job['status']} after {format_seconds(job['end'] - job['start'])}")
+        return job['returncode']
+
+    async def stop_process(self, process):
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), 10)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def report_progress(self):
+        while any(job['status'] in ('queued', 'running') for job in self.jobs.values()):
+            await asyncio.sleep(self.progress_interval)
+            self.print_progress()
+
+    def run(self, argv, cwd=None, name=None, timeout=None, stdout=None):
+        """
+        Run argv (a list, no shell) and wait for it from any thread.
+        Raises subprocess.CalledProcessError on a non-zero exit status, subprocess.TimeoutExpired
+        when the job takes longer than timeout seconds and subprocess.SubprocessError if the job
+        was cancelled.
+        """
+        self.start()
+        name = name or " ".join(argv)
+        timeout = self.timeout if timeout is None else timeout
+        with self.lock:
+            # keep every job in the summary, a name used before gets a number
+            base, n = name, 1
+            while name in self.jobs:
+                n += 1
+                name = f"{base}#{n}"
+            self.jobs[name] = {'status': 'queued', 'start': None, 'end': None, 'returncode': None}
+
+        async def create_task():
+            self.tasks[name] = asyncio.ensure_future(self.run_job(name, argv, cwd, timeout, stdout))
+            return await self.tasks[name]
+
+        try:
+            returncode = asyncio.run_coroutine_threadsafe(create_task(), self.loop).result()
+        except (asyncio.CancelledError, concurrent.futures.CancelledError):
+            self.jobs[name]['status'] = 'cancelled'
+            raise subprocess.SubprocessError(f"Job {name} was cancelled")
+        status = self.jobs[name]['status']
+        if status == 'timeout':
+            raise subprocess.TimeoutExpired(argv, timeout)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, argv)
+        return returncode
+
+    async def cancel_tasks(self, names):
+        tasks = [self.tasks[n] for n in names if n in self.tasks and not self.tasks[n].done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def cancel(self, name=None, timeout=30):
+        """
+        Cancel one job by name, or all queued and running jobs. Running processes are terminated,
+        and this waits up to timeout seconds for them to stop (the loop thread dies with the program).
+        """
+        if self.loop is None:
+            return
+        names = [name] if name else list(self.tasks)
+        future = asyncio.run_coroutine_threadsafe(self.cancel_tasks(names), self.loop)
+        try:
+            future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            print(f"[runner] jobs still stopping after {timeout} s")
+
+    def summary(self):
+        """
+        Count of jobs in each status and the wall time of every job (running jobs up to now).
+        """
+        now = time.time()
+        counts = {}
+        wall_times = {}
+        for name, job in list(self.jobs.items()):
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+            if job['start'] is not None:
+                wall_times[name] = (job['end'] or now) - job['start']
+        return counts, wall_times
+
+    def print_progress(self):
+
+        counts, wall_times = self.summary()
+        if not counts:
+            return  # no job ran, e.g. a restart where every stage was done
+        running = sorted(((wall_times[name], name) for name, job in self.jobs.items()
+                          if job['status'] == 'running'), reverse=True)
+        print("[runner] " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+        for seconds, name in running:
+            print(f"[runner]   running {name} for {format_seconds(seconds)}")
+
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
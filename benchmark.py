@@ -0,0 +1,379 @@
+# Benchmarks of the scripts on synthetic inputs, no Gaussian licence needed.
+# The fixtures (opt+freq log, multi-Link1 distortion input and log, TD 50-50 log, soc_out.dat files of
+# a study) are generated with a configurable size, and g16, pysoc.py and gfortran are replaced by fake
+# executables with a tunable latency for the end-to-end run of distort.main.
+# Every result is appended to benchmark_results.jsonl with the git commit, and compared with the
+# previous result of the same benchmark, so regressions between versions show up.
+# Usage: python3 benchmark.py [scale] [benchmark ...]   e.g. python3 benchmark.py 2 extrac_geom k_isc
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import fake_g16
+import fortran_build
+import distort
+import kisc_calc
+import parse_cache
+from log_parser import iter_events, scan_excited_states
+from normal_modes import read_normal_modes
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+results_file = os.path.join(os.getcwd(), 'benchmark_results.jsonl')
+
+atomic_symbols = {1: 'H', 6: 'C', 7: 'N', 8: 'O'}
+
+
+def molecule(n_atoms, seed=0):
+    # a random cloud of C, N, O and H atoms
+    rng = random.Random(seed)
+    return [(rng.choice((1, 1, 6, 6, 7, 8)), rng.uniform(-5, 5), rng.uniform(-5, 5), rng.uniform(-5, 5))
+            for _ in range(n_atoms)]
+
+
+def orientation_table(geometry):
+    lines = ["                         Standard orientation:                         ",
+             " ---------------------------------------------------------------------",
+             " Center     Atomic      Atomic             Coordinates (Angstroms)",
+             " Number     Number       Type             X           Y           Z",
+             " ---------------------------------------------------------------------"]
+    lines += [f" {i:>6} {a:>10} {0:>11} {x:>15.6f} {y:>11.6f} {z:>11.6f}" for i, (a, x, y, z) in enumerate(geometry, 1)]
+    lines.append(" ---------------------------------------------------------------------")
+    return "\n".join(lines) + "\n"
+
+
+def write_freq_log(path, n_atoms=60):
+    """
+    opt+freq log of a molecule of n_atoms atoms (3 n_atoms - 6 normal modes), as written by fake_g16.
+    """
+    fake_g16.write_log(path, "# opt freq b3lyp/6-31g(d)", "equilibrium", molecule(n_atoms))
+    return path
+
+
+def distortions(n_modes, amplitudes):
+    return [(mode, amplitude) for mode in range(1, n_modes + 1) for amplitude in amplitudes]
+
+
+def write_distortion_com(path, n_atoms=30, n_modes=10, amplitudes=(0.5, -0.5)):
+    """
+    Multi-Link1 input of the distorted geometries, like the output of distort.f90.
+    """
+    geometry = molecule(n_atoms)
+    blocks = []
+    for mode, amplitude in distortions(n_modes, amplitudes):
+        coords = "\n".join(f" {atomic_symbols[a]:<2} {x + 0.01 * amplitude * (i == mode % n_atoms):>12.5f} {y:>11.5f} {z:>11.5f}"
+                           for i, (a, x, y, z) in enumerate(geometry))
+        blocks.append(f"%nprocshared=4\n%mem=2GB\n# b3lyp/6-31g(d) nosymm\n\n"
+                      f"Distortion along normal mode N {mode} by {amplitude:+g}\n\n0 1\n{coords}\n\n")
+    with open(path, 'w') as f:
+        f.write("--Link1--\n".join(blocks))
+    return path
+
+
+def write_distortion_log(path, n_atoms=60, n_modes=50, amplitudes=(0.25, 0.5, -0.25, -0.5), scf_lines=2000):
+    """
+    Log of the multi-Link1 distortion job: for every link the title, SCF output and the
+    Standard orientation of the distorted geometry.
+    """
+    geometry = molecule(n_atoms)
+    scf = "".join(f" Cycle {i:>4}  Pass 1  IDiag  1:\n" for i in range(scf_lines))
+    with open(path, 'w') as f:
+        for mode, amplitude in distortions(n_modes, amplitudes):
+            f.write(" Entering Gaussian System, Link 0=g16\n # b3lyp/6-31g(d) nosymm\n")
+            f.write(f" Distortion along normal mode N {mode} by {amplitude:+g}\n")
+            f.write(scf)
+            f.write(orientation_table([(a, x + 0.01 * amplitude, y, z) for a, x, y, z in geometry]))
+            f.write(" Normal termination of Gaussian 16\n")
+    return path
+
+
+def write_td_log(path, size_mb=50, nstates=10, seed=0):
+    """
+    Write a synthetic TD log of about size_mb MB: blocks of SCF output filler, each followed by the
+    singlet and triplet excited states with their transitions, like a long multi-link TD job.
+    """
+    rng = random.Random(seed)
+    filler = "".join(f" Cycle {i:>4}  Pass 1  IDiag  1:\n E= -1234.{rng.randrange(10**9):09d}"
+                     f"     Delta-E=   -0.{rng.randrange(10**6):06d} Rises=F Damp=F\n" for i in range(4000))
+    with open(path, 'w') as f:
+        while f.tell() < size_mb * 1024**2:
+            f.write(filler)
+            for multiplicity in ("Singlet", "Triplet"):
+                for i in range(1, nstates + 1):
+                    energy = rng.uniform(2, 6)
+                    f.write(f" Excited State {i:>3}:      {multiplicity}-A      {energy:.4f} eV  "
+                            f"{1239.84 / energy:.2f} nm  f={rng.uniform(0, 0.1):.4f}  <S**2>=0.000\n")
+                    for j in range(3):
+                        f.write(f"      {rng.randint(40, 50)} -> {rng.randint(51, 60)}        {rng.uniform(-0.7, 0.7):.5f}\n")
+                    f.write(f"      {rng.randint(40, 50)} <- {rng.randint(51, 60)}        {rng.uniform(-0.1, 0.1):.5f}\n")
+                f.write(" \n")
+        f.write(" Normal termination of Gaussian 16\n")
+    return path
+
+
+def write_soc_out(path, n_singlets=6, n_triplets=10, seed=0):
+    """
+    soc_out.dat as written by pysoc, S0 and S1..n_singlets with T1..n_triplets (T10 written as T*).
+    """
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for s in range(n_singlets + 1):
+            for t in range(1, n_triplets + 1):
+                f.write(f"<S{s}|Hso|T{'*' if t == 10 else t},1> : {rng.uniform(0, 50):.4f}\n")
+    return path
+
+
+def write_study(folder, n_modes=4, amplitudes=(-0.5, -0.25, 0.25, 0.5)):
+    """
+    singlets folder of a finished study, with a soc_dis_{mode}_{amplitude}/soc_out.dat per geometry.
+    """
+    for i, (mode, amplitude) in enumerate(distortions(n_modes, amplitudes)):
+        soc_dir = os.path.join(folder, f"soc_dis_{mode}_{amplitude:+g}")
+        os.makedirs(soc_dir, exist_ok=True)
+        write_soc_out(os.path.join(soc_dir, 'soc_out.dat'), seed=i)
+    return folder
+
+
+def write_executable(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    os.chmod(path, 0o755)
+
+
+def write_fake_tools(bin_dir, g16_delay=0.2, pysoc_delay=0.1, fc_delay=0.5):
+    """
+    Fake g16, pysoc.py and gfortran in bin_dir, each sleeping for its delay (seconds).
+    The fake gfortran builds a "distort" executable which copies $FAKE_DISTORT_OUTPUT into the
+    working folder as the distortion input.
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    write_executable(os.path.join(bin_dir, 'g16'),
+                     f"#!/bin/sh\nFAKE_G16_DELAY={g16_delay} exec {sys.executable} {os.path.join(repo_dir, 'fake_g16.py')} \"$@\"\n")
+    write_executable(os.path.join(bin_dir, 'pysoc.py'), f"""#!{sys.executable}
+# SOC values which change smoothly with the first coordinate of the geometry in gaussian.com
+import sys, time
+sys.path.insert(0, {repo_dir!r})
+import fake_g16
+time.sleep({pysoc_delay})
+route, title, geometry, link0 = fake_g16.read_com('gaussian.com')
+x = geometry[0][1] if geometry else 0.0
+with open('soc_out.dat', 'w') as f:
+    for s in range(7):
+        for t in range(1, 11):
+            f.write(f"<S{{s}}|Hso|T{{'*' if t == 10 else t}},1> : {{3 + 40 * x**2 + s + 0.1 * t:.4f}}\\n")
+""")
+    write_executable(os.path.join(bin_dir, 'gfortran'), f"""#!{sys.executable}
+import os, sys, time
+if '--version' in sys.argv:
+    print("GNU Fortran (fake) 0.0")
+    sys.exit(0)
+time.sleep({fc_delay})
+out = sys.argv[sys.argv.index('-o') + 1]
+with open(out, 'w') as f:
+    f.write('#!/bin/sh\\ncp "$FAKE_DISTORT_OUTPUT" ./mol_dist_sing.com\\n')
+os.chmod(out, 0o755)
+""")
+    return bin_dir
+
+
+def best_time(func, *args, repeat=3, cold=True, **kwargs):
+    # cold: every call parses the files again instead of taking them from parse_cache
+    times = []
+    for _ in range(repeat):
+        if cold:
+            parse_cache.clear()
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def quiet(func, *args, **kwargs):
+    # the scripts print progress for every job
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def bench_excited_states(tmp, scale=1, repeat=3):
+    size_mb = 30 * scale
+    log = write_td_log(os.path.join(tmp, 'td.log'), size_mb)
+    singlets, triplets = scan_excited_states(log)
+    streamed = [data for event, data in iter_events(log) if event == 'excited_state']
+    assert len(singlets) + len(triplets) == len(streamed)
+    return {'seconds': best_time(scan_excited_states, log, repeat=repeat),
+            'streamed_seconds': best_time(lambda: [e for e, d in iter_events(log) if e == 'excited_state'], repeat=repeat),
+            'size_mb': size_mb}
+
+
+def bench_normal_modes(tmp, scale=1, repeat=3):
+    n_atoms = int(100 * scale)
+    log = write_freq_log(os.path.join(tmp, 'freq.log'), n_atoms)
+    return {'seconds': best_time(read_normal_modes, log, repeat=repeat), 'atoms': n_atoms}
+
+
+def bench_extrac_geom(tmp, scale=1, repeat=3):
+    n_modes = int(50 * scale)
+    log = write_distortion_log(os.path.join(tmp, 'dist.log'), n_modes=n_modes)
+    assert len(distort.extrac_geom(log)) == 4 * n_modes
+    return {'seconds': best_time(distort.extrac_geom, log, repeat=repeat), 'modes': n_modes,
+            'size_mb': round(os.path.getsize(log) / 1024**2, 1)}
+
+
+def bench_split_distortions(tmp, scale=1, repeat=3):
+    # generate_distort_mode for every mode of a multi-Link1 input with two amplitudes per sign
+    n_modes = int(50 * scale)
+    com = write_distortion_com(os.path.join(tmp, 'mol_dist_sing.com'), n_modes=n_modes, amplitudes=(0.25, 0.5, -0.25, -0.5))
+    out = os.path.join(tmp, 'split')
+    os.makedirs(out)
+
+    def split_all():
+        for mode in range(1, n_modes + 1):
+            distort.generate_distort_mode(out, com, mode)
+    seconds = best_time(quiet, split_all, repeat=repeat)
+    assert len(os.listdir(out)) == 4 * n_modes
+    return {'seconds': seconds, 'modes': n_modes, 'size_mb': round(os.path.getsize(com) / 1024**2, 1)}
+
+
+def bench_get_soc(tmp, scale=1, repeat=3):
+    folder = write_study(os.path.join(tmp, 'soc_study'), n_modes=int(50 * scale))
+    files = sorted(os.path.join(folder, d, 'soc_out.dat') for d in os.listdir(folder))
+
+    def parse_all(get_soc):
+        for soc_file in files:
+            get_soc(soc_file)
+    return {'seconds': best_time(parse_all, distort.get_soc, repeat=repeat),
+            'kisc_calc_seconds': best_time(parse_all, kisc_calc.get_soc, repeat=repeat),
+            'cached_seconds': best_time(parse_all, distort.get_soc, repeat=repeat, cold=False), 'files': len(files)}
+
+
+def bench_k_isc(tmp, scale=1, repeat=3):
+    size_mb = 10 * scale
+    log = write_td_log(os.path.join(tmp, 'td_k_isc.log'), size_mb)
+    soc_file = write_soc_out(os.path.join(tmp, 'soc_out.dat'))
+    return {'seconds': best_time(kisc_calc.k_isc, log, log, soc_file, repeat=repeat), 'size_mb': size_mb}
+
+
+def bench_plot(tmp, scale=1, repeat=1):
+    n_modes = max(1, int(4 * scale))
+    folder = write_study(os.path.join(tmp, 'plot_study'), n_modes=n_modes)
+    seconds = best_time(quiet, distort.plot_soc_vs_distortion, folder, range(1, n_modes + 1), distort.get_soc,
+                        distort.parse_distortion_amplitude, force=True, repeat=repeat)
+    return {'seconds': seconds, 'modes': n_modes}
+
+
+def bench_end_to_end(tmp, scale=1, repeat=1, g16_delay=0.2, pysoc_delay=0.1, fc_delay=0.5, max_jobs=4):
+    """
+    distort.main on a fresh study with the fake g16, pysoc.py and gfortran: compile and run distort,
+    split the distortion input, then the distortion, energy, soc and pysoc jobs of every geometry.
+    """
+    n_modes = max(1, int(3 * scale))
+    study = os.path.join(tmp, 'e2e')
+    os.makedirs(study)
+    bin_dir = write_fake_tools(os.path.join(tmp, 'bin'), g16_delay, pysoc_delay, fc_delay)
+    with open(os.path.join(study, 'distort.f90'), 'w') as f:
+        f.write("program distort\nend program distort\n")
+    with open(os.path.join(study, 'inp_sing.txt'), 'w') as f:
+        f.write("opt.log\n")
+    with open(os.path.join(study, 'init.py'), 'w') as f:
+        f.write("# pysoc settings\n")
+
+    saved = (distort.cwd, distort.g16_cmd, fortran_build.compiler, fortran_build.cache_dir, dict(os.environ))
+    distort.cwd = study
+    distort.g16_cmd = os.path.join(bin_dir, 'g16')
+    fortran_build.compiler = os.path.join(bin_dir, 'gfortran')
+    fortran_build.cache_dir = os.path.join(tmp, 'build_cache')
+    os.environ['PATH'] = bin_dir + os.pathsep + os.environ['PATH']
+    os.environ['FAKE_DISTORT_OUTPUT'] = write_distortion_com(os.path.join(tmp, 'mol_dist_sing.com'), n_modes=n_modes)
+    try:
+        start = time.perf_counter()
+        # np.arange like the main block of distort.py, so NumPy mode numbers go through every stage
+        quiet(distort.main, os.path.join(study, 'distort.f90'), 'inp_sing.txt', np.arange(1, n_modes + 1),
+              'b3lyp/6-31g(d)', os.path.join(study, 'init.py'), 8, 8, max_jobs, use_cache=False)
+        seconds = time.perf_counter() - start
+    finally:
+        distort.cwd, distort.g16_cmd, fortran_build.compiler, fortran_build.cache_dir, environ = saved
+        os.environ.clear()
+        os.environ.update(environ)
+    soc_files = [d for d in os.listdir(os.path.join(study, 'singlets'))
+                 if os.path.isfile(os.path.join(study, 'singlets', d, 'soc_out.dat'))]
+    if len(soc_files) != 2 * n_modes:
+        raise RuntimeError(f"end-to-end run finished {len(soc_files)} of {2 * n_modes} geometries")
+    return {'seconds': seconds, 'geometries': len(soc_files), 'modes': n_modes, 'max_jobs': max_jobs,
+            'g16_delay': g16_delay, 'pysoc_delay': pysoc_delay, 'fc_delay': fc_delay}
+
+
+benchmarks = {
+    'excited_states': bench_excited_states,
+    'normal_modes': bench_normal_modes,
+    'extrac_geom': bench_extrac_geom,
+    'split_distortions': bench_split_distortions,
+    'get_soc': bench_get_soc,
+    'k_isc': bench_k_isc,
+    'plot_soc_vs_distortion': bench_plot,
+    'end_to_end': bench_end_to_end,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo_dir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(path):
+    # last result of every (benchmark, scale)
+    previous = {}
+    if os.path.isfile(path):
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    previous[record['benchmark'], record['scale']] = record
+    return previous
+
+
+def run(names=None, scale=1, path=results_file):
+    """
+    Run the benchmarks in names (all by default), append the results to path and print them next
+    to the previous result of the same benchmark and scale.
+    """
+    previous = previous_results(path)
+    run_id = time.strftime("%Y-%m-%d %H:%M:%S")
+    commit = git_commit()
+    records = []
+    for name in names or benchmarks:
+        with tempfile.TemporaryDirectory() as tmp:
+            result = benchmarks[name](tmp, scale)
+        record = {'run': run_id, 'commit': commit, 'python': platform.python_version(), 'host': platform.node(),
+                  'benchmark': name, 'scale': scale, **result}
+        records.append(record)
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+        line = f"{name:<24}{record['seconds']:>10.3f} s"
+        before = previous.get((name, scale))
+        if before:
+            change = 100 * (record['seconds'] / before['seconds'] - 1) if before['seconds'] else 0.0
+            line += f"   previous {before['seconds']:.3f} s ({before['commit'] or before['run']}) {change:+.0f}%"
+        print(line)
+    print(f"Results appended to {path}")
+    return records
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    scale = float(args.pop(0)) if args and args[0].replace('.', '', 1).isdigit() else 1
+    unknown = [name for name in args if name not in benchmarks]
+    if unknown:
+        print(f"Unknown benchmarks {unknown}, choose from {list(benchmarks)}")
+        sys.exit(2)
+    run(args, scale)
@@ -3,7 +3,18 @@ import matplotlib.pyplot as plt
 import os
 import subprocess
 import re
+import shlex
 import shutil
+from log_parser import last_orientation
+from executors import get_executor
+import run_report
+import resource_planner
+
+# Where the Gaussian and pysoc jobs run: local (default), slurm or pbs, see executors.py
+executor = get_executor()
+
+# Command used to run Gaussian, set G16="python3 fake_g16.py" to test without Gaussian
+g16_cmd = os.environ.get("G16", "g16")
 
 def extract_opt_geometry(log_file):
     
@@ -11,36 +22,18 @@ def extract_opt_geometry(log_file):
         1: 'H',  6: 'C', 7: 'N', 8: 'O', 9: 'F', 15: 'P', 16: 'S', 17: 'Cl'
     }
     
-    with open(log_file, 'r') as file:
-        lines = file.readlines()
-    
-    # find all occurrences of "Standard orientation"
-    std_orient_indices = [i for i, line in enumerate(lines) if "Standard orientation" in line]
-    
-    if not std_orient_indices:
-        raise ValueError("No 'Standard orientation' found in a log file.")
-    
-    last_index = std_orient_indices[-1]  # Take the last std orientation
-    start = last_index + 5  # Skip 5 lines after "Standard orientation:"
-    
+    # Take the last std orientation
     geometry = []
-    
-    for line in lines[start:]:
-        if "-----" in line:  # End of orientation block
-            break
-        parts = line.split()
-        if len(parts) >= 6:
-            atomic_num = int(parts[1])
-            x, y, z = parts[3], parts[4], parts[5]
-            element = atomic_symbols.get(atomic_num, str(atomic_num))  # Converting atomic number to element symbol
-            geometry.append(f"{element}  {x}  {y}  {z}")
+    for atomic_num, x, y, z in last_orientation(log_file):
+        element = atomic_symbols.get(atomic_num, str(atomic_num))  # Converting atomic number to element symbol
+        geometry.append(f"{element}  {x:.6f}  {y:.6f}  {z:.6f}")
     
     return geometry
 
-def generate_energy_com_file(opt_freq_com_file, energy_com_file, geometry):
+def generate_energy_com_file(opt_freq_com_file, energy_com_file, geometry, cores=3, memory=2):
     
-    com_content = f"""%nprocshared=3
-%mem=2GB
+    com_content = f"""%nprocshared={cores}
+%mem={memory}GB
 %chk={energy_com_file}.chk
 # td=(50-50,nstates=10) b3lyp/6-31g(d) geom=connectivity
 
@@ -81,12 +74,12 @@ def generate_energy_com_file(opt_freq_com_file, energy_com_file, geometry):
         file.writelines(additional_data)  # Append the remaining lines after geometry
     print(".com file for energy is completed")
 
-def soc_calculation(opt_freq_com_file, geometry,init_path):
+def soc_calculation(opt_freq_com_file, geometry,init_path, cores=3, memory=2):
     soc_file = opt_freq_com_file.replace('.com', '_soc')
 
     soc_initial = f"""%rwf=gaussian.rwf
-%nprocshared=3
-%mem=2GB
+%nprocshared={cores}
+%mem={memory}GB
 %chk=gaussian.chk
 # td=(50-50,nstates=10) b3lyp/6-31g(d) nosymm geom=connectivity gfinput
 10f 6d
@@ -149,13 +142,17 @@ def soc_calculation(opt_freq_com_file, geometry,init_path):
 
 def run_gaussian(com_file):
     
-    command = f"g16 {com_file}"
+    command = shlex.split(g16_cmd) + [com_file]
     work_dir = os.path.dirname(com_file) or os.getcwd()
     
     try:
-        subprocess.run(command, shell=True, check=True, cwd=work_dir)
+        job_name = os.path.splitext(os.path.basename(com_file))[0]
+        if job_name == 'gaussian':
+            job_name = os.path.basename(os.path.abspath(work_dir)) # SOC jobs are all called gaussian.com
+        executor.run(command, work_dir, job_name=job_name, com_file=com_file)
         print(f"Gaussian job for {com_file} completed.")
-    except subprocess.CalledProcessError as e:
+        run_report.add_log(os.path.splitext(com_file)[0] + '.log', com_file)
+    except subprocess.SubprocessError as e:
         print(f"Error running Gaussian job: {e}")
         return False
     return True
@@ -163,20 +160,33 @@ def run_gaussian(com_file):
 
 def run_pysoc(com_file):
     work_dir = os.path.dirname(com_file)
-    command = f"pysoc.py"
+    command = ["pysoc.py"]
     try:
-        subprocess.run(command, shell=True, check=True, cwd=work_dir)
+        executor.run(command, work_dir, job_name=f"pysoc_{os.path.basename(os.path.abspath(work_dir))}")
         print("pysoc.py executed successfully in SOC folder.")
-    except subprocess.CalledProcessError as e:
+    except subprocess.SubprocessError as e:
         print(f"Error running pysoc.py: {e}")
         return False
     return True
     
-def main(input_com_file,init_path):
+def main(input_com_file,init_path,cores=3,memory=2,auto_resources=False):
+    # Wall/CPU time and memory of every stage, "python3 run_report.py run_report.jsonl" ranks them
+    report = os.path.join(os.path.dirname(os.path.abspath(input_com_file)), 'run_report.jsonl')
+    run_report.configure(report)
+    
+    # The energy and soc jobs run one after the other, with auto_resources each is sized for the
+    # molecule on this node (cores and memory are then the node totals, None for this node)
+    if auto_resources:
+        resources = resource_planner.plan_study(resource_planner.read_atoms(input_com_file), 'b3lyp/6-31g(d)', 1,
+                                                cores, memory, report)
+        resource_planner.print_plan(resources)
+        cores, memory = resources['cores'], resources['memory']
+    
     # Run opt+freq calculations
     
     print(f"Running Gaussian for {input_com_file} (Opt+Freq)...")
-    run_gaussian(input_com_file)
+    with run_report.stage('opt_freq', input_com_file):
+        run_gaussian(input_com_file)
     
     # Extract optimized geometry from the .log file
     log_file = input_com_file.replace('.com', '.log')
@@ -185,20 +195,23 @@ def main(input_com_file,init_path):
     
     # Generating .com files for energy calculations
     energy_file = input_com_file.replace('.com', '_st-energy')
-    generate_energy_com_file(input_com_file, energy_file, optimized_geometry)
+    generate_energy_com_file(input_com_file, energy_file, optimized_geometry, cores, memory)
     
     # Assuming soc_calculation is a function that handles the spin-orbit coupling
-    soc_folder = soc_calculation(input_com_file, optimized_geometry,init_path)
+    soc_folder = soc_calculation(input_com_file, optimized_geometry,init_path, cores, memory)
     
     # Run the energy calculations
     print("\nRunning Gaussian for energy calculation...")
-    run_gaussian(f"{energy_file}.com")
+    with run_report.stage('energy', f"{energy_file}.com"):
+        run_gaussian(f"{energy_file}.com")
     
     print("\nRunning Gaussian for soc ...")
-    run_gaussian(f"{soc_folder}/gaussian.com")
+    with run_report.stage('soc', f"{soc_folder}/gaussian.com"):
+        run_gaussian(f"{soc_folder}/gaussian.com")
     
     print("\nRunning Pysoc for soc calculation...")
-    run_pysoc(f"{soc_folder}/gaussian.com")
+    with run_report.stage('pysoc', soc_folder):
+        run_pysoc(f"{soc_folder}/gaussian.com")
     
     print("\n\n\n*********************************************************")
     print("All calculations are done !!")
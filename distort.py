@@ -2,64 +2,100 @@
 # The active modes list can be provided at the end of the file.
 
 import numpy as np
+import matplotlib
+matplotlib.use('Agg') # plots are only saved to files, and rendered in worker processes
 import matplotlib.pyplot as plt
 import time
 import os
 import subprocess
-import re
+import shlex
 import glob
 import shutil
+import json
+import hashlib
+import multiprocessing
 from collections import defaultdict
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scheduler import run_jobs, split_resources
+from log_parser import distorted_geometries, termination_status, excited_state_energies, distortion_pattern, iter_events
+import results_db
+import job_cache
+import workflow_state
+import fortran_build
+from executors import get_executor
+import scratch
+import run_report
+import resource_planner
+import adaptive_sampling
+import soc_dataset
+import parse_cache
+from normal_modes import read_normal_modes
+from normal_modes import distorted_geometries as displaced_geometries
+from normal_modes import geometry_key, key_amplitude
 
 plt.rcParams['font.family'] = 'serif'
 
+# Command used to run Gaussian, set G16="python3 fake_g16.py" to test without Gaussian
+g16_cmd = os.environ.get("G16", "g16")
+
+# Largest difference (eV) between the singlet energies of the energy job and of the 50-50 SOC job
+# accepted by the merge_energy validation
+merge_tolerance = 0.01
+
+# Where the Gaussian and pysoc jobs run: local (default), slurm or pbs, see executors.py
+executor = get_executor()
+
 def run_gaussian(com_file):
     
-    command = f"g16 {com_file}"
+    command = shlex.split(g16_cmd) + [com_file]
     work_dir = os.path.dirname(com_file) or os.getcwd()
     
     try:
-        subprocess.run(command, shell=True, check=True, cwd=work_dir)
+        job_name = os.path.splitext(os.path.basename(com_file))[0]
+        if job_name == 'gaussian':
+            job_name = os.path.basename(os.path.abspath(work_dir)) # SOC jobs are all called gaussian.com
+        executor.run(command, work_dir, job_name=job_name, com_file=com_file)
         print(f"Gaussian job for {com_file} completed.")
+        run_report.add_log(os.path.splitext(com_file)[0] + '.log', com_file)
         
-    except subprocess.CalledProcessError as e:
+    except subprocess.SubprocessError as e:
         print(f"Error running Gaussian job: {e}")
         return False
         
     return True
     
-def run_distort(distort_file,inp_file):
+def run_distort(distort_file,inp_file,build_profile='default'):
 
     if not os.path.isfile(distort_file):
         print(f"Error: File '{distort_file}' not found.")
         return False
 
     work_dir = os.path.dirname(distort_file) or os.getcwd()
-    output_exe = os.path.join(work_dir, "distort")
-
-    compile_cmd = f"gfortran {distort_file} -o {output_exe}"
-    run_cmd = f"{output_exe} < {inp_file}"
 
     try:
-        subprocess.run(compile_cmd, shell=True, check=True, cwd=work_dir)
+        # distort.f90 is only compiled when the source, compiler or flags change
+        output_exe = fortran_build.compiled(distort_file, build_profile)
+        run_cmd = f"{output_exe} < {inp_file}"
         subprocess.run(run_cmd, shell=True, check=True, cwd=work_dir)
         print("Distortion process completed successfully.")
         return True
         
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError) as e:
+        # OSError: gfortran not installed, the run goes on with the dist files already there
         print(f"Error running distortion process: {e}")
         return False
        
 def run_pysoc(com_file):
 
     work_dir = os.path.dirname(com_file)
-    command = f"pysoc.py"
+    command = ["pysoc.py"]
     
     try:
-        subprocess.run(command, shell=True, check=True, cwd=work_dir,stdout=subprocess.DEVNULL)
+        executor.run(command, work_dir, job_name=f"pysoc_{os.path.basename(os.path.abspath(work_dir))}", stdout=subprocess.DEVNULL)
         print("pysoc.py executed successfully in SOC folder.")
         
-    except subprocess.CalledProcessError as e:
+    except subprocess.SubprocessError as e:
         print(f"Error running pysoc.py: {e}")
         return False
         
@@ -67,21 +103,31 @@ def run_pysoc(com_file):
 
 def check_gaussian_log(log_file):
     
-    with open(log_file, 'r') as f:
-        lines = f.readlines()
+    # Only the end of the log is read, so this is cheap even for very large logs
+    status = termination_status(log_file)
     
-    if lines:
-        last_line = lines[-1]
-    else:
-        last_line = ""
-    terminated = "Normal termination of Gaussian" in last_line
-    
-    if terminated:
+    if status['normal']:
         print("Calculation terminated normally")
     
+    elif status['status'] == 'error':
+        reasons = ", ".join(status['reasons']) or "unknown reason"
+        raise RuntimeError(f"Error: Gaussian job in {log_file} ended with error termination in {status['link']} ({reasons}).")
+    
     else:
         raise RuntimeError(f"Error: Normal termination not found in the last line of the log file {log_file}.")
 
+def finished_log(log_file):
+    
+    # A log cut short by a node crash or a wall time kill is moved aside, so the job runs again
+    # instead of failing on every restart. Error terminations are kept and reported.
+    if not check_file_exists(log_file):
+        return False
+    if termination_status(log_file)['status'] in ('incomplete', 'empty'):
+        os.replace(log_file, log_file + '.partial')
+        print(f"{log_file} was not finished, moved to {log_file}.partial and running the job again")
+        return False
+    return True
+
 def mv_file(direct,pattern,destn,recreate=True):
 
     mv_list = glob.glob(os.path.join(direct, pattern))
@@ -105,69 +151,18 @@ def mv_file(direct,pattern,destn,recreate=True):
 
 def extrac_geom(log_file):
 
-    with open(log_file, 'r') as file:
-        lines = file.readlines()
-        distort_geom = {}
-    
-        # Find indices for lines with distortion info and standard orientation
-        normal_mode_indices = [i for i, line in enumerate(lines) if "Distortion along normal mode" in line]
-        
-        std_orient_indices = [i for i, line in enumerate(lines) if "Standard orientation" in line]
-        
-        if not normal_mode_indices:
-            raise ValueError("No 'Distortion along normal modes' found in the log file.")
-            
-        if not std_orient_indices:
-            raise ValueError("No 'Standard orientation' found in the log file.")
-    
-        for mode_index in normal_mode_indices:
-            mode_line = lines[mode_index]
-            match = re.search(r"normal mode N (\d+) by ([+-])\s*([\d.]+)", mode_line)
-            if match:
-                mode_num = match.group(1)
-                sign = match.group(2)
-                distortion_value = match.group(3)
-                key = f"{mode_num}_{sign}{distortion_value}"
-            else:
-                continue  
-            
-            std_index = next(i for i in std_orient_indices if i > mode_index)
-            coord_start = std_index + 5
-            
-            # Find the end of the coordinate table: stop at an empty line or a line with dashes
-            coord_end = coord_start
-            while coord_end < len(lines) and lines[coord_end].strip() and "-----" not in lines[coord_end]:
-                coord_end += 1
-            
-            # Extract coordinate lines and parse them.
-            coords = lines[coord_start:coord_end]
-            parsed_coords = []
-            
-            for line in coords:
-                parts = line.split()
-                if len(parts) >= 6 and parts[0].isdigit():
-                    # Center, Atomic Number, Type, X, Y, Z
-                    center = int(parts[0])
-                    atomic_num = int(parts[1])
-                    atomic_type = int(parts[2])
-                    x, y, z = map(float, parts[3:6])
-                    
-                    parsed_coords.append((atomic_num,x, y, z))
-            
-            # Store the parsed coordinates in the dictionary.
-            distort_geom[key] = parsed_coords
-            
-    return distort_geom
+    # Map each "Distortion along normal mode" header to the Standard orientation following it
+    return distorted_geometries(log_file)
    
-def generate_energy_com_file(direct,energy_com_file, geometry,state,method_basis,memory,cores):
+def generate_energy_com_file(direct,energy_com_file, geometry,state,method_basis,memory,cores,scratch_dir=None,guess=False):
 
     atomic_symbols = {
         1: 'H',  6: 'C', 7: 'N', 8: 'O', 9: 'F', 15: 'P', 16: 'S', 17: 'Cl'
     }
     com_content = f"""%nprocshared={cores}
 %mem={memory}GB
-%chk={energy_com_file}.chk
-# td=({state},nstates=10) {method_basis} 
+%chk={os.path.join(scratch_dir, energy_com_file) if scratch_dir else energy_com_file}.chk
+# td=({state},nstates=10) {method_basis} {'guess=read' if guess else ''}
 
 {energy_com_file}
 
@@ -187,7 +182,7 @@ def generate_energy_com_file(direct,energy_com_file, geometry,state,method_basis
     return 0
     
     
-def generate_soc(direct,file,geometry,method_basis,init_path,memory,cores):
+def generate_soc(direct,file,geometry,method_basis,init_path,memory,cores,scratch_dir=None,guess=False):
 
     atomic_symbols = {
         1: 'H',  6: 'C', 7: 'N', 8: 'O', 9: 'F', 15: 'P', 16: 'S', 17: 'Cl'
@@ -196,11 +191,19 @@ def generate_soc(direct,file,geometry,method_basis,init_path,memory,cores):
     soc_dir = os.path.join(direct, file)
     os.makedirs(soc_dir,exist_ok=True)
     soc_file = file+'_soc'
-    soc_initial = f"""%rwf=gaussian.rwf
+    
+    # the rwf and chk files can be put on a scratch disk, pysoc finds them through symlinks
+    # (files left in soc_dir by a run without scratch stay there and are used in place)
+    rwf, chk = 'gaussian.rwf', 'gaussian.chk'
+    if scratch_dir:
+        linked = scratch.link_into(soc_dir, scratch_dir, [rwf, chk])
+        rwf, chk = [os.path.join(scratch_dir, name) if name in linked else name for name in (rwf, chk)]
+    
+    soc_initial = f"""%rwf={rwf}
 %nprocshared={cores}
 %mem={memory}GB
-%chk=gaussian.chk
-# td=(50-50,nstates=10) {method_basis} nosymm gfinput 
+%chk={chk}
+# td=(50-50,nstates=10) {method_basis} nosymm gfinput {'guess=read' if guess else ''}
 10f 6d
 
 {soc_file}
@@ -220,49 +223,75 @@ def generate_soc(direct,file,geometry,method_basis,init_path,memory,cores):
     shutil.copy(init_path, soc_dir)
     
     print(f"Copied init.py to {soc_dir}")
-    return soc_dir
+    # the %chk file, a guess checkpoint has to be copied there
+    return soc_dir, os.path.join(soc_dir, chk)
 
-def generate_distort_mode(direct, dist_file, mode):
+def seed_checkpoint(guess_chk, chk_file):
+    
+    # every job gets its own copy of the equilibrium checkpoint, its SCF starts from those orbitals
+    if guess_chk:
+        shutil.copyfile(guess_chk, chk_file)
+
+@parse_cache.cached
+def index_distortions(dist_file):
+	"""
+	Byte offsets of the Link1 blocks of a multi-Link1 distortion input, found in one pass over the file.
+	Returns {mode: [(amplitude, start, end), ...]} with the amplitude as written in the header, e.g. '+0.5'.
+	The index is cached while the file is unchanged, so every mode reuses it.
+	"""
+	index = defaultdict(list)
+	with open(dist_file, 'rb') as file:
+		start = offset = 0
+		header = None
+		for line in file:
+			if line.startswith(b"--Link1--"):
+				if header:
+					index[header[0]].append((header[1], start, offset))
+				start, header = offset + len(line), None
+			elif b"Distortion along normal mode" in line:
+				match = distortion_pattern.search(line.decode('utf-8', errors='replace'))
+				if match:
+					mode_num, sign, distortion_value = match.groups()
+					header = (int(mode_num), sign + distortion_value)
+			offset += len(line)
+		# the file may end without a final --Link1--
+		if header:
+			index[header[0]].append((header[1], start, offset))
+	return dict(index)
 
-	with open(dist_file, 'r') as file:
-		lines = file.readlines()
+def generate_distort_mode(direct, dist_file, mode):
 
 	base = os.path.splitext(os.path.basename(dist_file))[0]
-	blocks = []
-	start = None
-
-	pattern = re.compile(rf"Distortion along normal mode N\s+{mode}\b")
-	
-	for i, line in enumerate(lines):
-
-		if pattern.search(line):
-
-			start = i - 4  # Assumes 4 lines before header
-		elif "--Link1--" in line and start is not None:
-
-			end = i - 1
-
-			blocks.append(lines[start:end])
-			start = None  # reset for next block
-
-    # Handle case where file ends without final --Link1--
-	if start is not None:
-		blocks.append(lines[start:])
+	blocks = index_distortions(dist_file).get(int(mode), [])
 
-    # Write each block to a separate file
+	# Write each block to a separate file, named by mode and amplitude as several amplitudes
+	# can have the same sign
 	files = []
-	for idx, block in enumerate(blocks):
-		distortion_line = next((line for line in block if "Distortion along normal mode" in line), "")
-		sign = "+" if "+" in distortion_line else "-"
-
-		outfile = f"{base}_{mode}_{sign}.com"
-		with open(os.path.join(direct, outfile), 'w') as f:
-			f.writelines(block)
-		print(f"Generated: {outfile}")
-		files.append(outfile)
+	with open(dist_file, 'rb') as file:
+		for amplitude, start, end in blocks:
+			file.seek(start)
+			outfile = f"{base}_{mode}_{amplitude}.com"
+			with open(os.path.join(direct, outfile), 'wb') as f:
+				f.write(file.read(end - start))
+			print(f"Generated: {outfile}")
+			files.append(outfile)
+			adopt_sign_named_log(direct, base, mode, amplitude)
 
 	return files
 
+def adopt_sign_named_log(direct, base, mode, amplitude):
+
+	# Older versions named the split files by sign only ({base}_{mode}_+.com). A finished log of
+	# such a job for the same amplitude is renamed, so the distortion job is not run again.
+	old_log = os.path.join(direct, f"{base}_{mode}_{amplitude[0]}.log")
+	new_log = os.path.join(direct, f"{base}_{mode}_{amplitude}.log")
+	if os.path.exists(new_log) or not os.path.isfile(old_log) or not termination_status(old_log)['normal']:
+		return
+	header = next((data for event, data in iter_events(old_log) if event == 'distortion'), None)
+	if header and header['mode'] == int(mode) and header['amplitude'] == float(amplitude):
+		os.replace(old_log, new_log)
+		print(f"Renamed {os.path.basename(old_log)} to {os.path.basename(new_log)}")
+
 
 def check_file_exists(file_path):
 
@@ -273,23 +302,8 @@ def check_file_exists(file_path):
         
 def get_soc(ref_soc_file):
     
-    check_file_exists(ref_soc_file) # checking file exists or not at given path
-    
-    soc = {} # in cm-1 
-    with open(ref_soc_file,'r') as file:
-        lines = file.readlines()
-    
-        for line in lines:
-            soc_val = line.split(":")[1].strip().split()[0]
-            soc_val = float(soc_val)
-            
-            parts = line.split("<")[1].split(">")[0]
-            states = parts.split('|')
-            singlet_state = states[0] 
-            triplet_state = states[2].split(",")[0] 
-    
-            soc[singlet_state,triplet_state] = soc_val 
-    return soc
+    # {(singlet, triplet): SOC in cm-1} with T* as T10, parsed once and cached while the file is unchanged
+    return soc_dataset.read_soc_out(ref_soc_file)
     
 def get_top_transitions(ref_soc_file, top_n=5):
 
@@ -308,11 +322,7 @@ def get_transitions(soc_file):
     singlets = ['S1','S2','S3','S4','S5','S6']
     for key,value in soc_dict.items():
         if key[0] in singlets:
-            if key[1] =='T*':
-                key = (key[0], 'T10')
-                transitions.append(key)
-            else:
-                transitions.append(key)
+            transitions.append(key)
     return transitions
     
 def parse_distortion_amplitude(folder_name):
@@ -334,36 +344,127 @@ def parse_distortion_amplitude(folder_name):
     return amp
  
  
-def plot_soc_vs_distortion(folder, normal_modes, get_soc, parse_distortion_amplitude):
+def render_soc_plot(out_files, m, transitions):
+    """
+    Draw one SOC vs distortion plot and save it to every file in out_files (svg, png, pdf...).
+    Runs in a worker process, transitions maps (singlet, triplet) -> list of (amplitude, SOC value).
+    """
+    plt.figure(figsize=(8, 5))
+    # Create a colormap with enough distinct colors for the transitions
+    #colors = plt.colormaps.get_cmap("tab10")(np.linspace(0, 1, len(transitions)))
+    colors = plt.get_cmap("tab10")(np.linspace(0, 1, len(transitions)))
+
+    # Plot each transition's data
+    for idx, (trans, points) in enumerate(sorted(transitions.items())):
+        # Sort the points by amplitude so the line plot is smooth
+        points = sorted(points, key=lambda x: x[0])
+        x_vals = [p[0] for p in points]
+        y_vals = [p[1] for p in points]
+        plt.plot(x_vals, y_vals, marker='o', linestyle='--', color=colors[idx],label = rf"$\langle \mathrm{{{trans[0]}}}|\hat{{\mathrm{{H}}}}|\mathrm{{{trans[1]}}} \rangle$")
+    
+    # Format the plot
+    plt.xlabel("Distortion Amplitude",fontsize=20)
+    plt.ylabel("SOC Value (cm⁻¹)",fontsize=20)
+    plt.xticks(fontsize=16)
+    plt.yticks(fontsize=16)
+
+    #plt.title(f"SOC vs Distortion for {singlet} in Mode {m} ({wor_dir})")
+    
+    plt.legend(title = f'Mode {m}',title_fontsize=16,bbox_to_anchor=(1.05, 1), loc="upper left", fontsize=14)
+    plt.tight_layout()
+    
+    # Save and display the plot
+    for out_filename in out_files:
+        plt.savefig(out_filename)
+    #plt.show()
+    plt.close() 
+    return out_files
+
+def plot_signature(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+def plot_soc_vs_distortion(folder, normal_modes, get_soc, parse_distortion_amplitude, db_file=None, molecule=None,
+                           formats=('svg',), max_workers=None, force=False, dataset=None):
     """
     For each mode in 'folder', create 6 plots (one for each singlet state S1 to S6) and similarly for triplets.
     Each plot shows SOC vs. distortion amplitude for transitions starting from that singlet.
+    The SOC values are read from dataset (soc_dataset.load) if given, else from the results database
+    if db_file is given, else from the soc_out.dat files.
+    
+    The plots are rendered in a process pool (max_workers processes) in every format of 'formats'.
+    Plots whose data did not change since the last run (recorded in .plot_manifest.json) are not
+    redrawn unless force is True.
     """
     singlets = ['S1','S2','S3','S4','S5','S6']
     wor_dir = os.path.basename(folder)
     
+    manifest_file = os.path.join(folder, '.plot_manifest.json')
+    manifest = {}
+    if not force and check_file_exists(manifest_file):
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+    
+    def out_files(m, singlet):
+        return [os.path.join(folder, f"soc_vs_disto_mode{m}_{singlet}_{wor_dir}.{fmt}") for fmt in formats]
+    
+    def up_to_date(m, singlet, signature):
+        return all(manifest.get(out) == signature and os.path.isfile(out) for out in out_files(m, singlet))
+    
+    tasks = []
     # Loop over each mode.
     for m in  normal_modes:
-        # Find all folders corresponding to the current mode
-        soc_folders = glob.glob(os.path.join(folder, f'*soc_dis_{m}_*'))
-        
         # Data structure: for each state, store a dictionary mapping
         # each transition (tuple) to a list of (distortion amplitude, SOC value) pairs.
         data = {s: defaultdict(list) for s in singlets}
+        
+        if dataset is not None:
+            # only the slices of this mode are read from the memory mapped array
+            mode_signature = []
+            for singlet in singlets:
+                for triplet, (amps, values) in soc_dataset.curves(dataset, int(m), singlet).items():
+                    data[singlet][singlet, triplet] = list(zip(amps.tolist(), values.tolist()))
+                    mode_signature.append((singlet, triplet, amps.tolist(), values.tolist()))
+            mode_signature = plot_signature(mode_signature)
+            soc_folders = []
+        elif db_file:
+            rows = results_db.load_soc_curves(db_file, molecule, m)
+            mode_signature = plot_signature(rows)
+            for amp, singlet, triplet, value in rows:
+                # databases of older runs have T10 stored as T*
+                key = (soc_dataset.normalize_state(singlet), soc_dataset.normalize_state(triplet))
+                if key[0] in singlets:
+                    data[key[0]][key].append((amp, value))
+            soc_folders = []
+        else:
+            # Find all folders corresponding to the current mode
+            soc_folders = sorted(glob.glob(os.path.join(folder, f'*soc_dis_{m}_*')))
+            
+            # the soc_out.dat files are only parsed if one of them changed since the last plot
+            inputs = []
+            for fold in soc_folders:
+                dat_file = os.path.join(fold, 'soc_out.dat')
+                if check_file_exists(dat_file):
+                    stat = os.stat(dat_file)
+                    inputs.append((dat_file, stat.st_mtime_ns, stat.st_size))
+            mode_signature = plot_signature(inputs)
+            plotted = [singlet for singlet in singlets if any(out in manifest for out in out_files(m, singlet))]
+            if plotted and all(up_to_date(m, singlet, plot_signature(mode_signature, singlet)) for singlet in plotted):
+                print(f"Plots of mode {m} are up to date")
+                continue
 
         for fold in soc_folders:
             # Extract the distortion amplitude from the folder name
             amp = parse_distortion_amplitude(os.path.basename(fold))
             dat_file = os.path.join(fold, 'soc_out.dat')
+            if not check_file_exists(dat_file):
+                print(f"Skipping {fold}, soc_out.dat not found")
+                continue
             
             # Read the SOC dictionary from the file
             soc = get_soc(dat_file)
             for key, value in soc.items():
                 # Only consider transitions where the singlet is in our list
                 if key[0] in singlets:
-                    # Adjust the triplet state if necessary (replace 'T*' with 'T10')
-                    if key[1] == 'T*':
-                        key = (key[0], 'T10')
                     # Append the amplitude and SOC value under the appropriate singlet's data
                     data[key[0]][key].append((amp, value))
         
@@ -373,105 +474,470 @@ def plot_soc_vs_distortion(folder, normal_modes, get_soc, parse_distortion_ampli
             if not transitions:
                 # If no transitions for this singlet in the current mode, skip plotting.
                 continue
-            
-            plt.figure(figsize=(8, 5))
-            # Create a colormap with enough distinct colors for the transitions
-            #colors = plt.colormaps.get_cmap("tab10")(np.linspace(0, 1, len(transitions)))
-            colors = plt.get_cmap("tab10")(np.linspace(0, 1, len(transitions)))
-
-            # Plot each transition's data
-            for idx, (trans, points) in enumerate(sorted(transitions.items())):
-                # Sort the points by amplitude so the line plot is smooth
-                points = sorted(points, key=lambda x: x[0])
-                x_vals = [p[0] for p in points]
-                y_vals = [p[1] for p in points]
-                plt.plot(x_vals, y_vals, marker='o', linestyle='--', color=colors[idx],label = rf"$\langle \mathrm{{{trans[0]}}}|\hat{{\mathrm{{H}}}}|\mathrm{{{trans[1]}}} \rangle$")
-            
-            # Format the plot
-            plt.xlabel("Distortion Amplitude",fontsize=20)
-            plt.ylabel("SOC Value (cm⁻¹)",fontsize=20)
-            plt.xticks(fontsize=16)
-            plt.yticks(fontsize=16)
+            signature = plot_signature(mode_signature, singlet)
+            if up_to_date(m, singlet, signature):
+                continue
+            tasks.append((out_files(m, singlet), m, dict(transitions), signature))
+    
+    if not tasks:
+        print("All plots are up to date")
+        return []
+    
+    print(f"Rendering {len(tasks)} plots")
+    rendered = []
+    # spawn, not fork: the scratch monitor, batch poller and job runner threads may still be running
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(render_soc_plot, outs, m, transitions): signature
+                   for outs, m, transitions, signature in tasks}
+        for future in as_completed(futures):
+            try:
+                outs = future.result()
+            except Exception as e:
+                print(f"Error rendering plot: {e}")
+                continue
+            for out in outs:
+                manifest[out] = futures[future]
+            rendered.extend(outs)
+    
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return rendered
 
-            #plt.title(f"SOC vs Distortion for {singlet} in Mode {m} ({wor_dir})")
-            
-            plt.legend(title = f'Mode {m}',title_fontsize=16,bbox_to_anchor=(1.05, 1), loc="upper left", fontsize=14)
-            plt.tight_layout()
-            
-            # Save and display the plot
-            out_filename = os.path.join(folder, f"soc_vs_disto_mode{m}_{singlet}_{wor_dir}.svg")
-            plt.savefig(out_filename)
-            #plt.show()
-            plt.close() 
 
+def set_resources(com_file, memory, cores):
+    """
+    Replace the %nprocshared and %mem lines of every job in com_file by cores and memory (GB).
+    """
+    with open(com_file, 'r') as file:
+        lines = file.readlines()
+    
+    link0 = [f"%nprocshared={cores}\n", f"%mem={memory}GB\n"]
+    new_lines = list(link0)
+    for line in lines:
+        if line.strip().lower().startswith(('%nprocshared=', '%nproc=', '%mem=')):
+            continue
+        new_lines.append(line)
+        if line.strip().lower() == '--link1--':
+            new_lines.extend(link0)
+    
+    with open(com_file, 'w') as file:
+        file.writelines(new_lines)
+
+def distortion_stage(sing_folder, dist_file, memory=None, cores=None):
+    
+    com_file = os.path.join(sing_folder,dist_file)
+    file_log = com_file.replace('.com','.log')
+    
+    if finished_log(file_log):
+        check_gaussian_log(file_log)
+    elif job_cache.fetch(com_file, {'job.log': file_log}, include_title=True):
+        # the title holds the mode and amplitude read by extrac_geom, so it is part of the key
+        check_gaussian_log(file_log)
+    else:
+        # the split input keeps the %nprocshared/%mem of distort.f90, the job gets its share instead
+        if memory and cores:
+            set_resources(com_file, memory, cores)
+        run_gaussian(com_file)
+        check_gaussian_log(file_log)
+        job_cache.store(com_file, {'job.log': file_log}, include_title=True)
+    
+    print("Geometry Extraction")
+    distort_geom = extrac_geom(file_log)
+    return next(iter(distort_geom.items()))
+
+def energy_stage(sing_folder, method_basis, memory, cores, db_file, molecule, geom, guess_chk=None):
+    
+    key, value = geom
+    scratch_dir = scratch.job_dir(f"energy_dis_{key}")
+    generate_energy_com_file(sing_folder,f"energy_dis_{key}",value,'singlets',method_basis,memory,cores,scratch_dir,bool(guess_chk))
+    ergy_file = f'energy_dis_{key}.com'
+    dist_val = key.split('_')[-1]
+    
+    vee_folder = os.path.join(sing_folder, f'VEE{dist_val}')
+    os.makedirs(vee_folder, exist_ok=True)
+    log_file = os.path.join(vee_folder,ergy_file).replace('.com','.log')
+    
+    if finished_log(log_file):
+        check_gaussian_log(log_file)
+    else:
+        print(f"\n{log_file} doesnt exists")
+        com_file = os.path.join(sing_folder,ergy_file)
+        if not job_cache.fetch(com_file, {'job.log': com_file.replace('.com','.log')}):
+            seed_checkpoint(guess_chk, os.path.join(scratch_dir or sing_folder, f"energy_dis_{key}.chk"))
+            run_gaussian(com_file)
+        mv_file(sing_folder,f'energy_dis_{key}.*',f'VEE{dist_val}',recreate=False)
+        check_gaussian_log(log_file)
+        job_cache.store(os.path.join(vee_folder,ergy_file), {'job.log': log_file})
+    
+    # the checkpoint of the energy job is not used afterwards
+    if scratch_dir:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    elif check_file_exists(os.path.join(vee_folder, f"energy_dis_{key}.chk")):
+        os.remove(os.path.join(vee_folder, f"energy_dis_{key}.chk"))
+    
+    if db_file:
+        singlet_energies, triplet_energies = excited_state_energies(log_file)
+        results_db.store_energies(db_file, molecule, key.split('_')[0], parse_distortion_amplitude(key), singlet_energies)
+    return log_file
+
+def pysoc_inputs(com_file):
+    # soc_out.dat depends on the pysoc settings in init.py too, so they are part of the cache key
+    init_file = os.path.join(os.path.dirname(com_file), 'init.py')
+    return [init_file] if os.path.isfile(init_file) else []
+
+def soc_stage(sing_folder, method_basis, init_path, memory, cores, geom, guess_chk=None):
+    
+    key, value = geom
+    # named after the SOC folder in the study, the mode screening jobs (screen/soc_dis_*) get their own
+    scratch_dir = scratch.job_dir(scratch.job_name(os.path.join(sing_folder, f"soc_dis_{key}")))
+    soc_dir, chk_file = generate_soc(sing_folder,f"soc_dis_{key}",value,method_basis,init_path,memory,cores,scratch_dir,bool(guess_chk))
+    
+    com_file = os.path.join(sing_folder, f"soc_dis_{key}", "gaussian.com")
+    log_file = com_file.replace('.com','.log')
+    soc_file = os.path.join(sing_folder, f"soc_dis_{key}", "soc_out.dat")
+    
+    if finished_log(log_file):
+        check_gaussian_log(log_file)
+    elif job_cache.fetch(com_file, {'job.log': log_file, 'soc_out.dat': soc_file}, inputs=pysoc_inputs(com_file)):
+        # soc_out.dat comes from the cache too, so pysoc is not needed
+        check_gaussian_log(log_file)
+    else:
+        seed_checkpoint(guess_chk, chk_file)
+        run_gaussian(com_file)
+        check_gaussian_log(log_file)
+    return [key, com_file]
+
+def pysoc_stage(db_file, molecule, soc_job, singlets_from_soc=False):
+    
+    key, com_file = soc_job
+    log_file = com_file.replace('.com','.log')
+    soc_file = os.path.join(os.path.dirname(com_file), "soc_out.dat")
+    
+    if not check_file_exists(soc_file):
+        run_pysoc(com_file)
+        if not check_file_exists(soc_file):
+            raise RuntimeError(f"Error: pysoc.py did not write {soc_file}.")
+        job_cache.store(com_file, {'job.log': log_file, 'soc_out.dat': soc_file}, inputs=pysoc_inputs(com_file))
+    
+    # pysoc is done with the rwf and chk files
+    freed = scratch.cleanup(os.path.dirname(com_file))
+    if freed:
+        print(f"Removed {freed / 1024**2:.1f} MB of scratch files of {os.path.dirname(com_file)}")
+    
+    if db_file:
+        # the 50-50 job gives the triplet energies, singlets are stored from the energy job
+        # unless there is no energy job (merge_energy)
+        mode, amp = key.split('_')[0], parse_distortion_amplitude(key)
+        singlet_energies, triplet_energies = excited_state_energies(log_file)
+        results_db.store_energies(db_file, molecule, mode, amp, triplet_energies)
+        if singlets_from_soc:
+            results_db.store_energies(db_file, molecule, mode, amp, singlet_energies)
+        results_db.store_soc(db_file, molecule, mode, amp, get_soc(soc_file))
+    return soc_file
+
+def merge_check_stage(energy_log, soc_job):
+    
+    # singlet energies of the same geometry from the singlets energy job and from the 50-50 SOC job
+    key, com_file = soc_job
+    energy_singlets, _ = excited_state_energies(energy_log)
+    soc_singlets, _ = excited_state_energies(com_file.replace('.com','.log'))
+    states = [state for state in energy_singlets if state in soc_singlets]
+    if not states:
+        raise RuntimeError(f"No common singlet states in {energy_log} and the SOC log of {key}")
+    diffs = {state: abs(energy_singlets[state] - soc_singlets[state]) for state in states}
+    worst = max(diffs, key=diffs.get)
+    print(f"Merge check {key}: largest singlet difference {diffs[worst]:.4f} eV ({worst}) over {len(states)} states")
+    return {'key': key, 'max_diff': diffs[worst], 'state': worst, 'states': len(states)}
+
+def geometry_stage(key, geometry, memory=None, cores=None):
+    # geometry computed in python, nothing to run
+    return [key, geometry]
+
+def screen_modes(sing_folder, state_file, freq_log, normal_modes, method_basis, init_path, memory, cores, max_jobs,
+                 amplitude=0.1, n_transitions=5, guess_chk=None):
+    """
+    Rank the normal modes by how fast the largest SOC values change along them, from one SOC job
+    at the equilibrium geometry and one at +amplitude for every mode (in singlets/screen).
+    Returns a list of (mode, dSOC/dQ in cm-1/Angstrom) sorted from the most sensitive mode.
+    """
+    screen_folder = os.path.join(sing_folder, 'screen')
+    os.makedirs(screen_folder, exist_ok=True)
+    
+    nm = read_normal_modes(freq_log)
+    equilibrium = [(int(A), x, y, z) for A, (x, y, z) in zip(nm['atomic_numbers'], nm['coords'].tolist())]
+    geometries = {'eq': equilibrium}
+    geometries.update(displaced_geometries(freq_log, normal_modes, [amplitude]))
+    
+    jobs = {}
+    for key, geometry in geometries.items():
+        soc = partial(soc_stage, screen_folder, method_basis, init_path, memory, cores, [key, geometry], guess_chk=guess_chk)
+        jobs[f"screen:{key}:soc"] = (workflow_state.tracked(state_file, f"screen:{key}:soc", soc), [])
+        jobs[f"screen:{key}:pysoc"] = (workflow_state.tracked(state_file, f"screen:{key}:pysoc", partial(pysoc_stage, None, None)),
+                                       [f"screen:{key}:soc"])
+    workflow_state.add_pending(state_file, jobs)
+    results, failed = run_jobs(jobs, max_jobs, can_start=lambda name: name.endswith(':pysoc') or scratch.has_space(),
+                               cancel=getattr(executor, 'cancel', None))
+    workflow_state.record_skipped(state_file, failed)
+    if 'screen:eq:pysoc' not in results:
+        raise RuntimeError(f"Mode screening failed at the equilibrium geometry: {failed}")
+    
+    # the transitions with the largest SOC at the equilibrium geometry decide
+    ref_soc_file = results['screen:eq:pysoc']
+    reference = get_soc(ref_soc_file)
+    transitions = get_top_transitions(ref_soc_file, n_transitions)
+    
+    ranking = []
+    for mode in normal_modes:
+        key = geometry_key(mode, amplitude)
+        if f"screen:{key}:pysoc" not in results:
+            print(f"Mode screening failed for mode {mode}, it is not ranked")
+            continue
+        displaced = get_soc(results[f"screen:{key}:pysoc"])
+        # a truncated soc_out.dat can miss some of the transitions
+        common = [t for t in transitions if t in displaced]
+        if not common:
+            print(f"None of the screened transitions found in the SOC output of mode {mode}, it is not ranked")
+            continue
+        slope = max(abs(displaced[t] - reference[t]) for t in common) / abs(amplitude)
+        ranking.append((int(mode), slope))
+    ranking.sort(key=lambda r: r[1], reverse=True)
+    
+    with open(os.path.join(screen_folder, 'mode_screening.dat'), 'w') as f:
+        f.write("# mode  max |dSOC/dQ| (cm-1/Angstrom) over " + " ".join(f"{s}-{t}" for s, t in transitions) + "\n")
+        for mode, slope in ranking:
+            f.write(f"{mode:>6}  {slope:.4f}\n")
+    return ranking
 
-def main(distort_file,inp_sing_file,normal_modes,method_basis,init_path,memory,cores):
+def main(distort_file,inp_sing_file,normal_modes,method_basis,init_path,memory,cores,max_jobs=1,db_file=None,use_cache=True,build_profile='default',freq_log=None,amplitudes=None,plot_formats=('svg',),scratch_dir=None,scratch_cap_gb=None,auto_resources=False,merge_energy=False,validate_merge=0,guess_chk=None,adaptive_tolerance=None,adaptive_rounds=3,min_step=0.05,screen_top=None,screen_amplitude=0.1,screen_method_basis=None):
 
-	run_distort(distort_file,inp_sing_file)
+	sing_folder = os.path.join(cwd,'singlets')
+	os.makedirs(sing_folder, exist_ok=True)
+	
+	# Status of every stage is saved here, stages which are done are skipped on a restart.
+	# Run "python3 workflow_state.py" to see the progress.
+	state_file = os.path.join(sing_folder, 'workflow_state.json')
+	stale = workflow_state.reset_running(state_file)
+	if stale:
+		print(f"{len(stale)} stages were left running by an earlier run, they are run again")
+	
+	# Wall/CPU time and memory of every stage, "python3 run_report.py" ranks the slowest ones
+	run_report.configure(os.path.join(sing_folder, 'run_report.jsonl'))
+	
+	if freq_log:
+		print(f"Distorted geometries are generated from the normal modes in {freq_log}")
+	elif workflow_state.is_done(state_file, 'run_distort'):
+		print("Skipping run_distort, already done")
+	else:
+		with run_report.stage('run_distort'):
+			distorted = run_distort(distort_file,inp_sing_file,build_profile)
+		if distorted:
+			workflow_state.update(state_file, 'run_distort', status='done')
 	
 	#mv_file(cwd,'*dist_sing*','singlets',recreate=False)
 	
-	sing_folder = os.path.join(cwd,'singlets')
-	os.makedirs(sing_folder, exist_ok=True)
-	sing_list = glob.glob(os.path.join(cwd,'*dist_sing*'))
+	# SOC values and energies of every geometry are also saved in a sqlite database
+	if db_file is None:
+		db_file = os.path.join(sing_folder, 'results.db')
+	molecule = results_db.default_molecule(cwd)
+	
+	# finished jobs are reused for identical inputs (same route, charge and geometry)
+	job_cache.enabled = use_cache
+	
+	# rwf/chk files go to scratch_dir (or $GAUSSIAN_SCRATCH) if given, new jobs wait while
+	# the scratch usage is above scratch_cap_gb
+	scratch.configure(sing_folder, scratch_dir, scratch_cap_gb)
+	scratch.start_monitor()
+	
+	sing_list = [] if freq_log else glob.glob(os.path.join(cwd,'*dist_sing*'))
 	print("sing_list",sing_list) #debugging
+	
+	# The SCF of the energy and soc jobs starts from the orbitals of the equilibrium structure,
+	# by default from the checkpoint next to freq_log
+	if guess_chk is None and freq_log and os.path.isfile(os.path.splitext(freq_log)[0] + '.chk'):
+		guess_chk = os.path.splitext(freq_log)[0] + '.chk'
+	if guess_chk:
+		guess_chk = os.path.abspath(guess_chk)
+		if not os.path.isfile(guess_chk):
+			raise FileNotFoundError(f"Checkpoint for the initial guess {guess_chk} not found")
+		print(f"Initial guess of every energy and soc job read from {guess_chk}")
+	
+	# Only the screen_top modes whose largest SOC values change fastest get the full sweep,
+	# screened with one small displacement each (with screen_method_basis if it is cheaper)
+	if screen_top and freq_log:
+		screen_cores, screen_memory = split_resources(cores, memory, max_jobs)
+		with run_report.stage('screen'):
+			ranking = screen_modes(sing_folder, state_file, freq_log, normal_modes, screen_method_basis or method_basis, init_path,
+			                       screen_memory, screen_cores, max_jobs, screen_amplitude, guess_chk=guess_chk)
+		print("Mode screening, max |dSOC/dQ| in cm-1/Angstrom:")
+		for mode, slope in ranking:
+			print(f"  mode {mode:>4}: {slope:.3f}")
+		normal_modes = [mode for mode, slope in ranking[:screen_top]]
+		print(f"Running the full sweep for modes {normal_modes}")
+	elif screen_top:
+		print("Mode screening needs the geometries from freq_log, running all the modes")
+	
+	# The first stage of every pipeline gives the distorted geometry, either from a Gaussian
+	# distortion job on the distort.f90 input or directly from the normal modes of freq_log
+	geometry_jobs = {}
 	for idx,file in enumerate (sing_list,start=1):
 		print("file",file)
 		for mode in normal_modes:
 			print("mode",mode)
-			files = generate_distort_mode(sing_folder,file,mode)
+			split_name = f"{os.path.basename(file)}:{mode}:split"
+			if any(name.endswith((f"_{mode}_+.com", f"_{mode}_-.com")) for name in workflow_state.stored_result(state_file, split_name) or []):
+				# split by an older version, which named the files by sign only and so kept one
+				# amplitude per sign: split again, the distortion jobs run under the new names
+				print(f"Splitting {os.path.basename(file)} again for mode {mode}, the files are named by amplitude now")
+				workflow_state.update(state_file, split_name, status='pending', result=None)
+			files = workflow_state.tracked(state_file, split_name, generate_distort_mode)(sing_folder,file,mode)
 			print(files)
 			for dist_file in files:
-				print("dist_file",dist_file)
-				file_log = os.path.join(sing_folder,dist_file).replace('.com','.log')
-				
-				if (check_file_exists(file_log)):
-					check_gaussian_log(file_log)
-					
-				else:
-					run_gaussian(os.path.join(sing_folder,dist_file))
-					check_gaussian_log(file_log)
-				
-				print("Geometry Extraction")
-				distort_geom = extrac_geom(os.path.join(sing_folder,file_log))
-
-				key, value = next(iter(distort_geom.items()))
-				generate_energy_com_file(sing_folder,f"energy_dis_{key}",value,'singlets',method_basis,memory,cores)
-				ergy_file = f'energy_dis_{key}.com'
-				mode = key.split('_')[-2]
-				dist_val = key.split('_')[-1]
-				
-				vee_folder = os.path.join(sing_folder, f'VEE{key.split("_")[-1]}')
-				os.makedirs(vee_folder, exist_ok=True)
-				log_file = os.path.join(vee_folder,ergy_file).replace('.com','.log')
-				
-				if (check_file_exists(log_file)):
-					check_gaussian_log(log_file)					
+				geometry_jobs[os.path.splitext(dist_file)[0]] = (partial(distortion_stage, sing_folder, dist_file), mode)
+	
+	if freq_log:
+		# as in the geometry keys and the database, so the adaptive sampling finds the computed points
+		amplitudes = list(dict.fromkeys(key_amplitude(a) for a in amplitudes))
+	
+	if freq_log and adaptive_tolerance and len(set(amplitudes)) < 3:
+		# the curvature of a SOC curve needs 3 points, with 2 every interval would be split
+		if 0 not in amplitudes:
+			amplitudes = sorted(list(amplitudes) + [0.0])
+			print(f"Adaptive sampling needs at least 3 starting amplitudes, added the equilibrium geometry: {amplitudes}")
+		if len(set(amplitudes)) < 3:
+			raise ValueError(f"Adaptive sampling needs at least 3 starting amplitudes, got {amplitudes}")
+	
+	if freq_log:
+		# all displacements in one go: (modes x amplitudes x atoms x 3)
+		for key, geometry in displaced_geometries(freq_log, normal_modes, amplitudes).items():
+			geometry_jobs[f"{molecule}_{key}"] = (partial(geometry_stage, key, geometry), int(key.split('_')[0]))
+	
+	# cores and memory are shared between the jobs running at the same time
+	atoms = []
+	if auto_resources:
+		atoms = read_normal_modes(freq_log)['atomic_numbers'] if freq_log else resource_planner.read_atoms(sing_list[0]) if sing_list else []
+		if not len(atoms):
+			print("No distorted geometry to size the jobs from, splitting cores and memory between max_jobs")
+	if len(atoms):
+		# number of jobs at a time and %nprocshared/%mem from the molecule size and earlier runs,
+		# the energy and soc jobs of every geometry can run at the same time
+		resources = resource_planner.plan_study(list(atoms), method_basis, (1 if merge_energy else 2) * len(geometry_jobs), cores, memory,
+		                                        run_report.report_file)
+		resource_planner.print_plan(resources)
+		max_jobs, job_cores, job_memory = resources['max_jobs'], resources['cores'], resources['memory']
+	else:
+		job_cores, job_memory = split_resources(cores, memory, max_jobs)
+	print(f"Running up to {max_jobs} jobs at a time with {job_cores} cores and {job_memory}GB each")
+	
+	# Amplitudes computed so far for every mode, used by the adaptive sampling
+	mode_amplitudes = {int(mode): sorted(amplitudes) for mode in normal_modes} if freq_log else {}
+	if adaptive_tolerance and not freq_log:
+		print("Adaptive sampling needs the geometries from freq_log, using the amplitudes of the distortion input")
+	
+	all_jobs, results, failed = {}, {}, {}
+	rounds = 0
+	while geometry_jobs:
+		# With merge_energy the singlet energies are taken from the 50-50 SOC job and there is no
+		# energy job, except on validate_merge geometries spread over the study, where both are
+		# compared (merge_check).
+		names = list(geometry_jobs)
+		sample = names[::max(1, len(names) // validate_merge)][:validate_merge] if merge_energy and validate_merge and not all_jobs else []
+	
+		# Every (mode, sign) geometry is an independent pipeline:
+		# distortion job -> energy job
+		#                -> soc job -> pysoc
+		jobs = {}
+		for name, (geometry_job, mode) in geometry_jobs.items():
+			stages = {
+				'dist': (partial(geometry_job, memory=job_memory, cores=job_cores), []),
+				'energy': (partial(energy_stage, sing_folder, method_basis, job_memory, job_cores, db_file, molecule, guess_chk=guess_chk), ['dist']),
+				'soc': (partial(soc_stage, sing_folder, method_basis, init_path, job_memory, job_cores, guess_chk=guess_chk), ['dist']),
+				'pysoc': (partial(pysoc_stage, db_file, molecule, singlets_from_soc=merge_energy), ['soc']),
+			}
+			if merge_energy:
+				if name in sample:
+					# energy job only for the comparison, the database gets the singlets of the SOC job
+					stages['energy'] = (partial(energy_stage, sing_folder, method_basis, job_memory, job_cores, None, molecule, guess_chk=guess_chk), ['dist'])
+					stages['merge_check'] = (merge_check_stage, ['energy', 'soc'])
 				else:
-					print(f"\n{log_file} doesnt exists")
-					run_gaussian(os.path.join(sing_folder,ergy_file))
-					mv_file(sing_folder,f'*energy_dis_{key}*',f'VEE{dist_val}',recreate=False)
-					check_gaussian_log(log_file)
-					
-				generate_soc(sing_folder,f"soc_dis_{key}",value,method_basis,init_path,memory,cores)
-					
-				log_file = os.path.join(sing_folder, f"soc_dis_{key}", "gaussian.com").replace('.com','.log')
-				if (check_file_exists(log_file)):
-					
-					check_gaussian_log(log_file)
-						
+					del stages['energy']
+			pipeline_done = all(workflow_state.is_done(state_file, f"{name}:{stage}") for stage in stages)
+			for stage, (func, deps) in stages.items():
+				job = f"{name}:{stage}"
+				if stage == 'dist' and workflow_state.is_done(state_file, job):
+					# the geometries are not kept in the state file, a done dist stage reads them again
+					# (without a new report record) for the later stages, unless they are all done too
+					func = (lambda: None) if pipeline_done else func
 				else:
-						
-					run_gaussian(os.path.join(sing_folder, f"soc_dis_{key}", "gaussian.com"))
-					check_gaussian_log(log_file)
-
-				run_pysoc(os.path.join(sing_folder, f"soc_dis_{key}", "gaussian.com"))
-				
+					func = run_report.timed(stage, job, func, mode=int(mode), guess=bool(guess_chk))
+				jobs[job] = (workflow_state.tracked(state_file, job, func, store_result=stage != 'dist'), [f"{name}:{d}" for d in deps])
+	
+		workflow_state.add_pending(state_file, jobs)
+		if hasattr(executor, 'set_limit'):
+			executor.set_limit(max_jobs)
+		# pysoc frees the scratch files of its SOC job, everything else waits for space.
+		# On Ctrl-C the running Gaussian/pysoc processes are stopped too.
+		round_results, round_failed = run_jobs(jobs, max_jobs, can_start=lambda name: name.endswith(':pysoc') or scratch.has_space(),
+		                                       cancel=getattr(executor, 'cancel', None))
+		# jobs skipped because a dependency failed are shown as failed by "python3 workflow_state.py"
+		workflow_state.record_skipped(state_file, round_failed)
+		all_jobs.update(jobs)
+		results.update(round_results)
+		failed.update(round_failed)
+		
+		# Adaptive sampling: more amplitudes where the SOC curves bend or states cross
+		geometry_jobs = {}
+		if adaptive_tolerance and freq_log and rounds < adaptive_rounds:
+			rounds += 1
+			added = adaptive_sampling.refine(db_file, molecule, mode_amplitudes, adaptive_tolerance, min_step)
+			for mode, amps in added.items():
+				amps = [a for a in dict.fromkeys(key_amplitude(a) for a in amps) if a not in mode_amplitudes[mode]]
+				mode_amplitudes[mode] = sorted(mode_amplitudes[mode] + amps)
+				for key, geometry in displaced_geometries(freq_log, [mode], amps).items():
+					geometry_jobs[f"{molecule}_{key}"] = (partial(geometry_stage, key, geometry), mode)
+			print(f"Adaptive sampling round {rounds}: {len(geometry_jobs)} new geometries")
 	
-	plot_soc_vs_distortion(sing_folder, normal_modes, get_soc, parse_distortion_amplitude)
+	if hasattr(executor, 'print_progress'):
+		executor.print_progress()
+	print(f"Peak scratch usage: {scratch.stop_monitor() / 1024**2:.1f} MB")
+	
+	# all SOC values of the study in one array (singlets/soc.npy), the plots read their slices of it
+	shape = soc_dataset.build(sing_folder, db_file, molecule)
+	print(f"SOC dataset: {shape[0]} modes x {shape[1]} amplitudes x {shape[2]} singlets x {shape[3]} triplets")
+	
+	with run_report.stage('plot'):
+		plot_soc_vs_distortion(sing_folder, normal_modes, get_soc, parse_distortion_amplitude, db_file=db_file, molecule=molecule,
+		                       formats=plot_formats, max_workers=max_jobs, dataset=soc_dataset.load(sing_folder))
+	
+	print(f"Stage timings written to {run_report.report_file}, run 'python3 run_report.py' for a summary")
+	
+	# SCF cycles of the energy and soc jobs with and without the equilibrium guess, over all recorded runs
+	for guess, (count, mean) in run_report.scf_summary(run_report.load(run_report.report_file, all_runs=True)).items():
+		print(f"SCF cycles per energy/soc job {'with' if guess else 'without'} the equilibrium guess: {mean:.1f} ({count} jobs)")
+	
+	checks = [results[name] for name in results if name.endswith(':merge_check')]
+	if checks:
+		worst = max(checks, key=lambda c: c['max_diff'])
+		print(f"Merged energy/SOC jobs checked on {len(checks)} geometries, largest singlet difference "
+		      f"{worst['max_diff']:.4f} eV ({worst['key']} {worst['state']})")
+		if worst['max_diff'] > merge_tolerance:
+			print(f"WARNING: above {merge_tolerance} eV, the singlet energies of the SOC jobs should not replace the energy jobs")
+	
+	if use_cache:
+		stats = job_cache.save_stats(os.path.join(sing_folder, 'job_cache_stats.jsonl'))
+		print(f"Job cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries ({stats['size_gb']:.2f} GB)")
+	
+	# parsed soc_out.dat files and logs reused within this run (the plot workers have their own)
+	stats = parse_cache.stats()
+	print(f"Parse cache: {stats['hits']} hits, {stats['misses']} misses ({100 * stats['hit_rate']:.0f}%), "
+	      f"{stats['evictions']} evictions, {stats['entries']} entries ({stats['size_mb']:.1f} MB)")
 	
 	print("\n***********************************************************")
-	print("Done !!!!!!!")
+	if failed:
+		print(f"{len(failed)} of {len(all_jobs)} jobs failed:")
+		for name, error in failed.items():
+			print(f"  {name}: {error}")
+	else:
+		print("Done !!!!!!!")
 
 cwd = os.getcwd()
 
@@ -493,5 +959,28 @@ if __name__ == "__main__":
     init_path = "/home/apogean/sharan/init.py" # Add path of the init.py file from your system
     memory = 60 # Memory in GB
     cores = 25 # no of cores to use for gaussian 
+    max_jobs = 1 # no of gaussian jobs to run at the same time, cores and memory are split between them
+    merge_energy = False # True: singlet energies from the 50-50 SOC job, no separate energy job per geometry
+    validate_merge = 0 # with merge_energy, no of geometries on which the energy job still runs for comparison
+    guess_chk = None # checkpoint of the equilibrium structure (e.g. of the opt+freq job), the SCF of
+                     # every energy and soc job starts from its orbitals (guess=read)
+    auto_resources = False # True: choose max_jobs and the cores/memory of each job from the molecule size
+                           # and the timings of earlier runs, memory and cores are then the node totals
+    
+    # To make the distorted geometries in python from the normal modes of the opt+freq log
+    # (instead of distort.f90 and one Gaussian job per displacement), give the log and the amplitudes
+    freq_log = None # e.g. "molecule_opt+freq.log"
+    amplitudes = [-0.5, 0.5] # displacements in Angstrom along the normalized modes
+    # With freq_log, more amplitudes are added between these where a SOC curve bends by more than
+    # adaptive_tolerance (cm-1) or states cross, e.g. adaptive_tolerance = 1. This needs at least 3
+    # starting amplitudes, 0 is added to the grid above when adaptive_tolerance is set
+    adaptive_tolerance = None
+    # With freq_log, screen all normal_modes with one small displacement each and only run the
+    # full sweep for the screen_top modes whose SOC changes fastest (e.g. screen_top = 5)
+    screen_top = None
+    screen_method_basis = None # cheaper level of theory for the screening, e.g. "b3lyp/6-31g(d)"
     
-    main(distort_file,inp_sing_file,normal_modes,method_basis,init_path,memory,cores)	
+    main(distort_file,inp_sing_file,normal_modes,method_basis,init_path,memory,cores,max_jobs,
+         freq_log=freq_log,amplitudes=amplitudes,auto_resources=auto_resources,
+         merge_energy=merge_energy,validate_merge=validate_merge,guess_chk=guess_chk,
+         adaptive_tolerance=adaptive_tolerance,screen_top=screen_top,screen_method_basis=screen_method_basis)	
@@ -0,0 +1,281 @@
+# Executors used by run_gaussian and run_pysoc to run a command for a job.
+#   LocalExecutor  runs the command on this machine through async_runner and waits for it (the default)
+#   SlurmExecutor  submits a job script with sbatch
+#   PBSExecutor    submits a job script with qsub
+# The batch executors poll the queue for all submitted jobs with a single squeue/qstat call, and
+# run() returns when the job has left the queue, so the scheduler starts the dependent stage then.
+# cancel() removes the submitted jobs from the queue with scancel/qdel (on Ctrl-C of distort.py).
+# Select one with GAUSSIAN_EXECUTOR=local|slurm|pbs, or set distort.executor / calc.executor.
+# The batch commands can be replaced (e.g. by fake_slurm.py for testing) with the environment
+# variables SBATCH, SQUEUE, SCANCEL, QSUB, QSTAT and QDEL. GAUSSIAN_JOB_TIMEOUT (seconds) limits the run time of
+# local jobs.
+
+import getpass
+import math
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+from async_runner import AsyncRunner
+
+
+# GB per unit of %mem, a Gaussian word is 8 bytes and a number without unit is in words
+memory_units = {
+    'kb': 1 / 1024**2, 'mb': 1 / 1024, 'gb': 1, 'tb': 1024,
+    'kw': 8 / 1024**2, 'mw': 8 / 1024, 'gw': 8, 'tw': 8 * 1024, '': 8 / 1024**3,
+}
+
+
+def com_resources(com_file):
+    """
+    Cores and memory (GB) requested by the %nprocshared and %mem lines of a .com file.
+    Raises ValueError for a %mem that is not understood.
+    """
+    cores, memory = 1, None
+    if not com_file or not os.path.isfile(com_file):
+        return cores, memory
+    with open(com_file, 'r') as file:
+        for line in file:
+            line = line.strip().lower()
+            if line.startswith('%nprocshared='):
+                cores = int(line.split('=')[1])
+            elif line.startswith('%mem='):
+                match = re.fullmatch(r"(\d+)\s*([kmgt][bw])?", line.split('=')[1].strip())
+                if not match:
+                    raise ValueError(f"Unknown %mem in {com_file}: {line}")
+                memory = int(match.group(1)) * memory_units[match.group(2) or '']
+            elif line.startswith('#'):
+                break
+    return cores, memory
+
+
+def as_argv(command):
+    return shlex.split(command) if isinstance(command, str) else list(command)
+
+
+class LocalExecutor:
+
+    name = 'local'
+
+    def __init__(self, max_jobs=None, timeout=None, progress_interval=60):
+        if timeout is None and os.environ.get("GAUSSIAN_JOB_TIMEOUT"):
+            timeout = float(os.environ["GAUSSIAN_JOB_TIMEOUT"])
+        self.runner = AsyncRunner(max_jobs, timeout, progress_interval)
+
+    def run(self, command, work_dir, job_name=None, com_file=None, stdout=None):
+        """
+        Run command (a list of arguments, not passed to a shell) in work_dir and wait for it.
+        Raises subprocess.CalledProcessError on failure and subprocess.TimeoutExpired on timeout.
+        """
+        self.runner.run(as_argv(command), cwd=work_dir, name=job_name, stdout=stdout)
+        return True
+
+    def set_limit(self, max_jobs):
+        self.runner.set_limit(max_jobs)
+
+    def cancel(self):
+        self.runner.cancel()
+
+    def print_progress(self):
+        self.runner.print_progress()
+
+
+class BatchExecutor:
+    """
+    Common part of the batch system executors. Each job runs `command` through a job script which
+    records the exit status of the command in <job_name>.exit next to the script.
+    """
+
+    name = 'batch'
+    directive = '#'
+
+    def __init__(self, poll_interval=30, options=None, extra_memory=1):
+        self.poll_interval = poll_interval
+        self.options = list(options or [])  # extra lines for the job script header, e.g. partition
+        self.extra_memory = extra_memory    # GB requested on top of %mem for the Gaussian process itself
+        self.lock = threading.Lock()
+        self.waiting = {}                   # job id -> threading.Event set when the job leaves the queue
+        self.cancelled = set()              # job ids removed from the queue by cancel()
+        self.poller = None
+
+    def header(self, job_name, cores, memory):
+        raise NotImplementedError
+
+    def submit(self, script, work_dir):
+        raise NotImplementedError
+
+    def queued_jobs(self):
+        raise NotImplementedError
+
+    def cancel_command(self):
+        raise NotImplementedError
+
+    def is_queued(self, job_id, queued):
+        return job_id in queued
+
+    def write_script(self, command, work_dir, job_name, com_file):
+
+        cores, memory = com_resources(com_file)
+        if memory is not None:
+            memory = math.ceil(memory + self.extra_memory)
+        script = os.path.join(work_dir, f"{job_name}.job.sh")
+        exit_file = os.path.join(work_dir, f"{job_name}.exit")
+        if os.path.exists(exit_file):
+            os.remove(exit_file)
+
+        with open(script, 'w') as f:
+            f.write("#!/bin/bash\n")
+            for line in self.header(job_name, cores, memory):
+                f.write(line + "\n")
+            for line in self.options:
+                f.write(f"{self.directive} {line}\n")
+            f.write(f"cd {shlex.quote(work_dir)}\n")
+            f.write(f"{command if isinstance(command, str) else shlex.join(command)}\n")
+            f.write(f"echo $? > {shlex.quote(exit_file)}\n")
+        return script, exit_file
+
+    def run(self, command, work_dir, job_name=None, com_file=None, stdout=None):
+        """
+        Submit command as a batch job and wait until it has finished.
+        Raises subprocess.CalledProcessError if the command failed.
+        """
+        work_dir = os.path.abspath(work_dir)
+        job_name = job_name or "job"
+        script, exit_file = self.write_script(command, work_dir, job_name, com_file)
+
+        job_id = self.submit(script, work_dir)
+        print(f"Submitted {job_name} as {self.name} job {job_id}")
+        done = threading.Event()
+        with self.lock:
+            self.waiting[job_id] = done
+            if self.poller is None or not self.poller.is_alive():
+                self.poller = threading.Thread(target=self.poll, daemon=True)
+                self.poller.start()
+        done.wait()
+        if job_id in self.cancelled:
+            raise subprocess.CalledProcessError(-1, command)
+
+        # the exit file can appear a little after the job left the queue on shared filesystems
+        for _ in range(10):
+            if os.path.isfile(exit_file):
+                break
+            time.sleep(1)
+        returncode = 1
+        if os.path.isfile(exit_file):
+            with open(exit_file) as f:
+                returncode = int(f.read().strip() or 1)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command)
+        return True
+
+    def cancel(self):
+        """
+        Remove all the submitted jobs which have not finished from the queue, their run() calls
+        raise CalledProcessError.
+        """
+        with self.lock:
+            job_ids = list(self.waiting)
+        if not job_ids:
+            return
+        print(f"Cancelling {len(job_ids)} {self.name} jobs")
+        try:
+            subprocess.run(self.cancel_command() + job_ids, check=True, capture_output=True, text=True)
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"Error cancelling the {self.name} jobs {' '.join(job_ids)}: {e}")
+        with self.lock:
+            for job_id in job_ids:
+                self.cancelled.add(job_id)
+                if job_id in self.waiting:
+                    self.waiting.pop(job_id).set()
+
+    def poll(self):
+        # One queue query for all the jobs being waited on
+        while True:
+            with self.lock:
+                if not self.waiting:
+                    self.poller = None
+                    return
+            try:
+                queued = self.queued_jobs()
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"Error polling the {self.name} queue: {e}")
+                time.sleep(self.poll_interval)
+                continue
+            with self.lock:
+                for job_id in list(self.waiting):
+                    if not self.is_queued(job_id, queued):
+                        self.waiting.pop(job_id).set()
+            time.sleep(self.poll_interval)
+
+
+class SlurmExecutor(BatchExecutor):
+
+    name = 'slurm'
+    directive = '#SBATCH'
+
+    def header(self, job_name, cores, memory):
+        lines = [f"#SBATCH --job-name={job_name}", "#SBATCH --nodes=1", "#SBATCH --ntasks=1",
+                 f"#SBATCH --cpus-per-task={cores}", f"#SBATCH --output={job_name}.slurm.out"]
+        if memory is not None:
+            lines.append(f"#SBATCH --mem={memory}G")
+        return lines
+
+    def submit(self, script, work_dir):
+        command = shlex.split(os.environ.get("SBATCH", "sbatch")) + ["--parsable", script]
+        output = subprocess.run(command, check=True, cwd=work_dir, capture_output=True, text=True).stdout
+        # --parsable prints "jobid" or "jobid;cluster"
+        return output.strip().split(';')[0]
+
+    def queued_jobs(self):
+        command = shlex.split(os.environ.get("SQUEUE", "squeue")) + ["-h", "-o", "%i", "-u", getpass.getuser()]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        return set(output.split())
+
+    def cancel_command(self):
+        return shlex.split(os.environ.get("SCANCEL", "scancel"))
+
+
+class PBSExecutor(BatchExecutor):
+
+    name = 'pbs'
+    directive = '#PBS'
+
+    def header(self, job_name, cores, memory):
+        resources = f"select=1:ncpus={cores}" + (f":mem={memory}gb" if memory is not None else "")
+        return [f"#PBS -N {job_name[:15]}", f"#PBS -l {resources}", "#PBS -j oe"]
+
+    def submit(self, script, work_dir):
+        command = shlex.split(os.environ.get("QSUB", "qsub")) + [script]
+        output = subprocess.run(command, check=True, cwd=work_dir, capture_output=True, text=True).stdout
+        return output.strip()
+
+    def queued_jobs(self):
+        command = shlex.split(os.environ.get("QSTAT", "qstat")) + ["-u", getpass.getuser()]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        queued = set()
+        for line in output.splitlines():
+            parts = line.split()
+            # the state is the second last column, completed jobs can still be listed as C or F
+            if len(parts) > 2 and parts[0][0].isdigit() and parts[-2] not in ('C', 'F'):
+                queued.add(parts[0])
+        return queued
+
+    def cancel_command(self):
+        return shlex.split(os.environ.get("QDEL", "qdel"))
+
+    def is_queued(self, job_id, queued):
+        # qstat may print a shortened id ("123.serv") for "123.server.domain"
+        return any(job_id.split('.')[0] == q.split('.')[0] for q in queued)
+
+
+def get_executor(name=None, **kwargs):
+    """
+    Executor by name ('local', 'slurm' or 'pbs'), by default from the GAUSSIAN_EXECUTOR variable.
+    """
+    name = name or os.environ.get("GAUSSIAN_EXECUTOR", "local")
+    executors = {'local': LocalExecutor, 'slurm': SlurmExecutor, 'pbs': PBSExecutor}
+    if name not in executors:
+        raise ValueError(f"Unknown executor '{name}', use one of {list(executors)}")
+    return executors[name](**kwargs)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# Fake g16 for testing the scripts without Gaussian.
+# Usage: G16="python3 /path/to/fake_g16.py" python3 distort.py
+# It reads the .com file and writes a .log file next to it containing the lines the scripts parse
+# (title, Standard orientation, Excited State lines and the termination line).
+# The files named by %chk and %rwf are written too (FAKE_G16_SCRATCH_KB in size, default 64).
+# FAKE_G16_DELAY sets the runtime of a job in seconds, FAKE_G16_FAIL=1 makes every job fail.
+
+import os
+import sys
+import time
+import zlib
+
+atomic_numbers = {
+    'H': 1, 'C': 6, 'N': 7, 'O': 8, 'F': 9, 'P': 15, 'S': 16, 'Cl': 17
+}
+
+
+def read_com(com_file):
+
+    with open(com_file, 'r') as file:
+        lines = [line.rstrip('\n') for line in file]
+
+    route = ""
+    title = ""
+    geometry = []
+    link0 = {}
+    section = 0  # 0: link0+route, 1: title, 2: charge/multiplicity, 3: coordinates
+
+    for line in lines:
+        if "--Link1--" in line:
+            break
+        if section == 0:
+            if line.strip().startswith('%') and '=' in line:
+                key, value = line.strip()[1:].split('=', 1)
+                link0[key.lower()] = value.strip()
+            elif line.strip().startswith('#'):
+                route = line.strip()
+            elif route and not line.strip():
+                section = 1
+            elif route:
+                route += " " + line.strip()
+        elif section == 1:
+            if line.strip():
+                title += line.strip()
+            elif title:
+                section = 2
+        elif section == 2:
+            if line.strip():
+                section = 3
+        elif section == 3:
+            parts = line.split()
+            if len(parts) < 4:
+                break
+            atom = parts[0]
+            atomic_num = int(atom) if atom.isdigit() else atomic_numbers.get(atom.capitalize(), 0)
+            x, y, z = map(float, parts[-3:])
+            geometry.append((atomic_num, x, y, z))
+
+    return route, title, geometry, link0
+
+
+def excited_states(route, geometry, nstates=10):
+
+    # Deterministic energies which depend slightly on the geometry
+    seed = zlib.crc32(repr([round(c, 3) for atom in geometry for c in atom]).encode())
+    shift = (seed % 1000) / 10000.0
+    states = []
+    route = route.lower()
+    if "50-50" in route or "triplets" in route:
+        for i in range(1, nstates + 1):
+            states.append(("Triplet", 2.0 + 0.15 * i + shift))
+    if "50-50" in route or "singlets" in route or "triplets" not in route:
+        for i in range(1, nstates + 1):
+            states.append(("Singlet", 2.5 + 0.15 * i + shift))
+    states.sort(key=lambda s: s[1])
+    return states
+
+
+def write_frequencies(f, geometry):
+
+    # Simple orthonormal modes: mode k moves one atom along one axis
+    natoms = len(geometry)
+    nmodes = max(1, 3 * natoms - 6)
+    f.write(" Harmonic frequencies (cm**-1), IR intensities (KM/Mole), Raman scattering\n")
+    for start in range(0, nmodes, 3):
+        block = list(range(start, min(start + 3, nmodes)))
+        f.write("                    " + "".join(f"{k + 1:>23}" for k in block) + "\n")
+        f.write("                    " + "".join(f"{'A':>23}" for k in block) + "\n")
+        f.write(" Frequencies --" + "".join(f"{100.0 + 25.0 * k:>23.4f}" for k in block) + "\n")
+        f.write(" Red. masses --" + "".join(f"{1.0 + 0.5 * (k % 7):>23.4f}" for k in block) + "\n")
+        f.write(" Frc consts  --" + "".join(f"{0.1:>23.4f}" for k in block) + "\n")
+        f.write(" IR Inten    --" + "".join(f"{1.0:>23.4f}" for k in block) + "\n")
+        f.write("  Atom  AN" + "      X      Y      Z  " * len(block) + "\n")
+        for i, (atomic_num, x, y, z) in enumerate(geometry):
+            row = f" {i + 1:>5} {atomic_num:>3}"
+            for k in block:
+                vec = [0.0, 0.0, 0.0]
+                if k % natoms == i:
+                    vec[(k // natoms) % 3] = 1.0
+                row += "  " + " ".join(f"{v:>6.2f}" for v in vec)
+            f.write(row + "\n")
+
+
+def write_log(log_file, route, title, geometry):
+
+    with open(log_file, 'w') as f:
+        f.write(" Entering Gaussian System, Link 0=g16\n")
+        f.write(f" {route}\n")
+        f.write(" ----------------------------------------------------------------------\n")
+        f.write(f" {title}\n")
+        f.write(" ----------------------------------------------------------------------\n")
+        f.write("                         Standard orientation:                         \n")
+        f.write(" ---------------------------------------------------------------------\n")
+        f.write(" Center     Atomic      Atomic             Coordinates (Angstroms)\n")
+        f.write(" Number     Number       Type             X           Y           Z\n")
+        f.write(" ---------------------------------------------------------------------\n")
+        for i, (atomic_num, x, y, z) in enumerate(geometry, start=1):
+            f.write(f" {i:>6} {atomic_num:>10} {0:>11} {x:>15.6f} {y:>11.6f} {z:>11.6f}\n")
+        f.write(" ---------------------------------------------------------------------\n")
+
+        # fewer SCF cycles when starting from the orbitals of a checkpoint
+        cycles = 8 if "guess=read" in route.lower() else 15
+        f.write(f" SCF Done:  E(RB3LYP) =  -{100 + len(geometry):.6f}     A.U. after {cycles:>4} cycles\n")
+
+        if "freq" in route.lower():
+            write_frequencies(f, geometry)
+
+        if "td" in route.lower():
+            for i, (mult, energy) in enumerate(excited_states(route, geometry), start=1):
+                f.write(f" Excited State {i:>3}:      {mult}-A      {energy:.4f} eV  "
+                        f"{1239.84 / energy:.2f} nm  f=0.0100  <S**2>=0.000\n")
+
+        f.write(" Job cpu time:       0 days  0 hours  0 minutes  1.5 seconds.\n")
+        f.write(" Elapsed time:       0 days  0 hours  0 minutes  0.5 seconds.\n")
+        f.write(" Normal termination of Gaussian 16 at Thu Jan  1 00:00:00 2026.\n")
+
+
+def main(com_file):
+
+    delay = float(os.environ.get("FAKE_G16_DELAY", "0"))
+    if delay > 0:
+        time.sleep(delay)
+
+    route, title, geometry, link0 = read_com(com_file)
+    log_file = os.path.splitext(com_file)[0] + '.log'
+
+    # checkpoint and read-write files, relative paths are relative to the job folder
+    size = int(os.environ.get("FAKE_G16_SCRATCH_KB", "64")) * 1024
+    for key in ('chk', 'rwf'):
+        if key in link0:
+            path = os.path.join(os.path.dirname(os.path.abspath(com_file)), link0[key])
+            if not path.endswith('.' + key):
+                path += '.' + key
+            if key == 'chk' and "guess=read" in route.lower() and not os.path.isfile(path):
+                with open(log_file, 'w') as f:
+                    f.write(" Error termination via Lnk1e in l401.exe at Thu Jan  1 00:00:00 2026.\n")
+                return 1
+            with open(path, 'wb') as f:
+                f.write(b'\0' * size)
+
+    if os.environ.get("FAKE_G16_FAIL") == "1":
+        with open(log_file, 'w') as f:
+            f.write(" Error termination via Lnk1e in l502.exe at Thu Jan  1 00:00:00 2026.\n")
+        return 1
+
+    write_log(log_file, route, title, geometry)
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: fake_g16.py input.com")
+        sys.exit(2)
+    sys.exit(main(sys.argv[1]))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Fake sbatch/squeue/scancel (and qsub/qstat/qdel) for testing the batch executors without a cluster.
+# Jobs are started in the background on this machine.
+# Usage: SBATCH="python3 fake_slurm.py sbatch" SQUEUE="python3 fake_slurm.py squeue" SCANCEL="python3 fake_slurm.py scancel"
+#        GAUSSIAN_EXECUTOR=slurm ...
+#        QSUB="python3 fake_slurm.py qsub" QSTAT="python3 fake_slurm.py qstat" QDEL="python3 fake_slurm.py qdel"
+#        GAUSSIAN_EXECUTOR=pbs ...
+# FAKE_SLURM_DIR is the folder where the job ids and pids are kept.
+
+import fcntl
+import os
+import signal
+import subprocess
+import sys
+
+state_dir = os.environ.get("FAKE_SLURM_DIR", f"/tmp/fake_slurm_{os.getuid()}")
+
+
+def next_job_id():
+    os.makedirs(state_dir, exist_ok=True)
+    with open(os.path.join(state_dir, "counter"), 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        job_id = int(f.read().strip() or 0) + 1
+        f.seek(0)
+        f.truncate()
+        f.write(str(job_id))
+    return job_id
+
+
+def submit(script):
+    job_id = next_job_id()
+    with open(os.path.join(os.getcwd(), f"fake-{job_id}.out"), 'w') as out:
+        process = subprocess.Popen(["bash", script], cwd=os.getcwd(), stdout=out, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+    with open(os.path.join(state_dir, f"{job_id}.pid"), 'w') as f:
+        f.write(str(process.pid))
+    return job_id
+
+
+def running_jobs():
+    jobs = []
+    if not os.path.isdir(state_dir):
+        return jobs
+    for name in os.listdir(state_dir):
+        if not name.endswith(".pid"):
+            continue
+        with open(os.path.join(state_dir, name)) as f:
+            pid = int(f.read())
+        try:
+            # the job is still running if the process exists and is not a zombie
+            with open(f"/proc/{pid}/stat") as f:
+                running = f.read().split()[2] != 'Z'
+        except OSError:
+            running = False
+        if running:
+            jobs.append(name[:-4])
+        else:
+            os.remove(os.path.join(state_dir, name))
+    return sorted(jobs, key=int)
+
+
+def cancel(job_id):
+    path = os.path.join(state_dir, f"{job_id.split('.')[0]}.pid")
+    if not os.path.isfile(path):
+        return
+    with open(path) as f:
+        pid = int(f.read())
+    try:
+        # the job script runs in its own session, stop it with everything it started
+        os.killpg(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def main(argv):
+    command = argv[0]
+    if command in ("sbatch", "qsub"):
+        job_id = submit(argv[-1])
+        print(job_id if command == "sbatch" else f"{job_id}.fake")
+    elif command == "squeue":
+        for job_id in running_jobs():
+            print(job_id)
+    elif command in ("scancel", "qdel"):
+        for job_id in argv[1:]:
+            cancel(job_id)
+    elif command == "qstat":
+        print("Job ID          Username Queue    Jobname    SessID NDS TSK Memory Time  S Time")
+        for job_id in running_jobs():
+            print(f"{job_id}.fake  user     batch    job        0      1   1   --     --    R 00:00")
+    else:
+        print(f"Unknown command {command}")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,100 @@
+# Compile-once cache for the distort.f90 helper.
+# The executable is stored under a hash of the source, compiler (path and version) and flags, so it
+# is built only when one of them changes and is shared by all studies (and working directories).
+# Builds with -march=native are also keyed on the CPU, as the cache is often on a disk shared by
+# nodes of different types.
+
+import fcntl
+import hashlib
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+
+cache_dir = os.environ.get("DISTORT_BUILD_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "distort_build"))
+compiler = os.environ.get("FC", "gfortran")
+
+# Build profiles: name -> compiler flags
+profiles = {
+    'default': [],
+    'fast': ['-O2'],
+    'native': ['-O2', '-march=native'],
+}
+
+
+def compiler_version():
+    # first line of "gfortran --version", so an upgraded compiler at the same path rebuilds
+    try:
+        output = subprocess.run([compiler, "--version"], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return output.strip().split("\n")[0]
+
+
+def cpu_model():
+    # machine type and CPU model of this node, for builds tuned to it
+    model = ""
+    try:
+        with open("/proc/cpuinfo", 'r') as f:
+            for line in f:
+                if line.startswith("model name"):
+                    model = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        model = platform.processor()
+    return f"{platform.machine()} {model}"
+
+
+def build_key(source_file, flags):
+    with open(source_file, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source)
+    parts = [shutil.which(compiler) or compiler, compiler_version()] + list(flags)
+    if any(flag.startswith(('-march=native', '-mtune=native', '-mcpu=native')) for flag in flags):
+        parts.append(cpu_model())
+    digest.update(("\0".join(parts)).encode())
+    return digest.hexdigest()[:16]
+
+
+def compiled(source_file, profile='default'):
+    """
+    Return the path of the executable built from source_file with the given profile,
+    compiling it only if it is not in the cache yet.
+    """
+    if profile not in profiles:
+        raise ValueError(f"Unknown build profile '{profile}', use one of {list(profiles)}")
+    flags = profiles[profile]
+
+    name = os.path.splitext(os.path.basename(source_file))[0]
+    build_dir = os.path.join(cache_dir, build_key(source_file, flags))
+    exe = os.path.join(build_dir, name)
+    if os.access(exe, os.X_OK):
+        print(f"Using cached build of {source_file}: {exe}")
+        return exe
+
+    os.makedirs(build_dir, exist_ok=True)
+    # Usually only one process compiles, the others wait for the lock and then use its executable.
+    # flock is not reliable on NFS, so every build is done in its own folder and renamed into place
+    # (atomic), and at worst two nodes compile the same executable.
+    with open(os.path.join(build_dir, ".lock"), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except OSError:
+            pass
+        if not os.access(exe, os.X_OK):
+            # gfortran writes .mod files in the current folder, so compile inside a private folder
+            work_dir = tempfile.mkdtemp(prefix=f"build.{platform.node()}.{os.getpid()}.", dir=build_dir)
+            try:
+                subprocess.run([compiler, *flags, os.path.abspath(source_file), "-o", name],
+                               check=True, cwd=work_dir)
+                os.replace(os.path.join(work_dir, name), exe)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            print(f"Compiled {source_file} with {compiler} {' '.join(flags)}")
+    return exe
+
+
+def clear_cache():
+    shutil.rmtree(cache_dir, ignore_errors=True)
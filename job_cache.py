@@ -0,0 +1,210 @@
+# Content addressed cache of finished Gaussian jobs.
+# A job is identified by a hash of its normalized .com input (route, charge/multiplicity,
+# rounded coordinates) and of any other input file its outputs depend on (e.g. the init.py of
+# pysoc), so the same geometry at the same level of theory is only computed once, even under a
+# different file or folder name. The output files of a job (log, soc_out.dat)
+# are stored in the cache folder and copied back on a hit.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+cache_dir = os.environ.get("GAUSSIAN_JOB_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "gaussian_job_cache"))
+max_size = float(os.environ.get("GAUSSIAN_JOB_CACHE_GB", "20")) * 1024**3  # in bytes
+decimals = 4  # coordinates are rounded before hashing
+enabled = True
+
+stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+lock = threading.Lock()
+
+
+def format_coord(value):
+    value = round(float(value), decimals)
+    # -0.0000 and 0.0000 are the same coordinate
+    if value == 0:
+        value = 0.0
+    return f"{value:.{decimals}f}"
+
+
+def normalize_com(com_file, include_title=False):
+    """
+    Return the part of a .com file which determines the result of the job:
+    route (lower case, single spaces), charge/multiplicity, rounded coordinates and any
+    input after the geometry. Link 0 lines (%mem, %nprocshared, %chk, ...) are left out, and so
+    is the title unless include_title is True. guess=read is left out of the route too, it only
+    changes the starting orbitals of the SCF, not the result.
+    """
+    with open(com_file, 'r') as file:
+        lines = [line.strip() for line in file]
+
+    route = []
+    title = []
+    section = 'link0'
+    normalized = []
+
+    for line in lines:
+        if section == 'link0':
+            if line.startswith('#'):
+                route.append(line)
+                section = 'route'
+        elif section == 'route':
+            if line:
+                route.append(line)
+            else:
+                section = 'title'
+        elif section == 'title':
+            if line:
+                title.append(line)
+            elif title:
+                section = 'charge'
+        elif section == 'charge':
+            if line:
+                normalized.append(" ".join(line.split()))
+                section = 'coords'
+        elif section == 'coords':
+            parts = line.split()
+            if len(parts) < 4:
+                section = 'rest'
+                continue
+            atom = parts[0].capitalize()
+            normalized.append(" ".join([atom] + [format_coord(x) for x in parts[-3:]]))
+        elif line:
+            normalized.append(" ".join(line.split()))
+
+    route = [word for word in " ".join(route).lower().split() if word not in ('guess=read', 'guess(read)')]
+    header = [" ".join(route)]
+    if include_title:
+        header.append(" ".join(title))
+    return "\n".join(header + normalized) + "\n"
+
+
+def job_key(com_file, include_title=False, inputs=()):
+    """
+    Hash of the normalized com_file and of the contents of the files in inputs.
+    """
+    digest = hashlib.sha256(normalize_com(com_file, include_title).encode())
+    for path in inputs:
+        with open(path, 'rb') as f:
+            digest.update(b"\0" + f.read())
+    return digest.hexdigest()
+
+
+def fetch(com_file, outputs, include_title=False, inputs=()):
+    """
+    outputs maps a name in the cache entry to the path the file should be copied to,
+    e.g. {'job.log': '/path/to/job.log'}. inputs are the other input files of the job, see job_key.
+    Returns True on a hit (all files copied).
+    """
+    if not enabled:
+        return False
+    entry = os.path.join(cache_dir, job_key(com_file, include_title, inputs))
+    if not all(os.path.isfile(os.path.join(entry, name)) for name in outputs):
+        with lock:
+            stats['misses'] += 1
+        return False
+
+    for name, path in outputs.items():
+        shutil.copy(os.path.join(entry, name), path)
+    os.utime(entry)  # entries are evicted least recently used first
+    with lock:
+        stats['hits'] += 1
+    print(f"Reused cached result for {com_file}")
+    return True
+
+
+def store(com_file, outputs, include_title=False, inputs=()):
+    """
+    Copy the output files of a finished job into the cache. outputs maps a name in the
+    cache entry to the path of the file, like fetch.
+    """
+    if not enabled:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    key = job_key(com_file, include_title, inputs)
+    entry = os.path.join(cache_dir, key)
+    if os.path.isdir(entry):
+        return
+
+    # Write to a temporary folder and rename, so a half written entry is never used
+    tmp = os.path.join(cache_dir, f".{key}.{os.getpid()}.{threading.get_ident()}")
+    os.makedirs(tmp, exist_ok=True)
+    for name, path in outputs.items():
+        shutil.copy(path, os.path.join(tmp, name))
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        # another job stored the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+
+    with lock:
+        stats['stored'] += 1
+    evict()
+
+
+def entry_size(entry):
+    return sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+
+
+def evict(limit=None):
+    """
+    Remove the least recently used entries until the cache is smaller than limit bytes.
+    """
+    limit = max_size if limit is None else limit
+    if not os.path.isdir(cache_dir):
+        return
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if name.startswith('.') or not os.path.isdir(entry):
+            continue
+        try:
+            entries.append((os.path.getmtime(entry), entry_size(entry), entry))
+        except OSError:
+            continue
+
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, entry in sorted(entries):
+        if total <= limit:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        with lock:
+            stats['evicted'] += 1
+
+
+def cache_stats():
+    """
+    Hit/miss statistics of this run and the size of the cache.
+    """
+    entries = 0
+    size = 0
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            entry = os.path.join(cache_dir, name)
+            if not name.startswith('.') and os.path.isdir(entry):
+                entries += 1
+                size += entry_size(entry)
+    with lock:
+        result = dict(stats)
+    lookups = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / lookups if lookups else 0.0
+    result['entries'] = entries
+    result['size_gb'] = size / 1024**3
+    return result
+
+
+def save_stats(stats_file):
+    """
+    Add the statistics of this run to a JSON lines file.
+    """
+    result = cache_stats()
+    result['time'] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(stats_file, 'a') as f:
+        f.write(json.dumps(result) + "\n")
+    return result
@@ -1,5 +1,13 @@
 import numpy as np
 import os
+import sys
+import glob
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from log_parser import excited_state_energies
+import results_db
+from soc_dataset import read_soc_out, normalize_state
 
 pi = np.pi
 h = 4.1357e-15
@@ -18,76 +26,35 @@ def get_singlet_energies(singlet_file):
 
     check_file_exists(singlet_file) # checking file exists or not at given path
     
-    with open(singlet_file,'r') as file:
-        lines = file.readlines()
-
-        singlet_count = 0 #Ground state included
-        singlet_energies = {} # in eV
-        
-        for line in lines:
-            line = line.strip().split()
-        
-            if "Excited" in line and "State" in line and "eV" in line:
-                if (line[3].split('-')[0] == "Singlet"):
-                    singlet_count+=1
-                    sing_state = "S" + str(singlet_count)
-                    sing_energy = float(line[4])
-                    singlet_energies[sing_state] = sing_energy
-                
+    singlet_energies, triplet_energies = excited_state_energies(singlet_file) # in eV
     return singlet_energies
     
 def get_triplet_energies(triplet_file):
 
     check_file_exists(triplet_file) # checking file exists or not at given path
     
-    with open(triplet_file,'r') as file:
-        lines = file.readlines()
-
-        triplet_count = 0 #Ground state included
-        triplet_energies = {} # in eV
-        
-        for line in lines:
-            line = line.strip().split()
-        
-            if "Excited" in line and "State" in line and "eV" in line:
-                if (line[3].split('-')[0] == "Triplet"):
-                    triplet_count+=1
-                    trip_state = "T" + str(triplet_count)
-                    trip_energy = float(line[4])
-                    triplet_energies[trip_state] = trip_energy
-                
+    singlet_energies, triplet_energies = excited_state_energies(triplet_file) # in eV
     return triplet_energies
+
+def get_energies(singlet_file, triplet_file):
+    # singlet and triplet energies, the log is scanned once when both come from the same 50-50 log
+    if os.path.abspath(singlet_file) == os.path.abspath(triplet_file):
+        check_file_exists(singlet_file)
+        return excited_state_energies(singlet_file)
+    return get_singlet_energies(singlet_file), get_triplet_energies(triplet_file)
  
 def get_soc(soc_file):
     
     check_file_exists(soc_file) # checking file exists or not at given path
     
-    soc = {} # in cm-1 
-    with open(soc_file,'r') as file:
-        lines = file.readlines()
-    
-        for line in lines:
-            soc_val = line.split(":")[1].strip().split()[0]
-            soc_val = cmiev(float(soc_val)) #in eV
-            
-            parts = line.split("<")[1].split(">")[0]
-            states = parts.split('|')
-            singlet_state = states[0] 
-            triplet_state = states[2].split(",")[0] 
-    
-            soc[singlet_state,triplet_state] = soc_val 
-    return soc
+    # read_soc_out gives cm-1 with S*/T* already written as S10/T10
+    return {pair: cmiev(soc_val) for pair, soc_val in read_soc_out(soc_file).items()} # in eV
  
 def get_delta_energy(soc,singlet_energies,triplet_energies):
     
     delta_energy = {}
     
     for (singlet_state, triplet_state), soc_val in soc.items():
-        if singlet_state == 'S*':
-            singlet_state = 'S10'
-        if triplet_state == 'T*':
-            triplet_state = 'T10'
-            
         if (singlet_state in singlet_energies or singlet_state == 'S0') and triplet_state in triplet_energies:
             sing_energy = 0.0 if singlet_state == 'S0' else float(singlet_energies[singlet_state])
             trip_energy = float(triplet_energies[triplet_state])
@@ -99,31 +66,86 @@ def get_delta_energy(soc,singlet_energies,triplet_energies):
 def rho_fc(delta_energy, L, kbT):
     return (1 / np.sqrt(4 * np.pi * L * kbT)) * np.exp(-((delta_energy + L) ** 2) / (4 * L * kbT))
  
-def k_isc(singlet_file,triplet_file, soc_file,T=300, L = 0.2):
+def k_isc_grid(delta_energy, soc, T=300, L=0.2, h=h):
+    """
+    Vectorized k_isc. delta_energy and soc (both in eV) are arrays of the same shape, one value
+    per state pair; T (K) and L (eV) are scalars or 1D grids.
+    Returns an array of shape delta_energy.shape + T.shape + L.shape.
+    """
+    delta_energy = np.asarray(delta_energy, dtype=float)
+    soc = np.asarray(soc, dtype=float)
+    T = np.asarray(T, dtype=float)
+    L = np.asarray(L, dtype=float)
     
-    kbT = 8.62e-05 * T 
-    k_isc = {}
+    # pairs x temperatures x reorganization energies
+    pair_axes = (...,) + (None,) * (T.ndim + L.ndim)
+    kbT = (8.62e-05 * T)[(...,) + (None,) * L.ndim]
     
-    singlet_energies = get_singlet_energies(singlet_file)
-    triplet_energies = get_triplet_energies(triplet_file)
-    soc = get_soc(soc_file)
+    return 4 * (pi**2) * (1/h) * rho_fc(delta_energy[pair_axes], L, kbT) * (soc[pair_axes] ** 2)
+
+def pair_arrays(singlet_energies, triplet_energies, soc):
+    """
+    Return (pairs, delta_energy, soc) with the state pairs that have both energies available
+    and the matching delta energies and SOC values (eV) as arrays, for k_isc_grid.
+    """
     delta_energy = get_delta_energy(soc,singlet_energies,triplet_energies)
+    pairs = []
+    soc_vals = []
     
     for (singlet_state, triplet_state), soc_val in soc.items():
-        if singlet_state == 'S*':
-            singlet_state = 'S10'
-        if triplet_state == 'T*':
-            triplet_state = 'T10'
-            
-        del_e = delta_energy.get((singlet_state, triplet_state), None)
-        if del_e is None:
+        if (singlet_state, triplet_state) not in delta_energy:
             print(f"Skipping {(singlet_state, triplet_state)} due to missing delta energy.")
             continue
-        #print(rho_fc(del_e, L, kbT))
-        k = 4 * (pi**2)*(1/h)* rho_fc(del_e, L, kbT) * (soc_val ** 2)
-        k_isc[(singlet_state, triplet_state)] = k
-    return k_isc
- 
+        pairs.append((singlet_state, triplet_state))
+        soc_vals.append(soc_val)
+    
+    return pairs, np.array([delta_energy[p] for p in pairs]), np.array(soc_vals)
+
+def rates_from_data(singlet_energies, triplet_energies, soc, T=300, L=0.2):
+    
+    pairs, delta_energy, soc_vals = pair_arrays(singlet_energies, triplet_energies, soc)
+    k = k_isc_grid(delta_energy, soc_vals, T, L)
+    return {pair: float(k_val) for pair, k_val in zip(pairs, k)}
+
+def k_isc(singlet_file,triplet_file, soc_file,T=300, L = 0.2):
+    
+    singlet_energies, triplet_energies = get_energies(singlet_file, triplet_file)
+    soc = get_soc(soc_file)
+    return rates_from_data(singlet_energies, triplet_energies, soc, T, L)
+
+def k_isc_sweep(singlet_file, triplet_file, soc_file, T, L):
+    """
+    k_isc for all state pairs over grids of temperatures T (K) and reorganization energies L (eV).
+    Returns (pairs, k) where k has shape (len(pairs), len(T), len(L)).
+    """
+    singlet_energies, triplet_energies = get_energies(singlet_file, triplet_file)
+    soc = get_soc(soc_file)
+    pairs, delta_energy, soc_vals = pair_arrays(singlet_energies, triplet_energies, soc)
+    return pairs, k_isc_grid(delta_energy, soc_vals, np.atleast_1d(T), np.atleast_1d(L))
+
+def get_soc_db(db_file, molecule, mode, amplitude):
+    # SOC values of a distorted geometry from the results database, in eV like get_soc
+    # databases of older runs have T10 stored as T*
+    soc = results_db.load_soc(db_file, molecule, mode, amplitude)
+    return {(normalize_state(s), normalize_state(t)): cmiev(val) for (s, t), val in soc.items()}
+
+def get_singlet_energies_db(db_file, molecule, mode, amplitude):
+    return results_db.load_energies(db_file, molecule, mode, amplitude, prefix='S')
+
+def get_triplet_energies_db(db_file, molecule, mode, amplitude):
+    return results_db.load_energies(db_file, molecule, mode, amplitude, prefix='T')
+
+def k_isc_db(db_file, molecule, mode, amplitude, T=300, L=0.2):
+    """
+    k_isc of a distorted geometry using the energies and SOC values stored in the results database.
+    The rates are stored back in the database.
+    """
+    singlet_energies = get_singlet_energies_db(db_file, molecule, mode, amplitude)
+    triplet_energies = get_triplet_energies_db(db_file, molecule, mode, amplitude)
+    soc = get_soc_db(db_file, molecule, mode, amplitude)
+    k_isc_val = rates_from_data(singlet_energies, triplet_energies, soc, T, L)
+    results_db.store_kisc(db_file, molecule, mode, amplitude, k_isc_val, T, L)
+    return k_isc_val
 
   
 def write_section(outfile, title, data, key_width=6, value_width=10):
@@ -139,18 +161,127 @@ def write_section(outfile, title, data, key_width=6, value_width=10):
     
     outfile.write("\n\n")
       
+def write_sweep(out_file, pairs, T, L, k):
+    # one line per (pair, T, L)
+    with open(out_file, "w") as outfile:
+        outfile.write(f"{'S':<6} {'T':<6} {'T(K)':>8} {'L(eV)':>8} {'k_isc':>12}\n")
+        for i, (singlet_state, triplet_state) in enumerate(pairs):
+            for j, temp in enumerate(T):
+                for l, reorg in enumerate(L):
+                    outfile.write(f"{singlet_state:<6} {triplet_state:<6} {temp:>8.2f} {reorg:>8.4f} {k[i, j, l]:>12.4e}\n")
+      
+def study_geometries(folder):
+    """
+    Every distorted geometry of a distort.py study folder (singlets) as a list of
+    (mode, amplitude, singlet_file, triplet_file, soc_file). The singlet energies are taken from
+    VEE*/energy_dis_*.log, or from the 50-50 SOC log when there is no energy job (merge_energy).
+    """
+    geometries = []
+    for soc_file in sorted(glob.glob(os.path.join(folder, 'soc_dis_*', 'soc_out.dat'))):
+        soc_folder = os.path.dirname(soc_file)
+        try:
+            mode, amp = os.path.basename(soc_folder).split('_')[-2:]
+            amplitude = float(amp)
+            mode = int(mode)
+        except ValueError:
+            continue
+        soc_log = os.path.join(soc_folder, 'gaussian.log')
+        energy_log = os.path.join(folder, f'VEE{amp}', f'energy_dis_{mode}_{amp}.log')
+        singlet_file = energy_log if os.path.isfile(energy_log) else soc_log
+        geometries.append((mode, amplitude, singlet_file, soc_log, soc_file))
+    return geometries
+
+def geometry_rates(job):
+    # k_isc of one geometry, runs in a worker process
+    mode, amplitude, singlet_file, triplet_file, soc_file, T, L = job
+    singlet_energies, triplet_energies = get_energies(singlet_file, triplet_file)
+    soc = get_soc(soc_file)
+    pairs, delta_energy, soc_vals = pair_arrays(singlet_energies, triplet_energies, soc)
+    k = k_isc_grid(delta_energy, soc_vals, T, L)
+    return mode, amplitude, pairs, delta_energy.tolist(), soc_vals.tolist(), k.tolist()
+
+def study_kisc(folder, T=300, L=0.2, max_workers=None, db_file=None, molecule=None):
+    """
+    k_isc of every state pair of every geometry of a study, the files are parsed in a process pool.
+    Returns a list of (mode, amplitude, singlet, triplet, delta energy (eV), soc (eV), k_isc) sorted by
+    mode and amplitude. The rates are stored in db_file too if given.
+    """
+    jobs = [geometry + (T, L) for geometry in study_geometries(folder)]
+    rows = []
+    # spawn, not fork: forking while other threads run (e.g. after distort.main) can deadlock
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for job, result in zip(jobs, pool.map(geometry_rates, jobs, chunksize=max(1, len(jobs) // 64))):
+            mode, amplitude, pairs, delta_energy, soc_vals, k = result
+            for pair, de, sv, kv in zip(pairs, delta_energy, soc_vals, k):
+                rows.append((mode, amplitude, pair[0], pair[1], de, sv, kv))
+            if db_file:
+                results_db.store_kisc(db_file, molecule or results_db.default_molecule(folder), mode, amplitude,
+                                      dict(zip(pairs, k)), T, L)
+    rows.sort(key=lambda r: (r[0], r[1]))
+    return rows
+
+def write_kisc_table(out_file, rows):
+    with open(out_file, "w") as outfile:
+        outfile.write(f"{'mode':>5} {'amplitude':>10} {'S':<5} {'T':<5} {'dE(eV)':>8} {'SOC(eV)':>12} {'k_isc':>12}\n")
+        for mode, amplitude, singlet_state, triplet_state, de, sv, kv in rows:
+            outfile.write(f"{mode:>5} {amplitude:>10.4f} {singlet_state:<5} {triplet_state:<5} {de:>8.4f} {sv:>12.4e} {kv:>12.4e}\n")
+
+def plot_kisc_vs_distortion(folder, rows, top_n=5, fmt='svg'):
+    """
+    One plot per mode of k_isc vs distortion amplitude for the top_n state pairs with the
+    largest rates of the mode.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
+    curves = defaultdict(lambda: defaultdict(list))
+    for mode, amplitude, singlet_state, triplet_state, de, sv, kv in rows:
+        curves[mode][singlet_state, triplet_state].append((amplitude, kv))
+    
+    out_files = []
+    for mode, pairs in sorted(curves.items()):
+        top = sorted(pairs, key=lambda p: max(k for a, k in pairs[p]), reverse=True)[:top_n]
+        plt.figure(figsize=(8, 5))
+        for singlet_state, triplet_state in top:
+            points = sorted(pairs[singlet_state, triplet_state])
+            plt.plot([a for a, k in points], [k for a, k in points], marker='o', linestyle='--',
+                     label=f"{singlet_state} → {triplet_state}")
+        plt.yscale('log')
+        plt.xlabel("Distortion Amplitude", fontsize=20)
+        plt.ylabel(r"$k_{ISC}$ (s$^{-1}$)", fontsize=20)
+        plt.legend(title=f'Mode {mode}', bbox_to_anchor=(1.05, 1), loc="upper left", fontsize=14)
+        plt.tight_layout()
+        out_file = os.path.join(folder, f"kisc_vs_disto_mode{mode}.{fmt}")
+        plt.savefig(out_file)
+        plt.close()
+        out_files.append(out_file)
+    return out_files
+
+def study(folder, T=300, L=0.2, max_workers=None):
+    
+    db_file = os.path.join(folder, 'results.db')
+    rows = study_kisc(folder, T, L, max_workers, db_file if os.path.isfile(db_file) else None)
+    if not rows:
+        print(f"No soc_dis_*/soc_out.dat found in {folder}")
+        return rows
+    write_kisc_table(os.path.join(folder, 'kisc_table.dat'), rows)
+    plots = plot_kisc_vs_distortion(folder, rows)
+    print(f"k_isc of {len({(r[0], r[1]) for r in rows})} geometries saved in {os.path.join(folder, 'kisc_table.dat')}, "
+          f"{len(plots)} plots")
+    return rows
+
 def main():
 
     soc_file = r"soc_out.dat"
     singlet_file = r"/home/krushnashete/semester_8/Minor/sosos_opt/ososo_singlet_b3lyp_631.log"
     triplet_file = r"/home/krushnashete/semester_8/Minor/sosos_opt/ososo_triplet_b3lyp_631.log"
 
-    singlet_energies = get_singlet_energies(singlet_file)
-    triplet_energies = get_triplet_energies(triplet_file)
+    singlet_energies, triplet_energies = get_energies(singlet_file, triplet_file)
     soc = get_soc(soc_file)
     delta_energy = get_delta_energy(soc,singlet_energies,triplet_energies)
     
-    k_isc_val = k_isc(singlet_file,triplet_file, soc_file, L=0.2, T=300)
+    k_isc_val = rates_from_data(singlet_energies, triplet_energies, soc, L=0.2, T=300)
     
     with open("results.out", "w") as outfile:
         write_section(outfile, "Singlet Energies", singlet_energies)
@@ -160,8 +291,23 @@ def main():
         write_section(outfile, "Intersystem Crossing Rate Constants (k_isc)", k_isc_val)
     	
     print("Results are saved in the file 'results.out'!!")
+    
+    # Optional sweep over temperature (K) and reorganization energy (eV), e.g.
+    # temperatures = np.arange(77, 401, 1) and reorganization = np.linspace(0.05, 0.5, 10)
+    temperatures = None
+    reorganization = None
+    
+    if temperatures is not None and reorganization is not None:
+        pairs, delta_e, soc_vals = pair_arrays(singlet_energies, triplet_energies, soc)
+        k = k_isc_grid(delta_e, soc_vals, temperatures, reorganization)
+        write_sweep("kisc_sweep.dat", pairs, temperatures, reorganization, k)
+        print("k_isc sweep is saved in the file 'kisc_sweep.dat'!!")
 
 if __name__ == "__main__":
-    main()
+    # python3 kisc_calc.py singlets [T] [L]   k_isc of every geometry of a distort.py study
+    if len(sys.argv) > 1:
+        study(sys.argv[1], *[float(x) for x in sys.argv[2:4]])
+    else:
+        main()
 
 
@@ -0,0 +1,329 @@
+# Single pass streaming parser for Gaussian log files.
+# The log is read line by line, so memory use does not depend on the size of the log.
+# The excited states of TD logs are found with scan_excited_states, which memory maps the log and
+# jumps from one "Excited State" to the next with find instead of looking at every line.
+
+import mmap
+import os
+import re
+from parse_cache import cached
+
+distortion_pattern = re.compile(r"normal mode N (\d+) by ([+-])\s*([\d.]+)")
+link_pattern = re.compile(r"Error termination.*?\b(l\d+)(?:\.exe)?", re.IGNORECASE)
+scf_pattern = re.compile(r"SCF Done:\s+E\((\S+)\)\s+=\s+(-?[\d.]+)\s+A\.U\. after\s+(\d+) cycles")
+time_pattern = re.compile(r"(Job cpu time|Elapsed time):\s+(\d+) days\s+(\d+) hours\s+(\d+) minutes\s+([\d.]+) seconds")
+
+# Messages printed by Gaussian before an error termination -> reason reported by termination_status
+error_reasons = [
+    ("Convergence failure", "scf convergence failure"),
+    ("Convergence criterion not met", "scf convergence failure"),
+    ("Number of steps exceeded", "optimization steps exceeded"),
+    ("could not allocate memory", "out of memory"),
+    ("Erroneous write", "disk full"),
+    ("Small interatomic distances", "atoms too close"),
+    ("Problem with the distance matrix", "atoms too close"),
+    ("Wrong number of Negative eigenvalues", "wrong number of negative eigenvalues"),
+    ("End of file in ZSymb", "bad input geometry"),
+    ("Illegal IType or MSType", "bad input route"),
+]
+
+
+def parse_orientation(lines):
+    """
+    Parse the coordinate table following a "Standard orientation" line.
+    Returns a list of (atomic number, x, y, z).
+    """
+    geometry = []
+
+    # Skip the 4 header lines of the table
+    for _ in range(4):
+        if next(lines, None) is None:
+            return geometry
+
+    for line in lines:
+        # End of the coordinate table: an empty line or a line with dashes
+        if not line.strip() or "-----" in line:
+            break
+        parts = line.split()
+        if len(parts) >= 6 and parts[0].isdigit():
+            # Center, Atomic Number, Type, X, Y, Z
+            atomic_num = int(parts[1])
+            x, y, z = map(float, parts[3:6])
+            geometry.append((atomic_num, x, y, z))
+    return geometry
+
+
+def parse_excited_state(line):
+    """
+    Parse an "Excited State" line, e.g.
+     Excited State   1:      Singlet-A      3.1234 eV  396.97 nm  f=0.0123  <S**2>=0.000
+    Returns a dict or None if the line is not an excited state line.
+    """
+    parts = line.split()
+    if "Excited" not in parts or "State" not in parts or "eV" not in parts:
+        return None
+    try:
+        state = {
+            'index': int(parts[2].rstrip(':')),
+            'multiplicity': parts[3].split('-')[0],
+            'energy': float(parts[4]),
+            'f': None,
+        }
+    except (IndexError, ValueError):
+        return None
+    for part in parts[5:]:
+        if part.startswith('f='):
+            state['f'] = float(part[2:])
+    return state
+
+
+def iter_events(log_file):
+    """
+    Walk a Gaussian log file once and yield (event, data) tuples:
+      ('distortion', {'mode', 'sign', 'amplitude', 'key'})  "Distortion along normal mode" header
+      ('orientation', [(atomic number, x, y, z), ...])       "Standard orientation" table
+      ('excited_state', {'index', 'multiplicity', 'energy', 'f'})
+      ('scf', {'method', 'energy', 'cycles'})                 "SCF Done" line
+      ('termination', {'normal': bool, 'line': str})          last non-empty line of the file
+    """
+    last_line = ""
+    with open(log_file, 'r') as file:
+        lines = iter(file)
+        for line in lines:
+            if line.strip():
+                last_line = line
+
+            if "Standard orientation" in line:
+                yield 'orientation', parse_orientation(lines)
+
+            elif "Distortion along normal mode" in line:
+                match = distortion_pattern.search(line)
+                if match:
+                    mode_num, sign, distortion_value = match.groups()
+                    yield 'distortion', {
+                        'mode': int(mode_num),
+                        'sign': sign,
+                        'amplitude': float(sign + distortion_value),
+                        'key': f"{mode_num}_{sign}{distortion_value}",
+                    }
+
+            elif "Excited State" in line:
+                state = parse_excited_state(line)
+                if state is not None:
+                    yield 'excited_state', state
+
+            elif "SCF Done" in line:
+                match = scf_pattern.search(line)
+                if match:
+                    yield 'scf', {'method': match.group(1), 'energy': float(match.group(2)),
+                                  'cycles': int(match.group(3))}
+
+    yield 'termination', {
+        'normal': "Normal termination of Gaussian" in last_line,
+        'line': last_line.strip(),
+    }
+
+
+def last_orientation(log_file):
+    """
+    Return the last "Standard orientation" geometry of the log file.
+    """
+    geometry = None
+    for event, data in iter_events(log_file):
+        if event == 'orientation':
+            geometry = data
+    if geometry is None:
+        raise ValueError("No 'Standard orientation' found in a log file.")
+    return geometry
+
+
+@cached
+def distorted_geometries(log_file):
+    """
+    Return a dict mapping "mode_signvalue" (e.g. "4_+0.5") to the first "Standard orientation"
+    geometry following each "Distortion along normal mode" header.
+    """
+    distort_geom = {}
+    found_mode = False
+    found_orient = False
+    key = None
+
+    for event, data in iter_events(log_file):
+        if event == 'distortion':
+            found_mode = True
+            key = data['key']
+        elif event == 'orientation':
+            found_orient = True
+            if key is not None:
+                distort_geom[key] = data
+                key = None
+
+    if not found_mode:
+        raise ValueError("No 'Distortion along normal modes' found in the log file.")
+    if not found_orient:
+        raise ValueError("No 'Standard orientation' found in the log file.")
+    return distort_geom
+
+
+def parse_transitions(data, pos):
+    """
+    Orbital transitions listed below an excited state header, starting at offset pos of the mapped log:
+    lines like "      45 -> 47         0.70123". Returns the dominant one as ("45 -> 47", coefficient),
+    (None, None) if there is none.
+    """
+    best, coefficient = None, None
+    while True:
+        end = data.find(b"\n", pos)
+        line = data[pos:end if end != -1 else len(data)]
+        if b"->" not in line and b"<-" not in line:
+            break
+        parts = line.split()
+        if len(parts) == 4:
+            try:
+                value = float(parts[3])
+            except ValueError:
+                break
+            # de-excitations (<-) are listed too but are never the dominant transition
+            if parts[1] == b"->" and (coefficient is None or abs(value) > abs(coefficient)):
+                best, coefficient = f"{parts[0].decode()} -> {parts[2].decode()}", value
+        if end == -1:
+            break
+        pos = end + 1
+    return best, coefficient
+
+
+@cached
+def scan_excited_states(log_file):
+    """
+    Singlet and triplet excited states of a log in one pass over a memory map of the file.
+    Returns (singlets, triplets) as dicts {'S1': state, ..} and {'T1': state, ..}, numbered in order of
+    appearance for each multiplicity, where state is a dict with 'energy' (eV), 'f', 'transition'
+    (dominant transition, e.g. "45 -> 47") and 'coefficient'.
+    """
+    singlets = {}
+    triplets = {}
+    with open(log_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return singlets, triplets
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = data.find(b"Excited State")
+            while pos != -1:
+                end = data.find(b"\n", pos)
+                if end == -1:
+                    end = len(data)
+                state = parse_excited_state(data[pos:end].decode('utf-8', errors='replace'))
+                if state is not None:
+                    transition, coefficient = parse_transitions(data, end + 1)
+                    record = {'energy': state['energy'], 'f': state['f'],
+                              'transition': transition, 'coefficient': coefficient}
+                    if state['multiplicity'] == "Singlet":
+                        singlets["S" + str(len(singlets) + 1)] = record
+                    elif state['multiplicity'] == "Triplet":
+                        triplets["T" + str(len(triplets) + 1)] = record
+                pos = data.find(b"Excited State", end)
+    return singlets, triplets
+
+
+def excited_state_energies(log_file):
+    """
+    Return (singlet_energies, triplet_energies) in eV as dicts {'S1': .., 'S2': ..} and {'T1': .., ..}.
+    States are numbered in order of appearance for each multiplicity.
+    """
+    singlets, triplets = scan_excited_states(log_file)
+    return ({state: data['energy'] for state, data in singlets.items()},
+            {state: data['energy'] for state, data in triplets.items()})
+
+
+def scf_cycles(log_file):
+    """
+    Number of SCF cycles of every "SCF Done" in the log (one per link).
+    """
+    return [data['cycles'] for event, data in iter_events(log_file) if event == 'scf']
+
+
+def read_tail(log_file, n_lines=30, block_size=8192):
+    """
+    Return (lines, partial) for the last n_lines non-empty lines of the file, read by seeking
+    backwards from the end. partial is True if the last line has no newline yet (still being written).
+    """
+    with open(log_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+            # one extra line since the first line of the window may be cut
+            if len(data.split(b"\n")) > n_lines + 1 and len(data.strip().split(b"\n")) > n_lines:
+                break
+
+    partial = bool(data) and not data.endswith(b"\n")
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    if pos > 0:
+        lines = lines[1:]
+    lines = [line for line in lines if line.strip()]
+    return lines[-n_lines:], partial
+
+
+def termination_status(log_file):
+    """
+    Check how a Gaussian job ended using only the tail of the log file.
+    Returns a dict:
+      'status':  'normal', 'error', 'incomplete' (still running or killed) or 'empty'
+      'normal':  True for normal termination
+      'line':    last non-empty line of the log
+      'link':    link where the error occurred, e.g. 'l502' (None if not an error termination)
+      'reasons': list of known error reasons found in the tail, e.g. ['scf convergence failure']
+    """
+    lines, partial = read_tail(log_file)
+    status = {'status': 'empty', 'normal': False, 'line': "", 'link': None, 'reasons': []}
+    if not lines:
+        return status
+
+    status['line'] = lines[-1].strip()
+    if "Normal termination of Gaussian" in lines[-1]:
+        status['status'] = 'normal'
+        status['normal'] = True
+        return status
+
+    error_lines = [line for line in lines if "Error termination" in line]
+    if not error_lines:
+        status['status'] = 'incomplete'
+        if partial:
+            status['reasons'].append("log file is still being written")
+        return status
+
+    status['status'] = 'error'
+    match = link_pattern.search(error_lines[-1])
+    if match:
+        status['link'] = match.group(1)
+    for line in lines:
+        for message, reason in error_reasons:
+            if message in line and reason not in status['reasons']:
+                status['reasons'].append(reason)
+    return status
+
+
+def normal_termination(log_file):
+    """
+    True if the last non-empty line of the log reports normal termination.
+    """
+    return termination_status(log_file)['normal']
+
+
+def job_times(log_file):
+    """
+    CPU and wall time (seconds) reported by Gaussian at the end of the last link of the log.
+    Returns {'cpu': ..., 'elapsed': ...}, with only the times found in the tail.
+    """
+    times = {}
+    lines, partial = read_tail(log_file)
+    for line in lines:
+        match = time_pattern.search(line)
+        if match:
+            days, hours, minutes, seconds = match.groups()[1:]
+            key = 'cpu' if match.group(1) == 'Job cpu time' else 'elapsed'
+            times[key] = ((int(days) * 24 + int(hours)) * 60 + int(minutes)) * 60 + float(seconds)
+    return times
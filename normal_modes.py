@@ -0,0 +1,122 @@
+# Distorted geometries along normal modes, computed directly with NumPy.
+# The normal modes are read once from the opt+freq log and all the displaced geometries for a set of
+# modes and amplitudes are generated as one (modes x amplitudes x atoms x 3) array, so no distort.f90
+# run and no Gaussian job per displacement is needed to get the Cartesian coordinates.
+
+import numpy as np
+from log_parser import parse_orientation
+
+# sqrt(hbar / (amu * 2*pi*c * 1 cm-1)) in Angstrom, converts dimensionless displacements to Angstrom
+hbar = 1.054571817e-34
+amu = 1.66053906660e-27
+c = 2.99792458e10  # cm/s
+q_to_angstrom = np.sqrt(hbar / (amu * 2 * np.pi * c)) * 1e10
+
+
+def read_normal_modes(log_file):
+    """
+    Read the equilibrium geometry and the normal modes of an opt+freq log in one pass.
+    Returns a dict with
+      'atomic_numbers'  (atoms,)
+      'coords'          (atoms, 3) last Standard orientation in Angstrom
+      'frequencies'     (modes,) in cm-1
+      'reduced_masses'  (modes,) in amu
+      'modes'           (modes, atoms, 3) normalized Cartesian displacements
+    """
+    geometry = None
+    frequencies = []
+    reduced_masses = []
+    modes = []
+
+    with open(log_file, 'r') as file:
+        lines = iter(file)
+        for line in lines:
+            if "Standard orientation" in line:
+                geometry = parse_orientation(lines)
+
+            elif "Harmonic frequencies" in line:
+                # a new frequency section (e.g. a second freq job) replaces the previous one
+                frequencies, reduced_masses, modes = [], [], []
+
+            else:
+                parts = line.split()
+                if len(parts) > 2 and parts[0] == "Frequencies" and parts[1] == "--":
+                    n = len(parts) - 2
+                    frequencies.extend(float(v) for v in parts[2:])
+                    block = [[] for _ in range(n)]
+                    for line in lines:
+                        parts = line.split()
+                        if parts[:2] == ["Red.", "masses"]:
+                            reduced_masses.extend(float(v) for v in parts[3:])
+                        elif parts[:2] == ["Atom", "AN"]:
+                            break
+                    for line in lines:
+                        parts = line.split()
+                        if len(parts) != 2 + 3 * n or not parts[0].isdigit():
+                            break
+                        values = [float(v) for v in parts[2:]]
+                        for k in range(n):
+                            block[k].append(values[3 * k:3 * k + 3])
+                    modes.extend(block)
+
+    if geometry is None:
+        raise ValueError(f"No 'Standard orientation' found in {log_file}.")
+    if not modes:
+        raise ValueError(f"No normal modes found in {log_file}, it should be an opt+freq log.")
+
+    return {
+        'atomic_numbers': np.array([atom[0] for atom in geometry], dtype=int),
+        'coords': np.array([atom[1:] for atom in geometry], dtype=float),
+        'frequencies': np.array(frequencies),
+        'reduced_masses': np.array(reduced_masses),
+        'modes': np.array(modes, dtype=float),
+    }
+
+
+def displaced_coords(normal_modes, mode_numbers, amplitudes, dimensionless=False):
+    """
+    All distorted geometries for the given modes (numbered from 1 like in Gaussian) and amplitudes.
+    The amplitude is in Angstrom along the normalized mode vector, or in dimensionless normal
+    coordinates if dimensionless is True.
+    Returns an array of shape (modes, amplitudes, atoms, 3).
+    """
+    index = np.asarray(mode_numbers, dtype=int) - 1
+    amplitudes = np.asarray(amplitudes, dtype=float)
+    vectors = normal_modes['modes'][index]                     # (modes, atoms, 3)
+
+    if dimensionless:
+        scale = q_to_angstrom / np.sqrt(normal_modes['reduced_masses'][index] * np.abs(normal_modes['frequencies'][index]))
+    else:
+        scale = np.ones(len(index))
+
+    steps = amplitudes[None, :] * scale[:, None]                 # (modes, amplitudes)
+    return normal_modes['coords'][None, None] + steps[:, :, None, None] * vectors[:, None]
+
+
+def key_amplitude(amplitude):
+    # The amplitude as geometry_key writes it (6 significant digits), and as the database gets it back
+    # from the key. Amplitude lists are normalized with it, so they match the keys of the computed points.
+    return float(f"{amplitude:g}")
+
+
+def geometry_key(mode, amplitude):
+    # Same key as extrac_geom gives for the distort.f90 geometries, e.g. "4_+0.5"
+    return f"{int(mode)}_{amplitude:+g}"
+
+
+def distorted_geometries(log_file, mode_numbers, amplitudes, dimensionless=False):
+    """
+    Like extrac_geom: dict mapping "mode_signvalue" to a list of (atomic number, x, y, z),
+    ready for generate_energy_com_file and generate_soc.
+    """
+    normal_modes = read_normal_modes(log_file)
+    coords = displaced_coords(normal_modes, mode_numbers, amplitudes, dimensionless)
+    atomic_numbers = normal_modes['atomic_numbers'].tolist()
+
+    geometries = {}
+    for i, mode in enumerate(mode_numbers):
+        for j, amp in enumerate(amplitudes):
+            geometries[geometry_key(mode, amp)] = [
+                (A, x, y, z) for A, (x, y, z) in zip(atomic_numbers, coords[i, j].tolist())
+            ]
+    return geometries
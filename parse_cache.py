@@ -0,0 +1,91 @@
+# In-process cache of parsed output files (soc_out.dat, Gaussian logs).
+# The same files are parsed again and again (get_top_transitions, get_transitions and the plots all
+# read the same soc_out.dat, kisc_calc re-reads the logs of the caller), so the parsers are wrapped
+# with @cached: a result is reused as long as the size and modification time of the file are
+# unchanged, and the least recently used results are dropped when the cache grows above
+# PARSE_CACHE_MB (default 128 MB). The cached results are shared, callers must not modify them.
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+max_bytes = float(os.environ.get("PARSE_CACHE_MB", "128")) * 1024**2
+entries = OrderedDict()  # (parser, path, args) -> (size, mtime_ns, result, nbytes)
+total_bytes = 0
+counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+lock = threading.Lock()
+
+
+def result_size(value):
+    # memory of a parsed result, estimated from the first item of every dict and list since the items
+    # of a parsed file are all alike (short tuples like (singlets, triplets) are counted item by item)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict) and value:
+        key, item = next(iter(value.items()))
+        size += len(value) * (result_size(key) + result_size(item))
+    elif isinstance(value, (list, tuple)) and value:
+        if isinstance(value, tuple) and len(value) <= 4:
+            size += sum(result_size(item) for item in value)
+        else:
+            size += len(value) * result_size(value[0])
+    return size
+
+
+def evict(limit=None):
+    """
+    Drop the least recently used results until the cache holds at most limit bytes (max_bytes).
+    """
+    global total_bytes
+    limit = max_bytes if limit is None else limit
+    with lock:
+        while entries and total_bytes > limit:
+            key, (size, mtime, result, nbytes) = entries.popitem(last=False)
+            total_bytes -= nbytes
+            counters['evictions'] += 1
+
+
+def clear():
+    evict(0)
+
+
+def cached(parser):
+    """
+    Decorator for a parser whose first argument is a file path.
+    """
+    name = f"{parser.__module__}.{parser.__qualname__}"
+
+    @wraps(parser)
+    def wrapper(path, *args):
+        global total_bytes
+        stat = os.stat(path)
+        key = (name, os.path.abspath(path), args)
+        with lock:
+            entry = entries.get(key)
+            if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+                entries.move_to_end(key)
+                counters['hits'] += 1
+                return entry[2]
+            counters['misses'] += 1
+
+        result = parser(path, *args)
+        nbytes = result_size(result)
+        with lock:
+            if key in entries:
+                total_bytes -= entries.pop(key)[3]
+            entries[key] = (stat.st_size, stat.st_mtime_ns, result, nbytes)
+            total_bytes += nbytes
+        evict()
+        return result
+    return wrapper
+
+
+def stats():
+    """
+    Hits, misses, evictions, hit rate, entries and size (MB) of the cache.
+    """
+    with lock:
+        lookups = counters['hits'] + counters['misses']
+        return {**counters, 'hit_rate': counters['hits'] / lookups if lookups else 0.0,
+                'entries': len(entries), 'size_mb': total_bytes / 1024**2}
@@ -0,0 +1,229 @@
+# Picks %nprocshared and %mem for the Gaussian jobs of a study from the size of the molecule
+# (number of basis functions estimated from the atoms and the basis set) and the parallel
+# efficiency measured in previous runs (run_report.jsonl), so several jobs sharing a node finish
+# as early as possible.
+# Usage: python3 resource_planner.py input.com method/basis n_jobs [node_cores] [node_memory_GB]
+
+import math
+import os
+import re
+import sys
+from statistics import median
+
+atomic_numbers = {
+    'H': 1, 'He': 2, 'Li': 3, 'Be': 4, 'B': 5, 'C': 6, 'N': 7, 'O': 8, 'F': 9, 'Ne': 10,
+    'Na': 11, 'Mg': 12, 'Al': 13, 'Si': 14, 'P': 15, 'S': 16, 'Cl': 17, 'Ar': 18, 'Br': 35, 'I': 53
+}
+
+# Basis functions per atom for (H/He, Li-Ne, Na-Ar) of the basis sets which are not Pople sets
+basis_table = {
+    'sto-3g': (1, 5, 9),
+    'def2-svp': (5, 14, 18),
+    'def2-tzvp': (6, 31, 37),
+    'cc-pvdz': (5, 14, 18),
+    'cc-pvtz': (14, 30, 34),
+    'aug-cc-pvdz': (9, 23, 27),
+    'aug-cc-pvtz': (23, 46, 50),
+}
+
+# Memory of the node kept free for the OS, pysoc and the batch job overhead: the larger of both
+reserve_fraction = 0.1
+reserve_gb = 2
+
+# Pople sets without polarization and diffuse functions
+pople_table = {
+    '3-21': (2, 9, 13),
+    '6-31': (2, 9, 13),
+    '6-311': (3, 13, 21),
+}
+
+
+def row(atomic_number):
+    return 0 if atomic_number <= 2 else 1 if atomic_number <= 10 else 2
+
+
+def read_atoms(com_file):
+    """
+    Atomic numbers of the atoms in the first coordinate block of a .com file.
+    """
+    atoms = []
+    with open(com_file, 'r') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) in (4, 5) and re.match(r"^[A-Za-z]{1,2}(\(.*\))?$|^\d+$", parts[0]):
+                try:
+                    [float(x) for x in parts[-3:]]
+                except ValueError:
+                    continue
+                symbol = re.sub(r"\(.*\)", "", parts[0])
+                atoms.append(int(symbol) if symbol.isdigit() else atomic_numbers.get(symbol.capitalize(), 6))
+            elif atoms and not line.strip():
+                break
+    return atoms
+
+
+def per_atom_functions(basis):
+    """
+    Basis functions per atom (H, first row, second row) for a basis set name like 6-311++g(d,p).
+    """
+    basis = basis.lower().replace(' ', '')
+    if basis in basis_table:
+        return basis_table[basis]
+
+    match = re.match(r"^(3-21|6-311|6-31)(\+*)g(\*{0,2})(?:\((.*)\))?$", basis)
+    if not match:
+        print(f"Unknown basis set {basis}, sizing the jobs as for 6-31g(d)")
+        return per_atom_functions('6-31g(d)')
+
+    family, plus, stars, polarization = match.groups()
+    h, first, second = pople_table[family]
+    pure = family == '6-311'  # 6-311G uses 5d/7f, the others 6d/10f
+    sizes = {'p': 3, 'd': 5 if pure else 6, 'f': 7 if pure else 10}
+
+    # diffuse sp on the heavy atoms (+) and s on hydrogen (++)
+    if len(plus) >= 1:
+        first, second = first + 4, second + 4
+    if len(plus) >= 2:
+        h += 1
+
+    if stars:
+        polarization = 'd' if stars == '*' else 'd,p'
+    if polarization:
+        heavy, _, light = polarization.partition(',')
+        for count, shell in re.findall(r"(\d*)([pdf])", heavy):
+            first += int(count or 1) * sizes[shell]
+            second += int(count or 1) * sizes[shell]
+        for count, shell in re.findall(r"(\d*)([pdf])", light):
+            h += int(count or 1) * sizes[shell]
+    return h, first, second
+
+
+def basis_functions(atoms, basis):
+    """
+    Estimated number of basis functions for a list of atomic numbers.
+    """
+    per_atom = per_atom_functions(basis.split('/')[-1])
+    return sum(per_atom[row(z)] for z in atoms)
+
+
+def job_memory(nbf, cores, nstates=10):
+    """
+    %mem in GB for a TD-DFT job: a base amount plus room for the Davidson vectors of
+    every core, which grow with the square of the number of basis functions.
+    """
+    per_core = 0.1 + 8 * nbf**2 * (2 * nstates + 10) / 1024**3
+    return max(1, math.ceil(0.5 + cores * per_core))
+
+
+def default_serial_fraction(nbf):
+    # small molecules do not parallelize well
+    return min(0.5, 20 / max(nbf, 1))
+
+
+def serial_fraction(report_file, stages=('energy', 'soc')):
+    """
+    Serial fraction (Amdahl's law) of the Gaussian jobs of previous runs, from the CPU and wall
+    time Gaussian reported and the cores they used. None if there is no usable record.
+    """
+    from run_report import load
+    if not report_file or not os.path.isfile(report_file):
+        return None
+    fractions = []
+    for r in load(report_file, all_runs=True):
+        cores = r.get('cores') or 1
+        if r.get('stage') not in stages or r.get('status') != 'done' or cores < 2:
+            continue
+        if not r.get('g16_cpu_s') or not r.get('g16_elapsed_s'):
+            continue
+        efficiency = min(1.0, r['g16_cpu_s'] / (r['g16_elapsed_s'] * cores))
+        fractions.append(min(1.0, max(0.0, (1 / efficiency - 1) / (cores - 1))))
+    return median(fractions) if fractions else None
+
+
+def speedup(cores, fraction):
+    return 1 / (fraction + (1 - fraction) / cores)
+
+
+def node_resources():
+    """
+    Cores and memory (GB) of this node, or of the batch allocation when running under SLURM.
+    """
+    cores = int(os.environ.get("SLURM_CPUS_ON_NODE", 0)) or os.cpu_count() or 1
+    if os.environ.get("SLURM_MEM_PER_NODE"):
+        memory = int(os.environ["SLURM_MEM_PER_NODE"]) // 1024
+    else:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 1024**3
+    return cores, max(1, memory)
+
+
+def usable_memory(node_memory):
+    """
+    Memory (GB) of a node the Gaussian jobs can use, after the reserve is taken off.
+    """
+    reserve = max(reserve_gb, math.ceil(reserve_fraction * node_memory))
+    return max(1, int(node_memory - reserve))
+
+
+def plan(n_jobs, node_cores, node_memory, nbf, nstates=10, fraction=None):
+    """
+    Number of jobs to run at the same time and the cores and memory (GB) of each, which give
+    the shortest time for n_jobs equal jobs on one node.
+    Returns a dict with max_jobs, cores, memory, speedup (of one job) and serial_fraction.
+    """
+    n_jobs = max(1, int(n_jobs))
+    if fraction is None:
+        fraction = default_serial_fraction(nbf)
+    node_memory = usable_memory(node_memory)
+
+    best = None
+    for cores in range(1, int(node_cores) + 1):
+        memory = job_memory(nbf, cores, nstates)
+        if memory > node_memory and cores > 1:
+            break
+        parallel = max(1, min(node_cores // cores, node_memory // memory, n_jobs))
+        # rounds of parallel jobs, each taking 1/speedup of the single core time
+        makespan = math.ceil(n_jobs / parallel) / speedup(cores, fraction)
+        if best is None or makespan < best[0] - 1e-9:
+            best = (makespan, parallel)
+
+    # the jobs share all cores, the memory is the estimate for these cores within the share of each job
+    parallel = best[1]
+    cores = max(1, int(node_cores) // parallel)
+    memory = max(1, min(job_memory(nbf, cores, nstates), node_memory // parallel))
+    return {'max_jobs': parallel, 'cores': cores, 'memory': memory,
+            'speedup': round(speedup(cores, fraction), 2), 'serial_fraction': round(fraction, 3)}
+
+
+def plan_study(atoms, method_basis, n_jobs, node_cores=None, node_memory=None, report_file=None, nstates=10):
+    """
+    plan() for the jobs of a molecule given as a list of atomic numbers, with the serial fraction
+    from report_file when previous runs were recorded there. node_cores/node_memory default to
+    the resources of this node.
+    """
+    if node_cores is None or node_memory is None:
+        cores, memory = node_resources()
+        node_cores = node_cores or cores
+        node_memory = node_memory or memory
+    nbf = basis_functions(atoms, method_basis)
+    fraction = serial_fraction(report_file)
+    result = plan(n_jobs, node_cores, node_memory, nbf, nstates, fraction)
+    result['basis_functions'] = nbf
+    result['from_history'] = fraction is not None
+    return result
+
+
+def print_plan(result):
+    source = "previous runs" if result['from_history'] else "molecule size"
+    print(f"Resource plan: {result['max_jobs']} jobs at a time with {result['cores']} cores and "
+          f"{result['memory']}GB each ({result['basis_functions']} basis functions, "
+          f"serial fraction {result['serial_fraction']} from {source}, speedup {result['speedup']} per job)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python3 resource_planner.py input.com method/basis n_jobs [node_cores] [node_memory_GB]")
+        sys.exit(2)
+    node_cores = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    node_memory = int(sys.argv[5]) if len(sys.argv) > 5 else None
+    report = os.path.join(os.getcwd(), 'singlets', 'run_report.jsonl')
+    print_plan(plan_study(read_atoms(sys.argv[1]), sys.argv[2], int(sys.argv[3]), node_cores, node_memory, report))
@@ -0,0 +1,130 @@
+# SQLite store for the results of a distortion study (SOC values, excited state energies and k_isc).
+# Rows are keyed by (molecule, mode, amplitude, state pair), so plots and k_isc can be
+# computed with a query instead of re-reading every soc_out.dat and log file.
+
+import os
+import sqlite3
+from contextlib import closing
+
+schema = """
+CREATE TABLE IF NOT EXISTS soc (
+    molecule TEXT NOT NULL,
+    mode INTEGER NOT NULL,
+    amplitude REAL NOT NULL,
+    singlet TEXT NOT NULL,
+    triplet TEXT NOT NULL,
+    soc REAL NOT NULL,              -- cm-1
+    PRIMARY KEY (molecule, mode, amplitude, singlet, triplet)
+);
+CREATE TABLE IF NOT EXISTS energies (
+    molecule TEXT NOT NULL,
+    mode INTEGER NOT NULL,
+    amplitude REAL NOT NULL,
+    state TEXT NOT NULL,
+    energy REAL NOT NULL,           -- eV
+    PRIMARY KEY (molecule, mode, amplitude, state)
+);
+CREATE TABLE IF NOT EXISTS kisc (
+    molecule TEXT NOT NULL,
+    mode INTEGER NOT NULL,
+    amplitude REAL NOT NULL,
+    singlet TEXT NOT NULL,
+    triplet TEXT NOT NULL,
+    temperature REAL NOT NULL,      -- K
+    reorganization REAL NOT NULL,   -- eV
+    kisc REAL NOT NULL,             -- s-1
+    PRIMARY KEY (molecule, mode, amplitude, singlet, triplet, temperature, reorganization)
+);
+"""
+
+
+def connect(db_file):
+    """
+    Open the database (creating the tables if needed). Use it as `with closing(connect(db_file)) as db:`.
+    """
+    db = sqlite3.connect(db_file, timeout=60)
+    db.executescript(schema)
+    return db
+
+
+def store_soc(db_file, molecule, mode, amplitude, soc):
+    """
+    soc is the dict returned by get_soc: {(singlet, triplet): value in cm-1}
+    """
+    rows = [(molecule, int(mode), float(amplitude), s, t, float(val)) for (s, t), val in soc.items()]
+    with closing(connect(db_file)) as db, db:
+        db.executemany("INSERT OR REPLACE INTO soc VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def store_energies(db_file, molecule, mode, amplitude, energies):
+    """
+    energies is a dict {state: energy in eV}, e.g. from get_singlet_energies
+    """
+    rows = [(molecule, int(mode), float(amplitude), state, float(e)) for state, e in energies.items()]
+    with closing(connect(db_file)) as db, db:
+        db.executemany("INSERT OR REPLACE INTO energies VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def store_kisc(db_file, molecule, mode, amplitude, k_isc, T, L):
+    """
+    k_isc is the dict returned by kisc_calc.k_isc: {(singlet, triplet): rate in s-1}
+    """
+    rows = [(molecule, int(mode), float(amplitude), s, t, float(T), float(L), float(k))
+            for (s, t), k in k_isc.items()]
+    with closing(connect(db_file)) as db, db:
+        db.executemany("INSERT OR REPLACE INTO kisc VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def load_soc(db_file, molecule, mode, amplitude):
+    """
+    Same format as get_soc: {(singlet, triplet): value in cm-1}
+    """
+    with closing(connect(db_file)) as db:
+        rows = db.execute("SELECT singlet, triplet, soc FROM soc WHERE molecule=? AND mode=? AND amplitude=?",
+                          (molecule, int(mode), float(amplitude))).fetchall()
+    return {(s, t): val for s, t, val in rows}
+
+
+def load_energies(db_file, molecule, mode, amplitude, prefix=""):
+    """
+    Returns {state: energy in eV}. prefix 'S' or 'T' selects only singlets or triplets.
+    """
+    with closing(connect(db_file)) as db:
+        rows = db.execute("SELECT state, energy FROM energies WHERE molecule=? AND mode=? AND amplitude=? "
+                          "AND state LIKE ?", (molecule, int(mode), float(amplitude), prefix + "%")).fetchall()
+    # S1, S2, ..., S10 in numerical order
+    return dict(sorted(rows, key=lambda r: (r[0][0], int(r[0][1:]) if r[0][1:].isdigit() else 0)))
+
+
+def load_kisc(db_file, molecule, mode, amplitude, T, L):
+    with closing(connect(db_file)) as db:
+        rows = db.execute("SELECT singlet, triplet, kisc FROM kisc WHERE molecule=? AND mode=? AND amplitude=? "
+                          "AND temperature=? AND reorganization=?",
+                          (molecule, int(mode), float(amplitude), float(T), float(L))).fetchall()
+    return {(s, t): k for s, t, k in rows}
+
+
+def load_soc_curves(db_file, molecule, mode):
+    """
+    All SOC values of one mode as a list of (amplitude, singlet, triplet, value), for plotting.
+    """
+    with closing(connect(db_file)) as db:
+        return db.execute("SELECT amplitude, singlet, triplet, soc FROM soc WHERE molecule=? AND mode=? "
+                          "ORDER BY amplitude", (molecule, int(mode))).fetchall()
+
+
+def geometries(db_file, molecule):
+    """
+    List of (mode, amplitude) with SOC values stored for the molecule.
+    """
+    with closing(connect(db_file)) as db:
+        return db.execute("SELECT DISTINCT mode, amplitude FROM soc WHERE molecule=? ORDER BY mode, amplitude",
+                          (molecule,)).fetchall()
+
+
+def default_molecule(folder):
+    # Name of the study folder, e.g. /home/user/sooos/singlets -> sooos
+    folder = os.path.abspath(folder)
+    if os.path.basename(folder) == 'singlets':
+        folder = os.path.dirname(folder)
+    return os.path.basename(folder)
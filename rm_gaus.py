@@ -1,8 +1,9 @@
-import numpy as np
 import os
-import re
 import glob
-import subprocess
+import scratch
+
+# Removes the gaussian.chk and gaussian.rwf files left in the SOC folders of a study.
+# distort.py now deletes them itself after pysoc, this is for older studies.
 
 cwd = os.getcwd()
 sing_folder = os.path.join(cwd,'singlets')
@@ -10,25 +11,16 @@ sing_folder = os.path.join(cwd,'singlets')
 pattern = os.path.join(sing_folder,'*soc_dis*')
 soc_folder_list = glob.glob(pattern)
 
-def check_file(path, file_name):
-    file_path = os.path.join(path,file_name)
-
-    if os.path.isfile(file_path):
-        return True
-    print(f"{file_name} File is not there")    
-    return False
-   
 files = ['gaussian.chk', 'gaussian.rwf']
 
+freed = 0
 for f in soc_folder_list:
 	for file_name in files:
-		file_path = os.path.join(f,file_name)
-		print(file_path)
-		
-		if check_file(f,file_name):    
-			subprocess.run(["sudo", "rm", file_path], check=True)
-	
-		else :
-			continue
-       
+		print(os.path.join(f,file_name))
+		if not os.path.isfile(os.path.join(f,file_name)):
+			print(f"{file_name} File is not there")
+
+	# files which cannot be removed by the user are removed with a single sudo rm per folder
+	freed += scratch.cleanup(f, files, sudo=True)
 
+print(f"Removed {freed / 1024**2:.1f} MB")
@@ -0,0 +1,208 @@
+# Timing and resource report of the stages of distort.py and calc.py.
+# Every stage writes one JSON line to the report file (singlets/run_report.jsonl for distort.py)
+# with its wall time, the CPU time of the child processes and their peak memory when it went above
+# that of all earlier children (resource.getrusage),
+# the size of the Gaussian logs it wrote and the CPU time Gaussian reports in them.
+# The child CPU time of a stage is only its own when no other stage ran at the same time
+# ('concurrent' is 1), the Gaussian CPU time from the log is always per job.
+# Usage: python3 run_report.py [singlets/run_report.jsonl] [n]   ranks the n slowest stages and modes
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from log_parser import job_times, scf_cycles
+from executors import com_resources
+
+report_file = None
+run_id = None
+lock = threading.Lock()
+local = threading.local()  # record of the stage running in this thread
+active = []                # records of the stages running right now
+
+
+def configure(path):
+    """
+    Append the records of this run to path, None turns the report off.
+    """
+    global report_file, run_id
+    report_file = path
+    run_id = time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def plain(value):
+    # NumPy scalars (e.g. a mode from np.arange) as python numbers
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write(record):
+    if not report_file:
+        return
+    with lock:
+        with open(report_file, 'a') as f:
+            f.write(json.dumps(record, default=plain) + "\n")
+
+
+@contextmanager
+def stage(stage, name=None, **fields):
+    """
+    Time the code in the with block as one stage and write its record to the report.
+    Extra fields (e.g. mode=4) are stored in the record.
+    """
+    record = {'run': run_id, 'stage': stage, 'name': name or stage, **fields,
+              'start': time.strftime("%Y-%m-%d %H:%M:%S"), 'status': 'done', 'concurrent': 1,
+              'log_files': 0, 'log_bytes': 0}
+    with lock:
+        active.append(record)
+        for r in active:
+            r['concurrent'] = max(r['concurrent'], len(active))
+    previous = getattr(local, 'record', None)
+    local.record = record
+    start = time.time()
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    try:
+        yield record
+    except BaseException:
+        record['status'] = 'failed'
+        raise
+    finally:
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        record['wall_s'] = round(time.time() - start, 3)
+        record['child_user_s'] = round(after.ru_utime - before.ru_utime, 3)
+        record['child_sys_s'] = round(after.ru_stime - before.ru_stime, 3)
+        # ru_maxrss (kB on Linux) is the largest child finished so far in the whole process, so it
+        # only belongs to this stage when it went up during the stage
+        record['child_maxrss_mb'] = round(after.ru_maxrss / 1024, 1) if after.ru_maxrss > before.ru_maxrss else None
+        local.record = previous
+        with lock:
+            active.remove(record)
+        write(record)
+
+
+def timed(stage_name, name, func, **fields):
+    """
+    Wrap func so every call is recorded as a stage.
+    """
+    def run(*args, **kwargs):
+        with stage(stage_name, name, **fields):
+            return func(*args, **kwargs)
+    return run
+
+
+def add_log(log_file, com_file=None):
+    """
+    Add the size and Gaussian CPU/wall time of log_file to the stage running in this thread,
+    and the cores and memory requested in com_file.
+    """
+    record = getattr(local, 'record', None)
+    if record is None or not os.path.isfile(log_file):
+        return
+    record['log_files'] += 1
+    record['log_bytes'] += os.path.getsize(log_file)
+    times = job_times(log_file)
+    if 'cpu' in times:
+        record['g16_cpu_s'] = round(record.get('g16_cpu_s', 0) + times['cpu'], 1)
+    if 'elapsed' in times:
+        record['g16_elapsed_s'] = round(record.get('g16_elapsed_s', 0) + times['elapsed'], 1)
+    cycles = scf_cycles(log_file)
+    if cycles:
+        record['scf_cycles'] = record.get('scf_cycles', 0) + sum(cycles)
+    if com_file:
+        record['cores'], record['memory_gb'] = com_resources(com_file)
+
+
+def load(path, all_runs=False):
+    """
+    Records of the last run in the report (of every run with all_runs=True).
+    """
+    records = []
+    if not os.path.isfile(path):
+        return records
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    if records and not all_runs:
+        last = records[-1].get('run')
+        records = [r for r in records if r.get('run') == last]
+    return records
+
+
+def summary(records):
+    """
+    Totals per stage and per mode: name -> dict(count, wall_s, max_wall_s, cpu_s, log_mb, scf_jobs, scf_cycles).
+    """
+    def totals(key):
+        table = defaultdict(lambda: {'count': 0, 'wall_s': 0.0, 'max_wall_s': 0.0, 'cpu_s': 0.0, 'log_mb': 0.0,
+                                     'scf_jobs': 0, 'scf_cycles': 0})
+        for r in records:
+            if r.get(key) is None:
+                continue
+            t = table[r[key]]
+            t['count'] += 1
+            t['wall_s'] += r['wall_s']
+            t['max_wall_s'] = max(t['max_wall_s'], r['wall_s'])
+            t['cpu_s'] += r.get('g16_cpu_s', r['child_user_s'] + r['child_sys_s'])
+            t['log_mb'] += r['log_bytes'] / 1024**2
+            if 'scf_cycles' in r:
+                t['scf_jobs'] += 1
+                t['scf_cycles'] += r['scf_cycles']
+        return dict(table)
+    return totals('stage'), totals('mode')
+
+
+def scf_summary(records, stages=('energy', 'soc')):
+    """
+    {guess: (jobs, mean SCF cycles)} of the Gaussian jobs of stages, split by whether they
+    started from a checkpoint guess (the 'guess' field of the record).
+    """
+    cycles = defaultdict(list)
+    for r in records:
+        if r.get('stage') in stages and 'scf_cycles' in r:
+            cycles[bool(r.get('guess'))].append(r['scf_cycles'])
+    return {guess: (len(c), sum(c) / len(c)) for guess, c in sorted(cycles.items())}
+
+
+def print_summary(path, n=10):
+
+    records = load(path)
+    if not records:
+        print(f"No stages recorded in {path}")
+        return
+
+    by_stage, by_mode = summary(records)
+    print(f"Run of {records[0]['run']}, {len(records)} stages")
+    print(f"\n{'stage':<12}{'count':>7}{'wall (s)':>12}{'mean (s)':>12}{'max (s)':>12}{'cpu (s)':>12}{'log (MB)':>10}"
+          f"{'SCF cycles':>12}")
+    for name, t in sorted(by_stage.items(), key=lambda item: -item[1]['wall_s']):
+        cycles = f"{t['scf_cycles'] / t['scf_jobs']:.1f}" if t['scf_jobs'] else "-"
+        print(f"{name:<12}{t['count']:>7}{t['wall_s']:>12.1f}{t['wall_s'] / t['count']:>12.1f}"
+              f"{t['max_wall_s']:>12.1f}{t['cpu_s']:>12.1f}{t['log_mb']:>10.1f}{cycles:>12}")
+
+    if by_mode:
+        print(f"\n{'mode':<12}{'stages':>7}{'wall (s)':>12}{'cpu (s)':>12}")
+        for mode, t in sorted(by_mode.items(), key=lambda item: -item[1]['wall_s']):
+            print(f"{mode:<12}{t['count']:>7}{t['wall_s']:>12.1f}{t['cpu_s']:>12.1f}")
+
+    print(f"\nSlowest {min(n, len(records))} stages:")
+    for r in sorted(records, key=lambda r: -r['wall_s'])[:n]:
+        memory = f"new peak child memory {r['child_maxrss_mb']} MB" if r.get('child_maxrss_mb') else "no new peak child memory"
+        print(f"  {r['wall_s']:>10.1f} s  {r['name']} ({r['status']}, {memory})")
+
+    peaks = [r['child_maxrss_mb'] for r in records if r.get('child_maxrss_mb')]
+    overlapping = sum(1 for r in records if r['concurrent'] > 1)
+    if peaks:
+        print(f"\nLargest child process: {max(peaks)} MB")
+    if overlapping:
+        print(f"{overlapping} stages overlapped with others, their child CPU times and memory peaks can come from the other stages")
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), 'singlets', 'run_report.jsonl')
+    print_summary(path, int(sys.argv[2]) if len(sys.argv) > 2 else 10)
@@ -0,0 +1,82 @@
+# Dependency aware job scheduler for running the Gaussian jobs of distort.py in parallel.
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def split_resources(cores, memory, max_jobs):
+    """
+    Split the core/memory budget of the node between max_jobs concurrent jobs.
+    Returns (cores, memory) for a single job, at least 1 core and 1 GB each.
+    """
+    max_jobs = max(1, int(max_jobs))
+    return max(1, int(cores) // max_jobs), max(1, int(memory) // max_jobs)
+
+
+def run_jobs(jobs, max_jobs=1, can_start=None, poll_interval=30, cancel=None):
+    """
+    jobs is a dict mapping job name -> (func, deps), where deps is a list of job names.
+    func is called with the results of its deps (in the same order) once all of them are done.
+    At most max_jobs functions run at the same time. Jobs whose dependency failed are not run.
+    can_start(name) can hold back a ready job (e.g. while the scratch disk is full), it is asked
+    again every poll_interval seconds. A held job is started anyway when nothing else is running.
+    cancel() is called when the scheduler is interrupted (e.g. Ctrl-C), to stop the processes the
+    running jobs are waiting for; the queued jobs are dropped.
+    Returns (results, failed) where failed maps job name -> error message.
+    """
+    for name, (func, deps) in jobs.items():
+        for dep in deps:
+            if dep not in jobs:
+                raise ValueError(f"Job '{name}' depends on unknown job '{dep}'.")
+
+    results = {}
+    failed = {}
+    pending = dict(jobs)
+    running = {}
+
+    pool = ThreadPoolExecutor(max_workers=max(1, int(max_jobs)))
+    try:
+        while pending or running:
+
+            # Drop jobs which can never run because a dependency failed
+            for name, (func, deps) in list(pending.items()):
+                bad = [dep for dep in deps if dep in failed]
+                if bad:
+                    failed[name] = f"dependency {bad[0]} failed"
+                    print(f"Skipping job {name}: {failed[name]}")
+                    del pending[name]
+
+            # Submit jobs whose dependencies are done, up to max_jobs at a time
+            held = False
+            for name, (func, deps) in list(pending.items()):
+                if len(running) >= max(1, int(max_jobs)):
+                    break
+                if all(dep in results for dep in deps):
+                    if can_start is not None and running and not can_start(name):
+                        held = True
+                        continue
+                    args = [results[dep] for dep in deps]
+                    running[pool.submit(func, *args)] = name
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Circular dependency between jobs: {sorted(pending)}")
+                break
+
+            done, _ = wait(running, timeout=poll_interval if held else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    failed[name] = str(e)
+                    print(f"Job {name} failed: {e}")
+    except BaseException:
+        # stop the running processes first, otherwise shutting down the pool waits for them
+        if cancel is not None:
+            cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    return results, failed
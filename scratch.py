@@ -0,0 +1,211 @@
+# Scratch space handling for the Gaussian jobs of a distortion study.
+# The read-write (.rwf) and checkpoint (.chk) files of the jobs can be placed on a node-local scratch
+# folder (GAUSSIAN_SCRATCH), they are deleted as soon as they are not needed anymore (after pysoc for
+# the SOC jobs), new jobs are held back while the scratch usage is above a cap (GAUSSIAN_SCRATCH_CAP_GB), and
+# the peak usage is recorded. With a batch executor the scratch folder must be reachable from the
+# nodes running both the Gaussian job and pysoc.
+
+import fnmatch
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+scratch_base = os.environ.get("GAUSSIAN_SCRATCH") or None
+root = None           # scratch folder of the current study, inside scratch_base
+study = None          # folder of the current study
+cap = float(os.environ.get("GAUSSIAN_SCRATCH_CAP_GB", "0")) * 1024**3  # bytes, 0: no cap
+watched = []          # folders whose .rwf/.chk files count as scratch usage when root is not set
+peak = 0
+last_usage = (0.0, 0)  # (time, bytes) of the last measurement
+max_age = 30          # seconds a measurement is reused by has_space
+lock = threading.Lock()
+monitor = None
+
+scratch_patterns = ['*.rwf', '*.chk']
+
+
+def configure(study_folder, scratch_root=None, cap_gb=None):
+    """
+    Set up scratch handling for the study in study_folder. scratch_root and cap_gb default to the
+    GAUSSIAN_SCRATCH and GAUSSIAN_SCRATCH_CAP_GB environment variables.
+    """
+    global scratch_base, root, cap, watched, peak, study
+    if scratch_root is not None:
+        scratch_base = scratch_root
+    if cap_gb is not None:
+        cap = cap_gb * 1024**3
+    root = None
+    if scratch_base:
+        # one folder per study, so several studies can share the scratch disk
+        study_id = hashlib.sha256(os.path.abspath(study_folder).encode()).hexdigest()[:12]
+        root = os.path.join(scratch_base, study_id)
+        os.makedirs(root, exist_ok=True)
+    watched = [study_folder]
+    study = study_folder
+    peak = 0
+
+
+def job_dir(name):
+    """
+    Folder for the scratch files of job `name`, None if no scratch folder is configured
+    (the files then stay next to the job input).
+    """
+    if not root:
+        return None
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def job_name(folder):
+    """
+    Name of the scratch folder of the job in folder: its path in the study folder with '_' for '/',
+    so jobs in subfolders (e.g. screen/soc_dis_4_+0.1 of the mode screening) do not share the
+    scratch folder of the job with the same name in the study folder.
+    """
+    path = os.path.relpath(folder, study) if study else os.pardir
+    if path.startswith(os.pardir):
+        return os.path.basename(os.path.normpath(folder))
+    return path.replace(os.sep, '_')
+
+
+def folder_size(folder, patterns=None):
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+                continue
+            try:
+                if not os.path.islink(path):
+                    total += os.path.getsize(path)
+            except OSError:
+                continue
+    return total
+
+
+def usage():
+    """
+    Current scratch usage in bytes, and update the recorded peak.
+    """
+    global peak, last_usage
+    if root:
+        used = folder_size(root)
+    else:
+        used = sum(folder_size(folder, scratch_patterns) for folder in watched)
+    with lock:
+        peak = max(peak, used)
+        last_usage = (time.time(), used)
+    return used
+
+
+def has_space():
+    """
+    False while the scratch usage is above the cap, used to hold back new jobs.
+    It is asked for every ready job, so the usage is only measured again (a walk of the whole
+    scratch folder) when the last measurement is older than max_age seconds; cleanup() and the
+    monitor measure it too.
+    """
+    if not cap:
+        return True
+    measured, used = last_usage
+    if time.time() - measured > max_age:
+        used = usage()
+    return used <= cap
+
+
+def link_into(folder, scratch_folder, names):
+    """
+    Symlink the scratch files `names` into folder, so programs looking for them there
+    (pysoc looks for gaussian.rwf in the SOC folder) find them. A regular file with the same name,
+    e.g. the rwf of an earlier run without scratch, is left in place.
+    Returns the names which were linked.
+    """
+    linked = []
+    for name in names:
+        link = os.path.join(folder, name)
+        if os.path.islink(link):
+            os.remove(link)
+        elif os.path.exists(link):
+            print(f"Keeping {link}, not linking it to the scratch folder")
+            continue
+        os.symlink(os.path.join(scratch_folder, name), link)
+        linked.append(name)
+    return linked
+
+
+def cleanup(folder, names=('gaussian.rwf', 'gaussian.chk'), sudo=False):
+    """
+    Delete scratch files of a finished job in folder (and their targets if they are symlinks
+    into the scratch folder). Returns the number of bytes freed.
+    Files the user cannot remove are listed and left, unless sudo is True (only for interactive
+    use like rm_gaus.py, never from the pipeline).
+    """
+    global last_usage
+    # usage before the files are removed. A walk of the whole scratch folder after every job is slow
+    # for large studies, so a measurement younger than max_age (monitor, has_space) is reused
+    measured, used = last_usage
+    if time.time() - measured > max_age:
+        used = usage()
+    freed = 0
+    denied = []
+    for name in names:
+        path = os.path.join(folder, name)
+        targets = [path]
+        if os.path.islink(path):
+            targets.insert(0, os.path.realpath(path))
+        for target in targets:
+            if not os.path.lexists(target):
+                continue
+            try:
+                if not os.path.islink(target):
+                    freed += os.path.getsize(target)
+                os.remove(target)
+            except PermissionError:
+                denied.append(target)
+
+    if denied and sudo:
+        # files written by another user (e.g. the queue system), remove them in one call
+        if subprocess.run(["sudo", "rm", "-f"] + denied).returncode == 0:
+            denied = []
+    if denied:
+        print(f"WARNING: no permission to remove {len(denied)} scratch files, left in place:")
+        for path in denied:
+            print(f"  {path}")
+
+    if root and os.path.isdir(os.path.join(root, job_name(folder))):
+        shutil.rmtree(os.path.join(root, job_name(folder)), ignore_errors=True)
+    with lock:
+        # held jobs can start right away, without measuring again
+        last_usage = (time.time(), max(0, used - freed))
+    return freed
+
+
+def start_monitor(interval=30):
+    """
+    Sample the scratch usage in a background thread to record the peak between jobs.
+    """
+    global monitor
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(interval):
+            usage()
+
+    monitor = (threading.Thread(target=sample, daemon=True), stop)
+    monitor[0].start()
+
+
+def stop_monitor():
+    """
+    Stop the monitor and return the peak scratch usage in bytes.
+    """
+    global monitor
+    if monitor is not None:
+        monitor[1].set()
+        monitor = None
+    usage()
+    return peak
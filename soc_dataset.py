@@ -0,0 +1,139 @@
+# All SOC values of a study in one dense NumPy array, for analysis and plotting of large studies.
+# soc.npy holds the values in cm-1 with shape (mode, amplitude, singlet, triplet), NaN where no value
+# was computed, and soc_axes.npz the labels of the axes. soc.npy is loaded with mmap_mode='r', so only
+# the slices which are used are read from disk.
+# Usage: python3 soc_dataset.py [singlets]   collects the soc_out.dat files (or results.db) of a study
+
+import glob
+import os
+import sys
+import numpy as np
+import results_db
+from parse_cache import cached
+
+
+def state_number(state):
+    # S1 -> 1, T10 -> 10, 'T*' and 'S*' are how pysoc writes T10 and S10
+    return 10 if state[1:] == '*' else int(state[1:])
+
+
+def normalize_state(state):
+    return f"{state[0]}{state_number(state)}"
+
+
+@cached
+def read_soc_out(soc_file):
+    """
+    {(singlet, triplet): SOC in cm-1} of a pysoc soc_out.dat, with 'S*'/'T*' written as S10/T10.
+    This is the parser of soc_out.dat used by all the scripts, its result is cached.
+    """
+    soc = {}
+    with open(soc_file, 'r') as file:
+        for line in file:
+            if ':' not in line or '<' not in line:
+                continue
+            states = line.split("<")[1].split(">")[0].split('|')
+            singlet, triplet = states[0], states[2].split(",")[0]
+            if '*' in singlet or '*' in triplet:
+                singlet, triplet = normalize_state(singlet), normalize_state(triplet)
+            soc[singlet, triplet] = float(line.split(":")[1].split()[0])
+    return soc
+
+
+def folder_amplitude(folder_name):
+    # soc_dis_4_+0.5 -> (4, 0.5)
+    mode, amplitude = folder_name.split('_')[-2:]
+    return int(mode), float(amplitude)
+
+
+def collect(folder, db_file=None, molecule=None):
+    """
+    {(mode, amplitude): {(singlet, triplet): SOC}} from the results database if db_file is given,
+    otherwise from the soc_dis_*/soc_out.dat files in folder.
+    """
+    values = {}
+    if db_file:
+        molecule = molecule or results_db.default_molecule(folder)
+        for mode, amplitude in results_db.geometries(db_file, molecule):
+            soc = results_db.load_soc(db_file, molecule, mode, amplitude)
+            values[mode, amplitude] = {(normalize_state(s), normalize_state(t)): v for (s, t), v in soc.items()}
+        return values
+
+    for soc_file in glob.glob(os.path.join(folder, 'soc_dis_*', 'soc_out.dat')):
+        try:
+            key = folder_amplitude(os.path.basename(os.path.dirname(soc_file)))
+        except ValueError:
+            continue  # e.g. the screening reference
+        values[key] = read_soc_out(soc_file)
+    return values
+
+
+def build(folder, db_file=None, molecule=None):
+    """
+    Collect the SOC values of the study in folder into folder/soc.npy and folder/soc_axes.npz.
+    Returns the shape of the array.
+    """
+    values = collect(folder, db_file, molecule)
+    modes = sorted({mode for mode, amplitude in values})
+    amplitudes = sorted({amplitude for mode, amplitude in values})
+    pairs = {pair for soc in values.values() for pair in soc}
+    singlets = sorted({s for s, t in pairs}, key=state_number)
+    triplets = sorted({t for s, t in pairs}, key=state_number)
+
+    mode_index = {m: i for i, m in enumerate(modes)}
+    amplitude_index = {a: i for i, a in enumerate(amplitudes)}
+    singlet_index = {s: i for i, s in enumerate(singlets)}
+    triplet_index = {t: i for i, t in enumerate(triplets)}
+
+    data = np.full((len(modes), len(amplitudes), len(singlets), len(triplets)), np.nan)
+    for (mode, amplitude), soc in values.items():
+        for (s, t), value in soc.items():
+            data[mode_index[mode], amplitude_index[amplitude], singlet_index[s], triplet_index[t]] = value
+
+    # write next to the final files and rename, so a reader never sees half written files
+    tmp = os.path.join(folder, 'soc.tmp.npy')
+    np.save(tmp, data)
+    os.replace(tmp, os.path.join(folder, 'soc.npy'))
+    tmp = os.path.join(folder, 'soc_axes.tmp.npz')
+    np.savez(tmp, modes=np.array(modes, dtype=int), amplitudes=np.array(amplitudes, dtype=float),
+             singlets=np.array(singlets, dtype=str), triplets=np.array(triplets, dtype=str))
+    os.replace(tmp, os.path.join(folder, 'soc_axes.npz'))
+    return data.shape
+
+
+def load(folder):
+    """
+    The dataset of folder as a dict: 'soc' (memory mapped, read only), 'modes', 'amplitudes',
+    'singlets' and 'triplets'. None if the dataset was not built.
+    """
+    if not os.path.isfile(os.path.join(folder, 'soc.npy')):
+        return None
+    with np.load(os.path.join(folder, 'soc_axes.npz')) as axes:
+        dataset = {name: axes[name] for name in axes.files}
+    dataset['soc'] = np.load(os.path.join(folder, 'soc.npy'), mmap_mode='r')
+    return dataset
+
+
+def curves(dataset, mode, singlet):
+    """
+    SOC curves of one mode and singlet: {triplet: (amplitudes, values)} without the missing points.
+    Only this (amplitude x triplet) slice of the file is read.
+    """
+    modes = dataset['modes'].tolist()
+    singlets = dataset['singlets'].tolist()
+    if mode not in modes or singlet not in singlets:
+        return {}
+    values = np.asarray(dataset['soc'][modes.index(mode), :, singlets.index(singlet), :])
+    result = {}
+    for j, triplet in enumerate(dataset['triplets'].tolist()):
+        known = ~np.isnan(values[:, j])
+        if known.any():
+            result[triplet] = (dataset['amplitudes'][known], values[known, j])
+    return result
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), 'singlets')
+    db_file = os.path.join(folder, 'results.db')
+    shape = build(folder, db_file if os.path.isfile(db_file) else None)
+    print(f"SOC dataset of {folder}: {shape[0]} modes x {shape[1]} amplitudes x {shape[2]} singlets x {shape[3]} triplets")
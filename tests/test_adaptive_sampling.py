@@ -0,0 +1,53 @@
+import pytest
+from adaptive_sampling import crossings, interval_errors, new_amplitudes, second_derivative
+
+amps = [-0.5, 0.0, 0.5]
+
+
+def curve(f, points=amps):
+    return {a: f(a) for a in points}
+
+
+def test_second_derivative_on_a_non_uniform_grid():
+    assert second_derivative((0.0, 0.1, 0.4), (0.0, 0.01, 0.16)) == pytest.approx(2.0)
+
+
+def test_interval_errors():
+    errors = interval_errors(amps, [100 * a**2 for a in amps])
+    # |f''| h^2 / 8 = 200 * 0.25 / 8
+    assert errors == pytest.approx([6.25, 6.25])
+    assert interval_errors([0.0, 0.5], [1.0, 2.0]) == [None]
+
+
+def test_curved_soc_curve_is_split():
+    curves = {('S1', 'T1'): curve(lambda a: 5 + 100 * a**2)}
+    added = new_amplitudes(amps, curves, {}, tolerance=1.0, min_step=0.05)
+    assert [a for a, reason in added] == [-0.25, 0.25]
+    assert "S1-T1 SOC error 6.25" in added[0][1]
+
+
+def test_flat_soc_curve_is_not_split():
+    curves = {('S1', 'T1'): curve(lambda a: 5 + 2 * a), ('S2', 'T1'): curve(lambda a: 7.0)}
+    assert new_amplitudes(amps, curves, {}, tolerance=1.0, min_step=0.05) == []
+    # a curvature below the tolerance is not enough either
+    assert new_amplitudes(amps, {('S1', 'T1'): curve(lambda a: 5 + a**2)}, {}, tolerance=1.0, min_step=0.05) == []
+
+
+def test_singlet_triplet_crossing_is_split():
+    energies = {-0.5: {'S1': 3.0, 'T2': 2.9}, 0.0: {'S1': 3.0, 'T2': 3.1}, 0.5: {'S1': 3.0, 'T2': 3.2}}
+    assert crossings(amps, energies) == [[('S1', 'T2')], []]
+    curves = {('S1', 'T2'): curve(lambda a: 5.0)}
+    assert new_amplitudes(amps, curves, energies, tolerance=1.0, min_step=0.05) == [(-0.25, "S1/T2 crossing")]
+
+
+def test_min_step_stops_splitting():
+    fine = [-0.1, 0.0, 0.1]
+    curves = {('S1', 'T1'): curve(lambda a: 1e4 * a**2, fine)}
+    assert [a for a, reason in new_amplitudes(fine, curves, {}, 1.0, min_step=0.05)] == [-0.05, 0.05]
+    assert new_amplitudes(fine, curves, {}, 1.0, min_step=0.06) == []
+
+
+def test_too_few_points():
+    # the pysoc job of 0.5 failed, only two points of the curve are known
+    curves = {('S1', 'T1'): curve(lambda a: 5.0, [-0.5, 0.0])}
+    assert new_amplitudes(amps, curves, {}, tolerance=1.0, min_step=0.05) == [(-0.25, "too few points")]
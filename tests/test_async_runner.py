@@ -0,0 +1,84 @@
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from async_runner import AsyncRunner, format_seconds
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def run_in_threads(runner, commands):
+    errors = {}
+
+    def run(i, argv):
+        try:
+            runner.run(argv, name=f"job{i}")
+        except subprocess.SubprocessError as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, argv)) for i, argv in enumerate(commands)]
+    for thread in threads:
+        thread.start()
+    return threads, errors
+
+
+def test_exit_status(tmp_path):
+    runner = AsyncRunner()
+    assert runner.run(python("open('out', 'w').write('ok')"), cwd=str(tmp_path), name="write") == 0
+    assert (tmp_path / "out").read_text() == "ok"
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        runner.run(python("raise SystemExit(3)"), name="fail")
+    assert error.value.returncode == 3
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        runner.run(["/nonexistent/g16"], name="missing")
+    assert error.value.returncode == 127
+    assert runner.summary()[0] == {'done': 1, 'failed': 2}
+
+
+def test_repeated_names_are_numbered():
+    runner = AsyncRunner()
+    runner.run(python("pass"), name="gaussian")
+    runner.run(python("pass"), name="gaussian")
+    assert list(runner.jobs) == ["gaussian", "gaussian#2"]
+
+
+def test_max_jobs_limits_running_processes():
+    runner = AsyncRunner(max_jobs=2)
+    threads, errors = run_in_threads(runner, [python("import time; time.sleep(0.3)")] * 4)
+    time.sleep(0.15)
+    counts, wall_times = runner.summary()
+    assert counts.get('running', 0) <= 2
+    for thread in threads:
+        thread.join()
+    assert errors == {}
+    assert runner.summary()[0] == {'done': 4}
+
+
+def test_timeout():
+    runner = AsyncRunner(timeout=0.2)
+    with pytest.raises(subprocess.TimeoutExpired):
+        runner.run(python("import time; time.sleep(30)"), name="slow")
+    assert runner.jobs["slow"]['status'] == 'timeout'
+
+
+def test_cancel_stops_running_and_queued_jobs():
+    runner = AsyncRunner(max_jobs=1)
+    threads, errors = run_in_threads(runner, [python("import time; time.sleep(30)")] * 2)
+    deadline = time.time() + 10
+    while runner.summary()[0].get('running') != 1 and time.time() < deadline:
+        time.sleep(0.02)
+    start = time.time()
+    runner.cancel()
+    for thread in threads:
+        thread.join(10)
+    assert time.time() - start < 10
+    assert sorted(errors) == [0, 1]
+    assert all(job['status'] == 'cancelled' for job in runner.jobs.values())
+
+
+def test_format_seconds():
+    assert format_seconds(75) == "1m15s"
+    assert format_seconds(3725) == "1h02m05s"
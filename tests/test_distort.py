@@ -0,0 +1,78 @@
+import os
+import distort
+
+
+def test_partial_logs_are_moved_aside(tmp_path):
+    log = tmp_path / "gaussian.log"
+    assert not distort.finished_log(str(log))
+
+    log.write_text(" Excited State   1:      Singlet-A      3.1234 eV\n SCF Do")  # killed mid-run
+    assert not distort.finished_log(str(log))
+    assert not log.exists()
+    assert (tmp_path / "gaussian.log.partial").exists()
+
+    log.write_text(" Normal termination of Gaussian 16 at Thu Jan  1 2026.\n")
+    assert distort.finished_log(str(log))
+
+    # an error termination is kept, check_gaussian_log reports it
+    log.write_text(" Error termination via Lnk1e in /opt/g16/l502.exe at Thu Jan  1 2026.\n")
+    assert distort.finished_log(str(log))
+    assert os.path.isfile(log)
+
+
+def block(mode, amplitude, x):
+    return (f"%nprocshared=4\n%mem=2GB\n# b3lyp/6-31g(d) nosymm\n\n"
+            f"Distortion along normal mode N {mode} by {amplitude}\n\n0 1\n C {x:.5f} 0.00000 0.00000\n\n")
+
+
+blocks = [block(4, "+0.25", 0.1), block(4, "+0.5", 0.2), block(4, "-0.25", 0.3), block(4, "-0.5", 0.4),
+          block(5, "+0.5", 0.5)]
+
+
+def write_input(tmp_path, final_link1=False):
+    path = tmp_path / "mol_dist_sing.com"
+    path.write_text("--Link1--\n".join(blocks) + ("--Link1--\n" if final_link1 else ""))
+    return str(path)
+
+
+def test_index_distortions(tmp_path):
+    dist_file = write_input(tmp_path)
+    index = distort.index_distortions(dist_file)
+    assert sorted(index) == [4, 5]
+    assert [amplitude for amplitude, start, end in index[4]] == ["+0.25", "+0.5", "-0.25", "-0.5"]
+    data = open(dist_file, 'rb').read()
+    # every block runs from after one --Link1-- to the next
+    assert [data[start:end].decode() for amplitude, start, end in index[4]] == blocks[:4]
+
+
+def test_split_keeps_every_amplitude_of_a_sign(tmp_path):
+    out = tmp_path / "singlets"
+    out.mkdir()
+    files = distort.generate_distort_mode(str(out), write_input(tmp_path), 4)
+    assert files == ["mol_dist_sing_4_+0.25.com", "mol_dist_sing_4_+0.5.com",
+                     "mol_dist_sing_4_-0.25.com", "mol_dist_sing_4_-0.5.com"]
+    for name, text in zip(files, blocks):
+        assert (out / name).read_bytes() == text.encode()
+
+
+def test_split_with_and_without_final_link1(tmp_path):
+    for final_link1 in (False, True):
+        out = tmp_path / f"singlets_{final_link1}"
+        out.mkdir()
+        files = distort.generate_distort_mode(str(out), write_input(out, final_link1), 5)
+        assert files == ["mol_dist_sing_5_+0.5.com"]
+        assert (out / files[0]).read_text() == blocks[4]
+    assert distort.generate_distort_mode(str(out), write_input(out), 7) == []
+
+
+def test_sign_named_logs_of_older_versions_are_reused(tmp_path):
+    out = tmp_path / "singlets"
+    out.mkdir()
+    normal = " Normal termination of Gaussian 16 at Thu Jan  1 2026.\n"
+    # the old split kept the last block of each sign
+    (out / "mol_dist_sing_4_+.log").write_text(" Distortion along normal mode N 4 by +0.5\n" + normal)
+    (out / "mol_dist_sing_4_-.log").write_text(" Distortion along normal mode N 4 by -0.5\n SCF Done")
+    distort.generate_distort_mode(str(out), write_input(tmp_path), 4)
+    # the finished log is renamed, the unfinished one is left alone
+    assert sorted(p.name for p in out.glob("*.log")) == ["mol_dist_sing_4_+0.5.log", "mol_dist_sing_4_-.log"]
+    assert "by +0.5" in (out / "mol_dist_sing_4_+0.5.log").read_text()
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import pytest
+from executors import com_resources, get_executor, SlurmExecutor, PBSExecutor
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+fake_slurm = f"{sys.executable} {os.path.join(repo_dir, 'fake_slurm.py')}"
+
+
+@pytest.fixture
+def fake_queue(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_SLURM_DIR", str(tmp_path / "queue"))
+    for variable, command in [("SBATCH", "sbatch"), ("SQUEUE", "squeue"), ("SCANCEL", "scancel"),
+                              ("QSUB", "qsub"), ("QSTAT", "qstat"), ("QDEL", "qdel")]:
+        monkeypatch.setenv(variable, f"{fake_slurm} {command}")
+    work_dir = tmp_path / "job"
+    work_dir.mkdir()
+    return work_dir
+
+
+def write_com(path, link0):
+    path.write_text(f"{link0}# td=(50-50,nstates=10) b3lyp/6-31g(d)\n\ntitle\n\n0 1\n C 0.0 0.0 0.0\n\n")
+    return str(path)
+
+
+def test_com_resources(tmp_path):
+    assert com_resources(write_com(tmp_path / "a.com", "%nprocshared=8\n%mem=16GB\n")) == (8, 16)
+    assert com_resources(write_com(tmp_path / "b.com", "%mem=512mb\n")) == (1, 0.5)
+    assert com_resources(write_com(tmp_path / "c.com", "%mem=1GW\n")) == (1, 8)
+    assert com_resources(write_com(tmp_path / "d.com", "%mem=134217728\n")) == (1, 1)  # words
+    assert com_resources(None) == (1, None)
+    with pytest.raises(ValueError):
+        com_resources(write_com(tmp_path / "e.com", "%mem=lots\n"))
+
+
+def test_get_executor():
+    assert get_executor('slurm').name == 'slurm'
+    with pytest.raises(ValueError):
+        get_executor('lsf')
+
+
+def test_job_script_header(tmp_path):
+    com_file = write_com(tmp_path / "job.com", "%nprocshared=4\n%mem=10GB\n")
+    script, exit_file = SlurmExecutor(options=["--partition=short"]).write_script(["g16", "job.com"], str(tmp_path), "job", com_file)
+    text = open(script).read()
+    assert "#SBATCH --cpus-per-task=4" in text and "#SBATCH --mem=11G" in text
+    assert "#SBATCH --partition=short" in text
+    assert "\ng16 job.com\n" in text and exit_file in text
+
+
+@pytest.mark.filterwarnings("error::ResourceWarning", "error::pytest.PytestUnraisableExceptionWarning")
+@pytest.mark.parametrize("executor", [SlurmExecutor, PBSExecutor])
+def test_batch_jobs_through_a_fake_queue(fake_queue, executor):
+    runner = executor(poll_interval=0.1)
+    assert runner.run(["touch", "done"], str(fake_queue), job_name="ok")
+    assert (fake_queue / "done").exists()
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        runner.run(["sh", "-c", "exit 3"], str(fake_queue), job_name="fail")
+    assert error.value.returncode == 3
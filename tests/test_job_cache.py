@@ -0,0 +1,86 @@
+import os
+import pytest
+import job_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_cache, 'cache_dir', str(tmp_path / "cache"))
+    monkeypatch.setattr(job_cache, 'enabled', True)
+    monkeypatch.setattr(job_cache, 'stats', {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0})
+    return job_cache
+
+
+def write_com(path, route="# td=(singlets,nstates=10) b3lyp/6-31g(d)", title="energy", x=0.0, link0="%mem=2GB\n"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"{link0}{route}\n\n{title}\n\n0 1\n C {x:.5f} 0.00000 0.00000\n H 0.00000 0.00000 1.09000\n\n")
+    return str(path)
+
+
+def finished_job(folder, text, **com):
+    com_file = write_com(folder / "job.com", **com)
+    log_file = folder / "job.log"
+    log_file.write_text(text)
+    return com_file, str(log_file)
+
+
+def test_miss_then_hit_under_another_name(cache, tmp_path):
+    com_file, log_file = finished_job(tmp_path / "a", "result\n")
+    assert not cache.fetch(com_file, {'job.log': log_file})
+    cache.store(com_file, {'job.log': log_file})
+
+    # same job with other link 0 lines, title, folder and guess=read
+    other = write_com(tmp_path / "b" / "other.com", route="# TD=(singlets,nstates=10)  B3LYP/6-31G(d) guess=read",
+                      title="another title", link0="%mem=60GB\n%nprocshared=25\n%chk=x.chk\n", x=0.00001)
+    out = tmp_path / "b" / "other.log"
+    assert cache.fetch(other, {'job.log': str(out)})
+    assert out.read_text() == "result\n"
+    assert (cache.stats['hits'], cache.stats['misses'], cache.stats['stored']) == (1, 1, 1)
+
+
+def test_different_inputs_miss(cache, tmp_path):
+    com_file, log_file = finished_job(tmp_path / "a", "result\n")
+    cache.store(com_file, {'job.log': log_file})
+    out = str(tmp_path / "out.log")
+    assert not cache.fetch(write_com(tmp_path / "geom.com", x=0.1), {'job.log': out})
+    assert not cache.fetch(write_com(tmp_path / "route.com", route="# td=(triplets,nstates=10) b3lyp/6-31g(d)"), {'job.log': out})
+    # the title only counts with include_title
+    assert not cache.fetch(write_com(tmp_path / "title.com", title="4_+0.5"), {'job.log': out}, include_title=True)
+
+
+def test_extra_inputs_are_part_of_the_key(cache, tmp_path):
+    com_file, log_file = finished_job(tmp_path / "a", "result\n")
+    init = tmp_path / "init.py"
+    init.write_text("nstates = 5\n")
+    cache.store(com_file, {'job.log': log_file}, inputs=[str(init)])
+    out = {'job.log': str(tmp_path / "out.log")}
+    assert cache.fetch(com_file, out, inputs=[str(init)])
+    init.write_text("nstates = 10\n")
+    assert not cache.fetch(com_file, out, inputs=[str(init)])
+
+
+def test_disabled_cache(cache, tmp_path):
+    com_file, log_file = finished_job(tmp_path / "a", "result\n")
+    cache.enabled = False
+    cache.store(com_file, {'job.log': log_file})
+    assert not os.path.isdir(cache.cache_dir)
+    assert not cache.fetch(com_file, {'job.log': log_file})
+
+
+def test_eviction_removes_least_recently_used(cache, tmp_path):
+    entries = []
+    for i in range(3):
+        com_file, log_file = finished_job(tmp_path / str(i), "x" * 100, x=i)
+        cache.store(com_file, {'job.log': log_file})
+        entry = os.path.join(cache.cache_dir, cache.job_key(com_file))
+        os.utime(entry, (1000 + i, 1000 + i))
+        entries.append((com_file, entry))
+
+    # a hit makes the oldest entry the most recently used
+    assert cache.fetch(entries[0][0], {'job.log': str(tmp_path / "out.log")})
+    cache.evict(limit=250)
+    assert os.path.isdir(entries[0][1])
+    assert not os.path.isdir(entries[1][1])
+    assert os.path.isdir(entries[2][1])
+    assert cache.stats['evicted'] == 1
+    assert cache.cache_stats()['entries'] == 2
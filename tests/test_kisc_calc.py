@@ -0,0 +1,44 @@
+import math
+import numpy as np
+import pytest
+from kisc_calc import k_isc_grid, rates_from_data, h
+
+
+def k_isc_scalar(delta_energy, soc, T, L, h=h):
+    # the per-pair loop k_isc_grid replaced
+    kbT = 8.62e-05 * T
+    rho = (1 / math.sqrt(4 * math.pi * L * kbT)) * math.exp(-((delta_energy + L) ** 2) / (4 * L * kbT))
+    return 4 * (math.pi ** 2) * (1 / h) * rho * soc ** 2
+
+
+delta_energy = np.array([0.05, 0.2, 0.4123, 0.0])
+soc = np.array([1e-4, 2.5e-3, 6e-4, 1e-5])
+
+
+def test_grid_matches_the_scalar_loop():
+    T = np.array([77.0, 300.0, 400.0])
+    L = np.array([0.1, 0.2])
+    k = k_isc_grid(delta_energy, soc, T, L)
+    assert k.shape == (4, 3, 2)
+    for p in range(4):
+        for i, t in enumerate(T):
+            for j, l in enumerate(L):
+                assert k[p, i, j] == pytest.approx(k_isc_scalar(delta_energy[p], soc[p], t, l), rel=1e-12)
+
+
+def test_scalar_temperature_and_reorganization():
+    k = k_isc_grid(delta_energy, soc, 300, 0.2)
+    assert k.shape == (4,)
+    assert k == pytest.approx([k_isc_scalar(d, s, 300, 0.2) for d, s in zip(delta_energy, soc)], rel=1e-12)
+    # kisc.py passes plain floats and its own Planck constant
+    assert float(k_isc_grid(0.3, 1e-4, 300, 0.2, h=4.14e-15)) == pytest.approx(k_isc_scalar(0.3, 1e-4, 300, 0.2, h=4.14e-15), rel=1e-12)
+
+
+def test_rates_from_data_pairs():
+    singlets = {'S1': 3.0, 'S2': 3.5}
+    triplets = {'T1': 2.8}
+    soc = {('S0', 'T1'): 1e-4, ('S1', 'T1'): 2e-4, ('S2', 'T2'): 3e-4}  # no T2 energy
+    rates = rates_from_data(singlets, triplets, soc)
+    assert set(rates) == {('S0', 'T1'), ('S1', 'T1')}
+    assert rates['S1', 'T1'] == pytest.approx(k_isc_scalar(0.2, 2e-4, 300, 0.2), rel=1e-12)
+    assert rates['S0', 'T1'] == pytest.approx(k_isc_scalar(2.8, 1e-4, 300, 0.2), rel=1e-12)
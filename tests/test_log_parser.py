@@ -0,0 +1,132 @@
+import pytest
+from log_parser import iter_events, distorted_geometries, last_orientation, scf_cycles, read_tail, termination_status
+from log_parser import scan_excited_states, excited_state_energies
+
+
+def orientation(atoms):
+    table = "".join(f"      {i}          {A}           0        {x:.6f}    {y:.6f}    {z:.6f}\n"
+                    for i, (A, x, y, z) in enumerate(atoms, start=1))
+    return ("                         Standard orientation:\n"
+            " ---------------------------------------------------------------------\n"
+            " Center     Atomic      Atomic             Coordinates (Angstroms)\n"
+            " Number     Number       Type             X           Y           Z\n"
+            " ---------------------------------------------------------------------\n"
+            + table +
+            " ---------------------------------------------------------------------\n")
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_iter_events_in_one_pass(tmp_path):
+    log = write(tmp_path / "job.log",
+                " Distortion along normal mode N 4 by +0.5\n"
+                + orientation([(6, 0.0, 0.0, 0.0), (1, 0.0, 0.0, 1.09)])
+                + " SCF Done:  E(RB3LYP) =  -40.5183   A.U. after   12 cycles\n"
+                + " Excited State   1:      Singlet-A      3.1234 eV  396.97 nm  f=0.0123  <S**2>=0.000\n"
+                + " Normal termination of Gaussian 16 at Thu Jan  1 00:00:00 2026.\n")
+    events = list(iter_events(log))
+    assert [event for event, data in events] == ['distortion', 'orientation', 'scf', 'excited_state', 'termination']
+    assert events[0][1] == {'mode': 4, 'sign': '+', 'amplitude': 0.5, 'key': '4_+0.5'}
+    assert events[1][1] == [(6, 0.0, 0.0, 0.0), (1, 0.0, 0.0, 1.09)]
+    assert events[2][1] == {'method': 'RB3LYP', 'energy': -40.5183, 'cycles': 12}
+    assert events[3][1] == {'index': 1, 'multiplicity': 'Singlet', 'energy': 3.1234, 'f': 0.0123}
+    assert events[4][1]['normal']
+
+
+def test_distorted_geometries_takes_the_first_orientation_of_each_header(tmp_path):
+    log = write(tmp_path / "dist.log",
+                " Distortion along normal mode N 4 by +0.5\n"
+                + orientation([(6, 0.5, 0.0, 0.0)])
+                + orientation([(6, 0.6, 0.0, 0.0)])  # later steps of the same job
+                + " Distortion along normal mode N 4 by -0.5\n"
+                + orientation([(6, -0.5, 0.0, 0.0)]))
+    assert distorted_geometries(log) == {'4_+0.5': [(6, 0.5, 0.0, 0.0)], '4_-0.5': [(6, -0.5, 0.0, 0.0)]}
+    assert last_orientation(log) == [(6, -0.5, 0.0, 0.0)]
+
+
+def test_missing_sections_raise(tmp_path):
+    log = write(tmp_path / "opt.log", orientation([(1, 0.0, 0.0, 0.0)]))
+    with pytest.raises(ValueError, match="Distortion"):
+        distorted_geometries(log)
+    with pytest.raises(ValueError, match="Standard orientation"):
+        last_orientation(write(tmp_path / "empty.log", ""))
+
+
+def test_scf_cycles_per_link(tmp_path):
+    log = write(tmp_path / "job.log",
+                " SCF Done:  E(RB3LYP) =  -40.5  A.U. after   12 cycles\n"
+                " SCF Done:  E(RB3LYP) =  -40.6  A.U. after    5 cycles\n")
+    assert scf_cycles(log) == [12, 5]
+
+
+def test_read_tail_across_blocks(tmp_path):
+    log = write(tmp_path / "long.log", "".join(f" line {i}\n\n" for i in range(1000)))
+    lines, partial = read_tail(log, n_lines=5, block_size=64)
+    assert lines == [f" line {i}" for i in range(995, 1000)]
+    assert not partial
+
+
+def test_read_tail_of_a_log_being_written(tmp_path):
+    log = write(tmp_path / "running.log", " SCF Done:  E(RB3LYP) =  -40.5  A.U. after   12 cycles\n Excited St")
+    lines, partial = read_tail(log)
+    assert lines[-1] == " Excited St"
+    assert partial
+
+
+def test_termination_status_normal(tmp_path):
+    log = write(tmp_path / "job.log", " Job cpu time: ...\n Normal termination of Gaussian 16 at Thu Jan  1 2026.\n\n")
+    status = termination_status(log)
+    assert status['status'] == 'normal' and status['normal']
+    assert status['line'].startswith("Normal termination")
+
+
+def test_termination_status_partly_written(tmp_path):
+    log = write(tmp_path / "job.log", " Normal termination of Gaussian 16 at Thu Jan  1 2026.\n Link1:  Proceeding to internal job step number  2.\n SCF Done")
+    status = termination_status(log)
+    assert status['status'] == 'incomplete' and not status['normal']
+    assert status['reasons'] == ["log file is still being written"]
+
+
+def test_termination_status_error_link_and_reasons(tmp_path):
+    log = write(tmp_path / "job.log",
+                " >>>>>>>>>> Convergence criterion not met.\n"
+                " Convergence failure -- run terminated.\n"
+                " Error termination via Lnk1e in /opt/g16/l502.exe at Thu Jan  1 2026.\n"
+                " Job cpu time:       0 days  0 hours  1 minutes 12.0 seconds.\n")
+    status = termination_status(log)
+    assert status['status'] == 'error' and not status['normal']
+    assert status['link'] == 'l502'
+    assert status['reasons'] == ["scf convergence failure"]
+
+
+def test_termination_status_unknown_error_and_empty_log(tmp_path):
+    log = write(tmp_path / "job.log", " Error termination request processed by link 9999.\n")
+    status = termination_status(log)
+    assert status['status'] == 'error' and status['reasons'] == [] and status['link'] is None
+    assert termination_status(write(tmp_path / "empty.log", ""))['status'] == 'empty'
+
+
+def test_scan_excited_states(tmp_path):
+    log = write(tmp_path / "soc.log",
+                " Excited State   1:      Singlet-A      3.1234 eV  396.97 nm  f=0.0123  <S**2>=0.000\n"
+                "      45 -> 47         0.20123\n"
+                "      46 -> 47         0.65000\n"
+                "      46 <- 47        -0.70000\n"
+                " Excited State   2:      Triplet-A      2.5000 eV  495.94 nm  f=0.0000  <S**2>=2.000\n"
+                "      46 -> 48        -0.69000\n"
+                "\n"
+                " Excited State   3:      Singlet-A      3.5000 eV  354.24 nm  f=0.1000  <S**2>=0.000\n")
+    singlets, triplets = scan_excited_states(log)
+    assert singlets['S1'] == {'energy': 3.1234, 'f': 0.0123, 'transition': "46 -> 47", 'coefficient': 0.65}
+    assert singlets['S2'] == {'energy': 3.5, 'f': 0.1, 'transition': None, 'coefficient': None}
+    assert triplets == {'T1': {'energy': 2.5, 'f': 0.0, 'transition': "46 -> 48", 'coefficient': -0.69}}
+    assert excited_state_energies(log) == ({'S1': 3.1234, 'S2': 3.5}, {'T1': 2.5})
+
+
+def test_scan_excited_states_of_empty_and_ground_state_logs(tmp_path):
+    # an empty file cannot be memory mapped
+    assert scan_excited_states(write(tmp_path / "empty.log", "")) == ({}, {})
+    assert scan_excited_states(write(tmp_path / "opt.log", " SCF Done:  E(RB3LYP) =  -40.5  A.U. after   12 cycles\n")) == ({}, {})
@@ -0,0 +1,24 @@
+import numpy as np
+from normal_modes import displaced_coords, geometry_key, key_amplitude
+
+
+def test_normalized_amplitudes_match_their_keys():
+    for amplitude in (0.1234567, -0.5, 12.345678, 0.0):
+        normalized = key_amplitude(amplitude)
+        key = geometry_key(np.int64(4), normalized)
+        assert key == geometry_key(4, amplitude)
+        # the database gets the amplitude back from the key
+        assert float(key.split('_')[1]) == normalized
+    assert geometry_key(4, 0.5) == "4_+0.5"
+
+
+def test_displaced_coords():
+    normal_modes = {
+        'coords': np.zeros((2, 3)),
+        'modes': np.array([[[1.0, 0, 0], [0, 0, 0]], [[0, 0, 0], [0, 1.0, 0]]]),
+        'frequencies': np.array([100.0, 200.0]),
+        'reduced_masses': np.array([1.0, 2.0]),
+    }
+    coords = displaced_coords(normal_modes, [2, 1], [-0.5, 0.5])
+    assert coords.shape == (2, 2, 2, 3)
+    assert coords[0, 1, 1, 1] == 0.5 and coords[1, 0, 0, 0] == -0.5
@@ -0,0 +1,77 @@
+import os
+import pytest
+import parse_cache
+
+calls = []
+
+
+@parse_cache.cached
+def parse_lines(path, upper=False):
+    calls.append(path)
+    with open(path) as f:
+        return [line.upper() if upper else line for line in f.read().split()]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    parse_cache.clear()
+    monkeypatch.setattr(parse_cache, 'counters', {'hits': 0, 'misses': 0, 'evictions': 0})
+    calls.clear()
+    yield
+    parse_cache.clear()
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_hit_while_unchanged(tmp_path):
+    path = write(tmp_path / "soc_out.dat", "a b c")
+    assert parse_lines(path) == ['a', 'b', 'c']
+    assert parse_lines(path) is parse_lines(path)
+    assert len(calls) == 1
+    stats = parse_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+
+
+def test_miss_when_the_file_changes(tmp_path):
+    path = write(tmp_path / "soc_out.dat", "a b c")
+    parse_lines(path)
+    write(tmp_path / "soc_out.dat", "a b c d")
+    assert parse_lines(path) == ['a', 'b', 'c', 'd']
+
+    # same size, only the modification time differs
+    write(tmp_path / "soc_out.dat", "x y z w")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert parse_lines(path) == ['x', 'y', 'z', 'w']
+    assert len(calls) == 3
+    assert parse_cache.stats()['entries'] == 1
+
+
+def test_arguments_are_part_of_the_key(tmp_path):
+    path = write(tmp_path / "soc_out.dat", "a b")
+    assert parse_lines(path) == ['a', 'b']
+    assert parse_lines(path, True) == ['A', 'B']
+    assert parse_lines(path, True) == ['A', 'B']
+    assert len(calls) == 2
+
+
+def test_least_recently_used_results_are_evicted(tmp_path, monkeypatch):
+    paths = [write(tmp_path / f"{i}.dat", "word " * 50) for i in range(3)]
+    parse_lines(paths[0])
+    one = parse_cache.stats()['size_mb'] * 1024**2
+    monkeypatch.setattr(parse_cache, 'max_bytes', 2.5 * one)
+    parse_lines(paths[1])
+    parse_lines(paths[0])  # most recently used now
+    parse_lines(paths[2])
+    stats = parse_cache.stats()
+    assert (stats['evictions'], stats['entries']) == (1, 2)
+
+    calls.clear()
+    parse_lines(paths[0])
+    parse_lines(paths[2])
+    assert calls == []
+    parse_lines(paths[1])
+    assert calls == [paths[1]]
@@ -0,0 +1,45 @@
+import numpy as np
+import results_db
+
+
+def test_soc_round_trip(tmp_path):
+    db_file = str(tmp_path / "results.db")
+    soc = {('S1', 'T1'): 12.5, ('S1', 'T10'): 0.25, ('S2', 'T1'): 3.0}
+    results_db.store_soc(db_file, 'mol', np.int64(4), 0.5, soc)
+    results_db.store_soc(db_file, 'mol', 4, -0.5, {('S1', 'T1'): 1.0})
+    results_db.store_soc(db_file, 'other', 4, 0.5, {('S1', 'T1'): 99.0})
+
+    assert results_db.load_soc(db_file, 'mol', 4, 0.5) == soc
+    assert results_db.load_soc(db_file, 'mol', 4, 0.25) == {}
+    assert results_db.geometries(db_file, 'mol') == [(4, -0.5), (4, 0.5)]
+    assert results_db.load_soc_curves(db_file, 'mol', 4)[0] == (-0.5, 'S1', 'T1', 1.0)
+
+
+def test_storing_again_replaces(tmp_path):
+    db_file = str(tmp_path / "results.db")
+    results_db.store_soc(db_file, 'mol', 4, 0.5, {('S1', 'T1'): 1.0})
+    results_db.store_soc(db_file, 'mol', 4, 0.5, {('S1', 'T1'): 2.0})
+    assert results_db.load_soc(db_file, 'mol', 4, 0.5) == {('S1', 'T1'): 2.0}
+
+
+def test_energies_in_numerical_order_and_by_multiplicity(tmp_path):
+    db_file = str(tmp_path / "results.db")
+    results_db.store_energies(db_file, 'mol', 4, 0.5, {'S10': 5.0, 'S2': 3.5, 'S1': 3.0})
+    results_db.store_energies(db_file, 'mol', 4, 0.5, {'T1': 2.5})
+    assert list(results_db.load_energies(db_file, 'mol', 4, 0.5, 'S').items()) == [('S1', 3.0), ('S2', 3.5), ('S10', 5.0)]
+    assert results_db.load_energies(db_file, 'mol', 4, 0.5, 'T') == {'T1': 2.5}
+    assert len(results_db.load_energies(db_file, 'mol', 4, 0.5)) == 4
+
+
+def test_kisc_keyed_on_temperature_and_reorganization(tmp_path):
+    db_file = str(tmp_path / "results.db")
+    results_db.store_kisc(db_file, 'mol', 4, 0.5, {('S1', 'T1'): 1e6}, 300, 0.2)
+    results_db.store_kisc(db_file, 'mol', 4, 0.5, {('S1', 'T1'): 2e6}, 77, 0.2)
+    assert results_db.load_kisc(db_file, 'mol', 4, 0.5, 300, 0.2) == {('S1', 'T1'): 1e6}
+    assert results_db.load_kisc(db_file, 'mol', 4, 0.5, 77, 0.2) == {('S1', 'T1'): 2e6}
+    assert results_db.load_kisc(db_file, 'mol', 4, 0.5, 300, 0.3) == {}
+
+
+def test_default_molecule(tmp_path):
+    assert results_db.default_molecule(str(tmp_path / "sooos" / "singlets")) == 'sooos'
+    assert results_db.default_molecule(str(tmp_path / "sooos")) == 'sooos'
@@ -0,0 +1,119 @@
+import threading
+import time
+import pytest
+from scheduler import run_jobs, split_resources
+
+
+def test_split_resources():
+    assert split_resources(25, 60, 4) == (6, 15)
+    assert split_resources(2, 1, 4) == (1, 1)
+
+
+def test_dependencies_get_results_in_order():
+    order = []
+
+    def job(name, value):
+        def run(*args):
+            order.append(name)
+            return value + sum(args)
+        return run
+
+    jobs = {
+        'c': (job('c', 100), ['a', 'b']),
+        'a': (job('a', 1), []),
+        'b': (job('b', 10), ['a']),
+    }
+    results, failed = run_jobs(jobs, max_jobs=3)
+    assert failed == {}
+    assert results == {'a': 1, 'b': 11, 'c': 112}
+    assert order.index('c') > order.index('b') > order.index('a')
+
+
+def test_at_most_max_jobs_run_at_once():
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def job():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    results, failed = run_jobs({f"j{i}": (job, []) for i in range(8)}, max_jobs=3)
+    assert len(results) == 8
+    assert peak[0] == 3
+
+
+def test_failure_skips_dependents_only():
+    def fail():
+        raise RuntimeError("g16 died")
+
+    jobs = {
+        'dist': (fail, []),
+        'energy': (lambda geom: geom, ['dist']),
+        'pysoc': (lambda energy: energy, ['energy']),
+        'other': (lambda: 'ok', []),
+    }
+    results, failed = run_jobs(jobs, max_jobs=2)
+    assert results == {'other': 'ok'}
+    assert failed['dist'] == "g16 died"
+    assert failed['energy'] == "dependency dist failed"
+    assert failed['pysoc'] == "dependency energy failed"
+
+
+def test_unknown_and_circular_dependencies():
+    with pytest.raises(ValueError, match="unknown job"):
+        run_jobs({'a': (lambda x: x, ['missing'])})
+    with pytest.raises(ValueError, match="Circular"):
+        run_jobs({'a': (lambda x: x, ['b']), 'b': (lambda x: x, ['a'])})
+
+
+def test_can_start_holds_jobs_while_others_run():
+    release = threading.Event()
+    asked = []
+
+    def can_start(name):
+        asked.append(name)
+        return release.is_set()
+
+    def first():
+        time.sleep(0.1)
+        release.set()
+        return 'first'
+
+    jobs = {'first': (first, []), 'held': (lambda: 'held', [])}
+    results, failed = run_jobs(jobs, max_jobs=2, can_start=can_start, poll_interval=0.02)
+    assert results == {'first': 'first', 'held': 'held'}
+    assert 'held' in asked
+
+
+def test_held_job_starts_when_nothing_runs():
+    # a job is never held back forever: with nothing running it starts anyway
+    results, failed = run_jobs({'a': (lambda: 1, [])}, can_start=lambda name: False, poll_interval=0.01)
+    assert results == {'a': 1}
+
+
+def test_interrupt_calls_cancel_and_drops_queued_jobs():
+    stop = threading.Event()
+    started = []
+
+    def interrupted():
+        time.sleep(0.05)
+        raise KeyboardInterrupt
+
+    def running():
+        # stands for a job waiting on a Gaussian process, which cancel() kills
+        started.append('running')
+        stop.wait(5)
+
+    jobs = {
+        'interrupted': (interrupted, []),
+        'running': (running, []),
+        'queued': (lambda: started.append('queued'), ['running']),
+    }
+    with pytest.raises(KeyboardInterrupt):
+        run_jobs(jobs, max_jobs=2, cancel=stop.set)
+    assert stop.is_set()
+    assert started == ['running']
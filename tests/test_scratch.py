@@ -0,0 +1,69 @@
+import os
+import pytest
+import scratch
+
+
+@pytest.fixture
+def study(tmp_path, monkeypatch):
+    for name, value in [('scratch_base', None), ('root', None), ('study', None), ('cap', 0), ('watched', []),
+                        ('peak', 0), ('last_usage', (0.0, 0))]:
+        monkeypatch.setattr(scratch, name, value)
+    folder = tmp_path / "singlets"
+    folder.mkdir()
+    scratch.configure(str(folder), str(tmp_path / "scratch"), cap_gb=1000 / 1024**3)
+    return folder
+
+
+def soc_job(study, name, size):
+    # SOC folder with its rwf and chk on the scratch disk, as generate_soc leaves it
+    folder = study / name
+    folder.mkdir(parents=True)
+    job_scratch = scratch.job_dir(scratch.job_name(str(folder)))
+    for file in ('gaussian.rwf', 'gaussian.chk'):
+        with open(os.path.join(job_scratch, file), 'wb') as f:
+            f.write(b"x" * size)
+    assert scratch.link_into(str(folder), job_scratch, ['gaussian.rwf', 'gaussian.chk']) == ['gaussian.rwf', 'gaussian.chk']
+    return str(folder), job_scratch
+
+
+def test_job_names(study):
+    assert scratch.job_name(str(study / "soc_dis_4_+0.1")) == "soc_dis_4_+0.1"
+    assert scratch.job_name(str(study / "screen" / "soc_dis_4_+0.1")) == "screen_soc_dis_4_+0.1"
+    assert scratch.job_name("/elsewhere/soc_dis_4_+0.1") == "soc_dis_4_+0.1"
+
+
+def test_cleanup_removes_links_and_scratch_files(study):
+    folder, job_scratch = soc_job(study, "soc_dis_4_+0.1", 300)
+    screen_folder, screen_scratch = soc_job(study, "screen/soc_dis_4_+0.1", 100)
+    assert scratch.usage() == 800
+    assert scratch.cleanup(folder) == 600
+    assert not os.path.lexists(os.path.join(folder, 'gaussian.rwf'))
+    assert not os.path.isdir(job_scratch)
+    # the screening job of the same amplitude keeps its files
+    assert os.path.isfile(os.path.join(screen_scratch, 'gaussian.rwf'))
+    assert scratch.peak == 800
+
+
+def test_regular_files_are_kept_in_place(study):
+    folder = study / "soc_dis_4_+0.5"
+    folder.mkdir()
+    (folder / "gaussian.chk").write_text("old run")
+    assert scratch.link_into(str(folder), scratch.job_dir("soc_dis_4_+0.5"), ['gaussian.rwf', 'gaussian.chk']) == ['gaussian.rwf']
+    assert not os.path.islink(folder / "gaussian.chk")
+
+
+def test_has_space_reuses_recent_measurements(study, monkeypatch):
+    folder, job_scratch = soc_job(study, "soc_dis_4_+0.1", 600)
+    assert not scratch.has_space()  # 1200 bytes above the cap of 1000
+
+    walks = []
+    monkeypatch.setattr(scratch, 'folder_size', lambda *args: walks.append(args) or 0)
+    assert not scratch.has_space()
+    # cleanup reuses the measurement too and leaves the usage without the freed files
+    assert scratch.cleanup(folder) == 1200
+    assert scratch.has_space()
+    assert walks == []
+
+    monkeypatch.setattr(scratch, 'last_usage', (0.0, 10**6))  # older than max_age
+    assert scratch.has_space()
+    assert len(walks) == 1
@@ -0,0 +1,105 @@
+import json
+import pytest
+import workflow_state
+
+
+@pytest.fixture
+def state_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(workflow_state, 'states', {})
+    return str(tmp_path / "workflow_state.json")
+
+
+def restart():
+    # a new process reads the state file again
+    workflow_state.states.clear()
+
+
+def counting(calls, name, result=None, error=None):
+    def run(*args):
+        calls.append(name)
+        if error:
+            raise RuntimeError(error)
+        return result
+    return run
+
+
+def test_restart_skips_done_and_reruns_failed(state_file):
+    calls = []
+    workflow_state.add_pending(state_file, ['a', 'b'])
+    assert workflow_state.tracked(state_file, 'a', counting(calls, 'a', ['key', 1]))() == ['key', 1]
+    with pytest.raises(RuntimeError):
+        workflow_state.tracked(state_file, 'b', counting(calls, 'b', error="g16 died"))()
+    counts, failed = workflow_state.summary(state_file)
+    assert failed == {'b': "g16 died"}
+
+    restart()
+    assert workflow_state.is_done(state_file, 'a')
+    assert workflow_state.stored_result(state_file, 'a') == ['key', 1]
+    assert workflow_state.tracked(state_file, 'a', counting(calls, 'a'))() == ['key', 1]
+    assert workflow_state.tracked(state_file, 'b', counting(calls, 'b', 'ok'))() == 'ok'
+    assert calls == ['a', 'b', 'b']
+    assert workflow_state.summary(state_file) == ({'a': {'done': 1}, 'b': {'done': 1}}, {})
+
+
+def test_restart_reruns_stages_left_running_by_a_crash(state_file):
+    calls = []
+    workflow_state.update(state_file, 'a', status='running')
+    restart()
+    assert not workflow_state.is_done(state_file, 'a')
+    workflow_state.tracked(state_file, 'a', counting(calls, 'a', 1))()
+    assert calls == ['a']
+
+
+def test_done_stage_without_stored_result_runs_again(state_file):
+    calls = []
+    workflow_state.tracked(state_file, 'dist', counting(calls, 'dist', 'geometry'), store_result=False)()
+    restart()
+    assert workflow_state.is_done(state_file, 'dist')
+    assert workflow_state.stored_result(state_file, 'dist') is None
+    assert workflow_state.tracked(state_file, 'dist', counting(calls, 'dist', 'geometry'), store_result=False)() == 'geometry'
+    assert calls == ['dist', 'dist']
+
+
+def test_changes_are_appended_and_folded(state_file):
+    workflow_state.add_pending(state_file, ['a'])
+    workflow_state.tracked(state_file, 'a', lambda: 1)()
+    with open(state_file) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3  # pending, running, done
+    restart()
+    workflow_state.add_pending(state_file, ['a', 'b'])
+    with open(state_file) as f:
+        assert [json.loads(line)['name'] for line in f] == ['a', 'b']
+
+
+def test_old_format_and_cut_lines(state_file):
+    with open(state_file, 'w') as f:
+        json.dump({'a': {'status': 'done', 'result': 1}, 'b': {'status': 'failed'}}, f)
+    assert workflow_state.is_done(state_file, 'a')
+    workflow_state.update(state_file, 'b', status='done')
+    with open(state_file, 'a') as f:
+        f.write('{"name": "c", "stat')  # crash in the middle of a line
+    restart()
+    assert workflow_state.is_done(state_file, 'b')
+    assert workflow_state.stored_result(state_file, 'a') == 1
+    assert not workflow_state.is_done(state_file, 'c')
+
+
+def test_stages_left_running_are_reset_at_the_start_of_a_run(state_file):
+    workflow_state.add_pending(state_file, ['a', 'b'])
+    workflow_state.update(state_file, 'a', status='running')
+    workflow_state.update(state_file, 'b', status='done')
+    restart()
+    assert workflow_state.reset_running(state_file) == ['a']
+    restart()
+    assert workflow_state.summary(state_file)[0] == {'a': {'pending': 1}, 'b': {'done': 1}}
+
+
+def test_jobs_skipped_after_a_failure_are_recorded(state_file):
+    workflow_state.add_pending(state_file, ['g:dist', 'g:soc', 'g:pysoc'])
+    workflow_state.update(state_file, 'g:dist', status='failed', error="g16 died")
+    workflow_state.record_skipped(state_file, {'g:dist': "g16 died", 'g:soc': "dependency g:dist failed",
+                                               'g:pysoc': "dependency g:soc failed"})
+    restart()
+    counts, failed = workflow_state.summary(state_file)
+    assert failed == {'g:dist': "g16 died", 'g:soc': "dependency g:dist failed", 'g:pysoc': "dependency g:soc failed"}
@@ -0,0 +1,204 @@
+# Persisted state of every stage of a distortion study, so a restarted distort.main skips
+# the stages which are already done.
+# Usage: python3 workflow_state.py [singlets/workflow_state.json]   prints a progress summary
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, Counter
+
+statuses = ['pending', 'running', 'done', 'failed']
+lock = threading.Lock()
+states = {}  # state file -> (size, state) of the state as last read or written by this process
+
+
+def read_state(state_file):
+    """
+    Fold the state file into {name: entry}. Every line is one change of a stage,
+    {"name": ..., fields}, the last value of every field wins.
+    Returns (state, appendable), appendable is False for a file in the old format (one JSON
+    object for all the stages) or with a last line cut short by a crash.
+    """
+    with open(state_file, 'r') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict) and not isinstance(data.get('name'), str):
+            return data, False
+    except json.JSONDecodeError:
+        pass
+
+    state = {}
+    for line in text.splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # a line cut short by a crash
+        if isinstance(record, dict) and 'name' in record:
+            state.setdefault(record.pop('name'), {'status': 'pending'}).update(record)
+    return state, text.endswith("\n") or not text
+
+
+def load_state(state_file):
+    if not os.path.isfile(state_file):
+        return {}
+    size = os.path.getsize(state_file)
+    if state_file in states and states[state_file][0] == size:
+        return states[state_file][1]
+    state, appendable = read_state(state_file)
+    states[state_file] = (size, state)
+    if not appendable:
+        save_state(state_file, state)  # changes are appended as lines from now on
+    return state
+
+
+def save_state(state_file, state):
+    # write a temporary file and rename, so the state file is never half written
+    tmp = f"{state_file}.tmp"
+    with open(tmp, 'w') as f:
+        for name, entry in state.items():
+            f.write(json.dumps({'name': name, **entry}) + "\n")
+    os.replace(tmp, state_file)
+    states[state_file] = (os.path.getsize(state_file), state)
+
+
+def append_changes(state_file, state, changes):
+    # only the changed fields are appended instead of writing the whole state again
+    with open(state_file, 'a') as f:
+        f.write("".join(json.dumps(change) + "\n" for change in changes))
+    states[state_file] = (os.path.getsize(state_file), state)
+
+
+def update(state_file, name, **fields):
+    with lock:
+        state = load_state(state_file)
+        fields['time'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        state.setdefault(name, {'status': 'pending'}).update(fields)
+        append_changes(state_file, state, [{'name': name, **fields}])
+
+
+def add_pending(state_file, names):
+    """
+    Register jobs which are not in the state file yet as pending.
+    """
+    with lock:
+        state = load_state(state_file)
+        for name in names:
+            state.setdefault(name, {'status': 'pending'})
+        # once per round of jobs, the changes appended so far are folded into one line per stage
+        save_state(state_file, state)
+
+
+def reset_running(state_file):
+    """
+    At the start of a run, set the stages left 'running' by a process which died (node crash,
+    wall time) back to 'pending'. Returns their names.
+    """
+    with lock:
+        state = load_state(state_file)
+        stale = [name for name, entry in state.items() if entry.get('status') == 'running']
+        for name in stale:
+            state[name]['status'] = 'pending'
+        if stale:
+            append_changes(state_file, state, [{'name': name, 'status': 'pending'} for name in stale])
+    return stale
+
+
+def record_skipped(state_file, failed):
+    """
+    Mark the jobs run_jobs did not start because a dependency failed as failed, with the reason.
+    failed maps job name -> error message, the jobs which ran and failed are already recorded.
+    """
+    with lock:
+        state = load_state(state_file)
+        skipped = {name: error for name, error in failed.items()
+                   if name in state and state[name].get('status') != 'failed'}
+        for name, error in skipped.items():
+            state[name].update(status='failed', error=error)
+        if skipped:
+            append_changes(state_file, state, [{'name': name, 'status': 'failed', 'error': error}
+                                               for name, error in skipped.items()])
+
+
+def is_done(state_file, name):
+    with lock:
+        return load_state(state_file).get(name, {}).get('status') == 'done'
+
+
+def stored_result(state_file, name):
+    """
+    Result saved for the stage `name` when it was done, None if there is none.
+    """
+    with lock:
+        entry = load_state(state_file).get(name, {})
+    return entry.get('result') if entry.get('status') == 'done' else None
+
+
+def tracked(state_file, name, func, store_result=True):
+    """
+    Wrap func so it is skipped when the stage `name` is already done in the state file.
+    The result of func is saved in the state file (it must be JSON serializable) and returned
+    instead of calling func again. With store_result=False only the status and time are saved
+    and a done stage is run again for its result, for stages which are cheap to repeat once
+    their output exists (the distorted geometries are read again from the logs).
+    """
+    def run(*args):
+        with lock:
+            entry = dict(load_state(state_file).get(name, {}))
+        if entry.get('status') == 'done':
+            if store_result:
+                print(f"Skipping {name}, already done")
+                return entry.get('result')
+            return func(*args)
+
+        update(state_file, name, status='running', error=None)
+        start = time.time()
+        try:
+            result = func(*args)
+        except Exception as e:
+            update(state_file, name, status='failed', error=str(e))
+            raise
+        fields = {'result': result} if store_result else {}
+        update(state_file, name, status='done', seconds=round(time.time() - start, 1), **fields)
+        return result
+    return run
+
+
+def summary(state_file):
+    """
+    Count the jobs of each stage (part of the name after the last ':') in each status.
+    Returns (counts, failed) where counts[stage][status] is a count and failed maps name -> error.
+    """
+    state = load_state(state_file)
+    counts = defaultdict(Counter)
+    failed = {}
+    for name, entry in state.items():
+        stage = name.split(':')[-1] if ':' in name else name
+        counts[stage][entry.get('status', 'pending')] += 1
+        if entry.get('status') == 'failed':
+            failed[name] = entry.get('error')
+    return counts, failed
+
+
+def print_summary(state_file):
+
+    counts, failed = summary(state_file)
+    if not counts:
+        print(f"No jobs recorded in {state_file}")
+        return
+
+    print(f"{'stage':<12}" + "".join(f"{s:>9}" for s in statuses) + f"{'total':>9}")
+    for stage, c in counts.items():
+        print(f"{stage:<12}" + "".join(f"{c[s]:>9}" for s in statuses) + f"{sum(c.values()):>9}")
+
+    if failed:
+        print("\nFailed jobs:")
+        for name, error in failed.items():
+            print(f"  {name}: {error}")
+
+
+if __name__ == "__main__":
+    state_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), 'singlets', 'workflow_state.json')
+    print_summary(state_file)